@@ -1,50 +1,87 @@
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-
-import win32com.client
-from django.contrib.messages import success
-from openpyxl import load_workbook
-from openpyxl.cell.cell import MergedCell
-import sys
-from openpyxl.styles import numbers
+import time
 
-from docx.shared import Pt
-from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+# Отсчет времени запуска — до импорта остальных модулей
+_STARTED = time.perf_counter()
 
-from datetime import datetime
-from docx import Document
+import sys
+from datetime import datetime, timedelta
 import logging
-import time
-import pythoncom
 import unicodedata
 
-import win32timezone  # noqa: F401
-
+import copy
 import json
-import numpy as np
 import os
+import shutil
+import tempfile
 import re
-import fitz
-import cv2
-from docx.shared import Inches
 import locale
+import multiprocessing
+
+from lazy_imports import StartupTimer, lazy_import
+
+# Тяжелые библиотеки загружаются при первом обращении (см. lazy_imports).
+# tkinter нужен только окну программы: пакетное формирование импортирует модуль без него
+tk = lazy_import("tkinter")
+ttk = lazy_import("tkinter.ttk")
+messagebox = lazy_import("tkinter.messagebox")
+filedialog = lazy_import("tkinter.filedialog")
+fitz = lazy_import("fitz")
+numbers = lazy_import("openpyxl.styles.numbers")
+coordinate_to_tuple = lazy_import("openpyxl.utils", "coordinate_to_tuple")
+get_column_letter = lazy_import("openpyxl.utils", "get_column_letter")
+Document = lazy_import("docx", "Document")
+Pt = lazy_import("docx.shared", "Pt")
+Inches = lazy_import("docx.shared", "Inches")
+WD_PARAGRAPH_ALIGNMENT = lazy_import("docx.enum.text", "WD_PARAGRAPH_ALIGNMENT")
+
+from background_jobs import JobCancelled, JobExecutor
+from bulk_paste import SUPPLEMENTARY_CHARS, find_unsupported_value, parse_clipboard_table
+from formula_engine import EvaluatedSheet
+from helper_registry import HelperJournal, helper_row
+from model_registry import is_empty_result, load_model_registry
+from office_pool import default_pool
+from pdf_render import (PARALLEL_MIN_PAGES, RenderCache, default_workers, file_hash, render_clip, render_pages,
+                        save_png)
+from pressure_series import calculate_pressure_deltas
+from report_output import OUTPUT_FORMATS, OfficeConverter, write_report
+from report_trace import span, tracing
+from report_schema import extract_report_data, load_field_schema, read_sheet_block
+from tag_substitution import TagSubstituter
+from template_index import TemplateIndexCache
+from well_history import WellHistoryStore
+from workbook_session import WorkbookSession
+
+STARTUP = StartupTimer(_STARTED)
+STARTUP.mark("импорт модулей")
+
+try:
+    locale.setlocale(locale.LC_ALL, 'ru_RU.UTF-8')
+except locale.Error:
+    # Русской локали может не быть (Linux без Office, замеры производительности)
+    print("Локаль ru_RU.UTF-8 недоступна, используется локаль по умолчанию", file=sys.stderr)
+
+
+def init_app():
+    """
+    Настройка логирования программы с окном - перезаписываем файл при каждом запуске.
+    Вызывается только при запуске GUI: пакетное формирование, замеры и дочерние процессы
+    (отрисовка PDF) импортируют этот модуль и не должны перезаписывать app.log
+    и забирать себе stderr.
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('app.log', mode='w', encoding='utf-8'),  # 'w' для перезаписи файла
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
 
-locale.setlocale(locale.LC_ALL, 'ru_RU.UTF-8')
+    sys.stderr = open('app.log', 'a')
 
 
-# Настройка логирования - перезаписываем файл при каждом запуске
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log', mode='w', encoding='utf-8'),  # 'w' для перезаписи файла
-        logging.StreamHandler(sys.stdout)
-    ]
-)
 logger = logging.getLogger(__name__)
 
-sys.stderr = open('app.log', 'a')
-
 
 def format_units(text):
     """Форматирует единицы измерения"""
@@ -65,87 +102,27 @@ def superscript(number):
     return "".join(superscript_map.get(digit, "") for digit in str(number))
 
 
-def calculate_r_difference(workbook_path, sheet_name='current'):
+def calculate_r_difference(workbook_path, sheet_name='current', evaluator=None):
     """
     Находит разницу между последним значением в столбце R и значением за сутки до последней даты.
 
     :param workbook_path: путь к файлу Excel
     :param sheet_name: имя листа (по умолчанию 'current')
+    :param evaluator: FormulaEvaluator уже загруженного листа (тогда файл не читается)
     :return: разница значений или None в случае ошибки
     """
-    import pandas as pd
-    from datetime import datetime, timedelta
-    import logging
-
-    # Настройка логирования
-    logging.basicConfig(level=logging.INFO)
-
     try:
-        # Читаем данные из Excel
-        df = pd.read_excel(workbook_path, sheet_name=sheet_name, header=None)
-
-        # Проверяем значение в ячейке B12
-        b12_value = df.iloc[11, 1]  # Индексация с 0: строка 12, столбец B
-        if isinstance(b12_value, (int, float)) and b12_value < 30:
-            logging.info("Значение в ячейке B12 меньше 30. Возвращаем None.")
+        deltas = calculate_pressure_deltas(workbook_path, sheet_name, windows={"24h": timedelta(days=1)},
+                                           evaluator=evaluator)
+        if deltas is None:
             return None
 
-        # Получаем столбцы Q и R (индексация с 0, Q=16, R=17)
-        column_q = df.iloc[:, 16]  # Столбец Q с датами
-        column_r = df.iloc[:, 17]  # Столбец R со значениями
-
-        # 1. Находим последнее значение в столбце R
-        last_r_value = column_r.dropna().iloc[-1]
-
-        # 2. Находим последнюю дату в столбце Q
-        last_date_str = column_q.dropna().iloc[-1]
-
-        # Преобразуем строку даты в datetime объект
-        try:
-            last_date = datetime.strptime(str(last_date_str), "%d.%m.%Y %H:%M:%S")
-        except ValueError:
-            try:
-                last_date = datetime.strptime(str(last_date_str), "%d.%m.%Y")
-            except ValueError:
-                logging.error(f"Невозможно преобразовать дату: {last_date_str}")
-                return None
-
-        # Вычитаем ровно одни сутки
-        previous_date = last_date - timedelta(days=1)
-
-        # Находим значение в столбце R для даты (previous_date)
-        previous_r_value = None
-        time_tolerance = timedelta(minutes=60)  # допустимая погрешность во времени
-
-        for i in range(len(column_q)):
-            current_date_str = str(column_q.iloc[i])
-            if not current_date_str or pd.isna(current_date_str):
-                continue
-
-            # Пробуем разные форматы даты
-            try:
-                current_date = datetime.strptime(current_date_str, "%d.%m.%Y %H:%M:%S")
-            except ValueError:
-                try:
-                    current_date = datetime.strptime(current_date_str, "%d.%m.%Y")
-                except ValueError:
-                    logging.warning(f"Невозможно преобразовать дату: {current_date_str}")
-                    continue
-
-            # Ищем значение, которое отличается ровно на 1 день (± допустимую погрешность)
-            if (last_date - current_date >= timedelta(days=1) - time_tolerance and
-                    last_date - current_date <= timedelta(days=1) + time_tolerance):
-                previous_r_value = column_r.iloc[i]
-                break
-
-        if previous_r_value is None:
+        difference = deltas["24h"]
+        if difference is None:
             logging.warning("Не найдено значение за сутки до последней даты или длительность менее 24ч")
             return None
 
-        # 4. Вычисляем разницу
-        difference = last_r_value - previous_r_value
-        logging.info(f"Разница значений: {difference} (последнее: {last_r_value}, за сутки до: {previous_r_value})")
-
+        logging.info(f"Разница значений за сутки: {difference}")
         return difference
 
     except Exception as e:
@@ -211,15 +188,21 @@ def set_font_size(paragraph_or_run, size):
 with open(resource_path('text_templates.json'), 'r', encoding='utf-8') as f:
     TEXT_TEMPLATES = json.load(f)
 
+# Описание полей отчета: метка -> ячейка листа 'current'
+REPORT_FIELDS = load_field_schema(resource_path('report_fields.json'))
+
+# Модели интерпретации и их параметры для таблицы результатов
+MODEL_REGISTRY = load_model_registry(resource_path('model_registry.json'))
+
 
 # Функция вставки diagnostic_text на место метки {{diagnostic_text}}
-def insert_diagnostic_text(doc, diagnostic_text):
+def insert_diagnostic_text(doc, diagnostic_text, template_index=None):
     """Вставляет диагностический текст на место метки {{diagnostic_text}}"""
     # Получаем текст из шаблонов
     diagnostic_content = get_nested_value(TEXT_TEMPLATES, diagnostic_text.split('.'))
 
     # Ищем метку в параграфах
-    for paragraph in doc.paragraphs:
+    for paragraph in body_paragraphs(doc, template_index, ["{{diagnostic_text}}"]):
         if "{{diagnostic_text}}" in paragraph.text:
             for run in paragraph.runs:
                 if "{{diagnostic_text}}" in run.text:
@@ -235,35 +218,45 @@ def get_nested_value(dictionary, keys):
     return dictionary
 
 
+# Параграфы основного текста, в которых могут быть метки tags
+def body_paragraphs(doc, template_index, tags):
+    if template_index is None:
+        return doc.paragraphs
+    return [location.paragraph for location in template_index.tag_locations(tags) if not location.in_table]
+
+
+# Точка отмены между этапами отчета: задание job останавливается здесь, если его отменили
+def report_stage(job, message):
+    if job is not None:
+        job.check_cancelled()
+        job.progress(message)
+
+
+# Якоря документа (таблицы по заголовкам, строки-метки, метки {{...}}): из индекса шаблона
+# или одним обходом документа
+def document_anchors(doc, template_index=None):
+    if template_index is not None:
+        return template_index.anchors
+    from docx_anchors import AnchorIndex
+
+    return AnchorIndex(doc)
+
+
 # ищем таблицу 'Протокол результатов исследования'
-def find_results_table(doc):
+def find_results_table(doc, template_index=None):
     """
     Находит таблицу 'Протокол результатов исследования' по тексту перед ней
     Возвращает таблицу или None если не найдена
     """
-    # Ищем параграф с заголовком
-    for i, paragraph in enumerate(doc.paragraphs):
-        if "Протокол результатов исследования" in paragraph.text:
-            # Ищем следующую после параграфа таблицу
-            next_element = paragraph._element.getnext()
-
-            while next_element is not None:
-                # Проверяем, является ли элемент таблицей
-                if next_element.tag.endswith('tbl'):
-                    # Находим индекс таблицы в документе
-                    for table_idx, table in enumerate(doc.tables):
-                        if table._element == next_element:
-                            return doc.tables[table_idx]
-
-                next_element = next_element.getnext()
+    if template_index is not None:
+        return template_index.results_table
+    return document_anchors(doc).table("results_table")
 
-    return None
 
-
-def replace_and_format_table(doc, data):
+def replace_and_format_table(doc, data, template_index=None):
     """Удаляет строки с нулевыми или отрицательными значениями во 2-м столбце таблицы результатов"""
     logger = logging.getLogger(__name__)
-    table = find_results_table(doc)
+    table = find_results_table(doc, template_index)
 
     if not table:
         logger.warning("Таблица 'Протокол результатов исследования' не найдена")
@@ -281,17 +274,10 @@ def replace_and_format_table(doc, data):
         cell_value = second_cell.text.strip()
         logger.debug(f"Строка {row_idx}, значение: '{cell_value}'")
 
-        try:
-            # Пробуем преобразовать в число
-            num_value = float(cell_value.replace(',', '.'))
-            if num_value == 0 or num_value < -1000:
-                logger.info(f"Найден 0/большое отрицательное значение в строке {row_idx}: {num_value}")
-                rows_to_delete.append(row_idx)
-        except ValueError:
-            # Если не число, проверяем текстовые значения
-            if cell_value in ("0", "0.0", "0,00", "-", "-2146826252"):
-                logger.info(f"Найден 0/большое отрицательное значение (текст) в строке {row_idx}: '{cell_value}'")
-                rows_to_delete.append(row_idx)
+        # 0, '-' и коды ошибок Excel (то же правило, что и для строк параметров модели)
+        if is_empty_result(cell_value):
+            logger.info(f"Найден 0/большое отрицательное значение в строке {row_idx}: '{cell_value}'")
+            rows_to_delete.append(row_idx)
 
     logger.info(f"Найдено строк для удаления: {len(rows_to_delete)}")
 
@@ -306,6 +292,45 @@ def replace_and_format_table(doc, data):
     logger.info(f"Удалено строк: {len(rows_to_delete)}. Осталось строк: {len(table.rows)}")
 
 
+def insert_model_rows(doc, rows, template_index=None):
+    """
+    Вставляет строки параметров модели после строки 'Проницаемость, (мД)'.
+    Все строки строятся за один разбор XML по образцу — копии строки проницаемости.
+
+    :param rows: список (название, значение) из MODEL_REGISTRY.result_rows
+    """
+    from docx.table import _Row
+    from docx_tables import emit_rows
+
+    if not rows:
+        logging.warning("Нет дополнительных параметров модели")
+        return False
+
+    anchors = document_anchors(doc, template_index)
+    table = anchors.table("results_table")
+    if not table:
+        logging.error("Таблица результатов не найдена")
+        return False
+
+    target_tr = anchors.row("permeability_row")
+    if target_tr is None or target_tr.getparent() is not table._tbl:
+        logging.error("Строка 'Проницаемость, (мД)' не найдена в таблице")
+        return False
+
+    # Образец: название по левому краю, значение по центру, 12 пт
+    prototype = copy.deepcopy(target_tr)
+    target_tr.addnext(prototype)
+    cells = _Row(prototype, table).cells
+    for cell, alignment in zip(cells[:2], (WD_PARAGRAPH_ALIGNMENT.LEFT, WD_PARAGRAPH_ALIGNMENT.CENTER)):
+        for paragraph in cell.paragraphs:
+            paragraph.alignment = alignment
+            set_font_size(paragraph, 12)
+
+    emit_rows(prototype, [(format_units(name), format_units(value)) for name, value in rows])
+    logging.info(f"Успешно вставлено {len(rows)} параметров модели")
+    return True
+
+
 def replace_tags_perfectly(doc, data):
     """
     Идеальная замена меток:
@@ -313,31 +338,31 @@ def replace_tags_perfectly(doc, data):
     - Сохраняет форматирование
     - Не трогает формулы и графики
     """
+    substituter = TagSubstituter(data)
+
     # Обработка всех параграфов
     for paragraph in doc.paragraphs:
-        _process_paragraph_perfect(paragraph, data, is_table=False)
+        _process_paragraph_perfect(paragraph, substituter, is_table=False)
 
     # Обработка таблиц
     for table in doc.tables:
         for row in table.rows:
             for col_idx, cell in enumerate(row.cells):
                 for paragraph in cell.paragraphs:
-                    _process_paragraph_perfect(paragraph, data, is_table=True, col_idx=col_idx)
+                    _process_paragraph_perfect(paragraph, substituter, is_table=True, col_idx=col_idx)
 
 
-def _process_paragraph_perfect(paragraph, data, is_table, col_idx=None):
+def _process_paragraph_perfect(paragraph, substituter, is_table, col_idx=None):
     """Обработка параграфа с идеальной заменой меток"""
     # Объединяем Runs чтобы найти разбитые метки
     full_text = ''.join([run.text for run in paragraph.runs])
 
     # Пропускаем если нет меток
-    if not any(tag in full_text for tag in data.keys()):
+    if not substituter.find(full_text):
         return
 
     # Заменяем метки в полном тексте
-    for tag, value in data.items():
-        if tag in full_text:
-            full_text = full_text.replace(tag, str(value))
+    full_text = substituter.sub(full_text)
 
     # Восстанавливаем форматирование
     paragraph.clear()
@@ -359,35 +384,46 @@ def _process_paragraph_perfect(paragraph, data, is_table, col_idx=None):
 
 
 # Функция замены меток (без форматирования единиц измерения)
-def replace_tags_only(doc, data):
+def replace_tags_only(doc, data, template_index=None):
     """Простая замена меток в тексте и таблицах без изменения структуры"""
+    substituter = TagSubstituter(data)
+
+    # По индексу шаблона обходим только параграфы с метками
+    if template_index is not None and template_index.covers(data):
+        for location in template_index.tag_locations(data):
+            _process_paragraph_only(location.paragraph, substituter, location.in_table)
+        return
+
     # Обработка обычного текста
     for paragraph in doc.paragraphs:
-        for key, value in data.items():
-            if key in paragraph.text:
-                paragraph.text = paragraph.text.replace(key, str(value))
-                set_font_size(paragraph, 12)
+        _process_paragraph_only(paragraph, substituter, is_table=False)
 
     # Обработка таблиц
     for table in doc.tables:
         for row in table.rows:
             for cell in row.cells:
                 for paragraph in cell.paragraphs:
-                    for key, value in data.items():
-                        original_text = paragraph.text
-                        if key in original_text:
-                            updated_text = original_text.replace(key, str(value))
-                            paragraph.text = updated_text
-                            # Проверяем, является ли метка единственным содержимым ячейки
-                            if original_text.strip() == key:
-                                paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-                            else:
-                                paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-                            set_font_size(paragraph, 12)
+                    _process_paragraph_only(paragraph, substituter, is_table=True)
+
+
+def _process_paragraph_only(paragraph, substituter, is_table):
+    original_text = paragraph.text
+    matches = substituter.find(original_text)
+    if not matches:
+        return
+
+    paragraph.text = substituter.sub(original_text)
+    if is_table:
+        # Проверяем, является ли метка единственным содержимым ячейки
+        if len(matches) == 1 and original_text.strip() == matches[0].group():
+            paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+        else:
+            paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+    set_font_size(paragraph, 12)
 
 
 # Функция восстановления единиц измерения
-def fix_units(doc):
+def fix_units(doc, template_index=None):
     """
     Автоматически находит все '2' и '3' после единиц (кгс, г, м)
     и поднимает их в надстрочный индекс, даже если написано раздельно.
@@ -407,6 +443,18 @@ def fix_units(doc):
             if text != run.text:
                 run.text = text
 
+    # По индексу шаблона: параграфы с единицами или метками и таблица результатов,
+    # в которую добавляются строки параметров модели
+    if template_index is not None:
+        for location in template_index.unit_locations():
+            process_paragraph(location.paragraph)
+        if template_index.results_table is not None:
+            for row in template_index.results_table.rows:
+                for cell in row.cells:
+                    for paragraph in cell.paragraphs:
+                        process_paragraph(paragraph)
+        return
+
     # Обрабатываем весь документ
     for paragraph in doc.paragraphs:
         process_paragraph(paragraph)
@@ -420,10 +468,11 @@ def fix_units(doc):
 
 def replace_plain_tags(doc, data):
     """Заменяет метки БЕЗ скобок с сохранением форматирования"""
+    substituter = TagSubstituter(data)
 
     # Обработка обычного текста
     for paragraph in doc.paragraphs:
-        _process_paragraph_plain(paragraph, data)
+        _process_paragraph_plain(paragraph, substituter)
 
     # Обработка таблиц
     for table in doc.tables:
@@ -432,13 +481,13 @@ def replace_plain_tags(doc, data):
                 for paragraph in cell.paragraphs:
                     _process_paragraph_plain(
                         paragraph,
-                        data,
+                        substituter,
                         is_table=True,
                         col_idx=col_idx
                     )
 
 
-def _process_paragraph_plain(paragraph, data, is_table=False, col_idx=0):
+def _process_paragraph_plain(paragraph, substituter, is_table=False, col_idx=0):
     """Обрабатывает параграф с метками без скобок"""
     # Пропускаем параграфы с графиками
     if any("{{Picture" in run.text for run in paragraph.runs):
@@ -448,14 +497,9 @@ def _process_paragraph_plain(paragraph, data, is_table=False, col_idx=0):
     full_text = ''.join(run.text for run in paragraph.runs)
 
     # Заменяем метки
-    changed = False
-    for tag, value in data.items():
-        if tag in full_text:
-            full_text = full_text.replace(tag, str(value))
-            changed = True
-
-    if not changed:
+    if not substituter.find(full_text):
         return
+    full_text = substituter.sub(full_text)
 
     # Сохраняем позиции надстрочных символов
     sup_chars = {'²', '³', '⁴'}
@@ -480,10 +524,11 @@ def _process_paragraph_plain(paragraph, data, is_table=False, col_idx=0):
 
 def replace_tags_preserve_format(doc, data):
     """Заменяет метки, сохраняя ИСХОДНОЕ форматирование текста"""
+    substituter = TagSubstituter(data, convert=lambda value: format_units(str(value)))
 
     # Обработка обычных параграфов
     for paragraph in doc.paragraphs:
-        _process_paragraph_preserve(paragraph, data)
+        _process_paragraph_preserve(paragraph, substituter)
 
     # Обработка таблиц
     for table in doc.tables:
@@ -492,55 +537,21 @@ def replace_tags_preserve_format(doc, data):
                 for paragraph in cell.paragraphs:
                     _process_paragraph_preserve(
                         paragraph,
-                        data,
+                        substituter,
                         is_table=True,
                         col_idx=col_idx
                     )
 
 
-def _process_paragraph_preserve(paragraph, data, is_table=False, col_idx=0):
+def _process_paragraph_preserve(paragraph, substituter, is_table=False, col_idx=0):
     """Обрабатывает параграф с полным сохранением форматирования"""
     # Пропускаем параграфы с графиками
     if any("{{Picture" in run.text for run in paragraph.runs):
         return
 
-    # Работаем с каждым Run отдельно
-    for run in paragraph.runs:
-        original_text = run.text
-        if not any(tag in original_text for tag in data.keys()):
-            continue
-
-        # Сохраняем ВСЕ атрибуты форматирования
-        original_font = {
-            'name': run.font.name,
-            'size': run.font.size,
-            'bold': run.font.bold,
-            'italic': run.font.italic,
-            'underline': run.font.underline,
-            'color': run.font.color.rgb if run.font.color else None,
-            'superscript': run.font.superscript,
-            'subscript': run.font.subscript
-        }
-
-        # Заменяем метки
-        new_text = original_text
-        for tag, value in data.items():
-            if tag in original_text:
-                new_text = new_text.replace(tag, format_units(str(value)))
-
-        # Применяем изменения
-        run.text = new_text
-
-        # Восстанавливаем ВСЕ атрибуты
-        run.font.name = original_font['name']
-        run.font.size = original_font['size']  # Сохраняем исходный размер шрифта
-        run.font.bold = original_font['bold']
-        run.font.italic = original_font['italic']
-        run.font.underline = original_font['underline']
-        if original_font['color']:
-            run.font.color.rgb = original_font['color']
-        run.font.superscript = original_font['superscript']  # Восстанавливаем надстрочные
-        run.font.subscript = original_font['subscript']
+    # Замена меняет только текст Runs, атрибуты форматирования остаются прежними.
+    # Метка, разбитая на несколько Runs, заменяется в Run, где она начинается
+    substituter.sub_runs(paragraph.runs)
 
     # Выравнивание для таблиц
     if is_table:
@@ -557,57 +568,39 @@ def replace_tags_preserve_context(doc, data):
     2. Надстрочные/подстрочные символы
     3. Стили шрифта
     """
+    substituter = TagSubstituter(data)
+
     for paragraph in doc.paragraphs:
-        _process_paragraph_with_context(paragraph, data)
+        _process_paragraph_with_context(paragraph, substituter)
 
     for table in doc.tables:
         for row in table.rows:
             for cell in row.cells:
                 for paragraph in cell.paragraphs:
-                    _process_paragraph_with_context(paragraph, data)
+                    _process_paragraph_with_context(paragraph, substituter)
 
 
-def _process_paragraph_with_context(paragraph, data):
+def _process_paragraph_with_context(paragraph, substituter):
     """Обрабатывает один параграф с сохранением контекста"""
-    # Сначала проверяем, есть ли вообще метки для замены
-    full_text = ''.join(run.text for run in paragraph.runs)
-    if not any(tag in full_text for tag in data.keys()):
+    # Собираем все Runs параграфа и размечаем метки (в том числе разбитые между Runs)
+    original_runs = list(paragraph.runs)
+    pieces = substituter.split_runs([run.text for run in original_runs])
+    if pieces is None:
         return
 
-    # Собираем все Runs параграфа
-    original_runs = list(paragraph.runs)
     paragraph.clear()
 
-    for run in original_runs:
-        original_text = run.text
-        remaining_text = original_text
-        new_runs = []
-
-        # Ищем метки в текущем Run
-        for tag in sorted(data.keys(), key=len, reverse=True):
-            if tag in remaining_text:
-                before, tag_found, remaining_text = remaining_text.partition(tag)
-
-                # Добавляем текст до метки с оригинальным форматированием
-                if before:
-                    new_run = paragraph.add_run(before)
-                    _copy_run_formatting(run, new_run)
-
-                # Добавляем замену для метки
-                replacement = str(data[tag])
-                new_run = paragraph.add_run(replacement)
-                _copy_run_formatting(run, new_run)
-
-                # Для числовых значений добавляем специальное форматирование
-                if isinstance(data[tag], (int, float)):
-                    new_run.font.name = 'Arial'
-                    new_run.font.size = Pt(12)
-
-        # Добавляем оставшийся текст
-        if remaining_text:
-            new_run = paragraph.add_run(remaining_text)
+    for run, run_pieces in zip(original_runs, pieces):
+        for text, tag in run_pieces:
+            # Текст вне меток и замены получают форматирование исходного Run
+            new_run = paragraph.add_run(substituter.values[tag] if tag else text)
             _copy_run_formatting(run, new_run)
 
+            # Для числовых значений добавляем специальное форматирование
+            if tag and isinstance(substituter.data[tag], (int, float)):
+                new_run.font.name = 'Arial'
+                new_run.font.size = Pt(12)
+
 
 def _copy_run_formatting(source_run, target_run):
     """Копирует все атрибуты форматирования из одного Run в другой"""
@@ -637,14 +630,15 @@ def fix_split_runs(paragraph):
 
 def replace_tags_safely(doc, data):
     """Заменяет метки, даже если они разбиты на несколько Run."""
+    substituter = TagSubstituter(data)
+
     # Обработка параграфов
     for paragraph in doc.paragraphs:
         fix_split_runs(paragraph)  # Сначала объединяем Run
         for run in paragraph.runs:
-            for tag, value in data.items():
-                if tag in run.text:
-                    run.text = run.text.replace(tag, str(value))
-                    run.font.size = Pt(12)
+            if substituter.find(run.text):
+                run.text = substituter.sub(run.text)
+                run.font.size = Pt(12)
 
     # Обработка таблиц
     for table in doc.tables:
@@ -661,10 +655,9 @@ def replace_tags_safely(doc, data):
 
                     # Замена меток
                     for run in paragraph.runs:
-                        for tag, value in data.items():
-                            if tag in run.text:
-                                run.text = run.text.replace(tag, str(value))
-                                run.font.size = Pt(12)
+                        if substituter.find(run.text):
+                            run.text = substituter.sub(run.text)
+                            run.font.size = Pt(12)
 
 
 def normalize_text(text):
@@ -701,146 +694,176 @@ def normalize_string(value):
     return value
 
 
+# Колонки итоговой таблицы, попадающие в отчет (ключи result_dict в generate_report_logic)
+PREVIOUS_TEST_COLUMNS = [
+    'Рпл  на ВНК, кгс/см2', 'Рзаб  на ВНК, кгс/см2', 'Дата испытания', '% воды', 'Qж/Qг, м3/сут   ',
+    'Кпрод. м3/сут*кгс/см2', 'Скин-фактор механич./интегр.', 'Нэф., м.', 'Кгидр., Д*см/сПз',
+]
+
+# Все метки, которые подставляются в шаблоны; по ним строится индекс шаблона
+TEMPLATE_TAGS = (
+    [field["tag"] for field in REPORT_FIELDS["fields"]]
+    + [normalize_string(column) for column in PREVIOUS_TEST_COLUMNS]
+    + ["model_description", "model_name", "diagnostic_text", "{{diagnostic_text}}"]
+    + [f"param_{k}" for k in range(3)]
+)
+
+TEMPLATE_INDEX = TemplateIndexCache(os.path.abspath("template_cache"), TEMPLATE_TAGS)
+
+# Шаблоны отчетов: ключ -> файл в папке templates
+TEMPLATE_FILES = {
+    "КВД_Заполярка": "KVD_Zapolyarka.docx",
+    "КВД_Оренбург": "KVD_Orenburg.docx",
+    "КВД_Оренбург_газ": "KVD_Orenburg_gas.docx",
+    "КВД_Оренбург2": "KVD_Orenburg2.docx",
+    "КВД_Хантос": "KVD_Khantos.docx",
+    "КВД_глушение": "KVD_For_Killing.docx",
+    "КВД_ННГ": "KVD_NNG.docx",
+    "КВД+ИД": "KVD_ID.docx",
+    "КСД": "KSD.docx",
+    "КПД": "KPD.docx",
+    "КПД+ИД": "KPD_ID.docx",
+    "ГРП": "GRP.docx"
+}
+
+# Итоговые таблицы предыдущих исследований (table_prev), проиндексированные по скважинам
+WELL_HISTORY = WellHistoryStore(os.path.abspath("well_history.sqlite"))
+
+
+def warm_shared_caches(template_keys=()):
+    """
+    Обновляет общие кеши до запуска рабочих процессов пакетного формирования:
+    хранилище предыдущих исследований (по всем итоговым таблицам table_prev)
+    и индексы шаблонов. Рабочим процессам остается только читать их.
+    Ошибка импорта итоговой таблицы прерывает пакет.
+    """
+    history_dir = table_prev_path("")
+    if os.path.isdir(history_dir):
+        WELL_HISTORY.refresh_all(history_dir)
+    # Соединение не должно переходить в рабочие процессы
+    WELL_HISTORY.close()
+
+    for template_key in dict.fromkeys(template_keys):
+        # Шаблон 'КВД_глушение' собирается из книги каждого задания — общего индекса у него нет
+        if template_key in TEMPLATE_FILES and template_key.lower() != "квд_глушение":
+            template_path = resolve_template(template_key, None)
+            TEMPLATE_INDEX.get(template_path, Document(template_path))
+
+# Таблицы данных на месте меток шаблона (см. docx_tables): метки нет — таблица не строится.
+# Ряды давления: метка -> (столбец дат, столбец давлений) листа 'current' (раздел 3 — Q/R, раздел 6 — Y/Z)
+PRESSURE_TABLES = {
+    "{{pressure_table}}": (17, 18),
+    "{{pressure_table_2}}": (25, 26),
+}
+# Предыдущие исследования скважины: столбец итоговой таблицы -> знаков после запятой (None — текст)
+HISTORY_TABLE = "{{history_table}}"
+HISTORY_COLUMNS = {
+    'Рпл  на ВНК, кгс/см2': 1,
+    'Рзаб  на ВНК, кгс/см2': 1,
+    'Qж/Qг, м3/сут   ': 1,
+    '% воды': 1,
+    'Кпрод. м3/сут*кгс/см2': 2,
+    'Скин-фактор механич./интегр.': None,
+}
+
+# Теплые экземпляры Excel и Word (см. office_pool)
+OFFICE_POOL = default_pool()
+
+# Строки реестра Helper.xlsm, ожидающие записи (см. helper_registry)
+HELPER_JOURNAL = HelperJournal(os.path.abspath("helper_journal"))
+
+# Отрисованные графики PDF по хешу содержимого
+PLOT_CACHE = RenderCache(os.path.abspath("render_cache"))
+
+# Трассы этапов формирования отчетов (см. report_trace)
+TRACE_DIR = os.path.abspath("report_traces")
+
+# Конвертация отчета в .doc/.pdf (LibreOffice с профилями в office_profiles, иначе Word)
+OFFICE_CONVERTER = OfficeConverter(os.path.abspath("office_profiles"))
+
+# Разделы вставки из буфера обмена: начальная ячейка и число столбцов
+SECTION_PARAMS = {
+    1: {"start_cell": "A1", "expected_columns": 2, "description": "Входные данные"},
+    2: {"start_cell": "L1", "expected_columns": 4, "description": "Модель давления на ВНК"},
+    3: {"start_cell": "Q1", "expected_columns": 2, "description": "Данные давления на ВНК"},
+    4: {"start_cell": "G1", "expected_columns": 3, "description": "Параметры_2"},
+    5: {"start_cell": "T1", "expected_columns": 4, "description": "Модель давления_2"},
+    6: {"start_cell": "Y1", "expected_columns": 2, "description": "Данные давления_2"}
+}
+
+# Разделы с длинными рядами давления (дата, значение), которые вставляются блоком
+BULK_PASTE_SECTIONS = (3, 6)
+
+
+class PasteError(Exception):
+    """Ошибка во вставляемых данных; текст показывается пользователю как есть"""
+
+# Ячейки листа 'current', которые очищаются при запуске и кнопкой "Очистить данные":
+# входные данные A1:B16, отдельные поля формы, поправки и все вставляемые таблицы
+REPORT_CLEAR_RANGES = (
+    "A1:B16",
+    "C14", "C16", "A19", "A20", "A23", "C29", "C34", "J4",
+    "B26:C28", "B31:C33",
+    "D:I", "L:O", "Q:R", "T:W", "Y:Z",
+)
+
+
 def extract_numbers_before_letter(value):
     match = re.match(r'(\d+)', value)
     return match.group(0) if match else ''
 
 
-def convert_to_datetime(value):
-    if not value or value == '-':
-        return None
-    if isinstance(value, str):
-        try:
-            return datetime.strptime(value, "%d.%m.%Y")
-        except ValueError:
-            return None
-    elif isinstance(value, datetime):
-        return value
-    return None
+# Блок прогноза пластового давления на листе книги: строка 2 — заголовки, 3-16 — данные
+PROGNOZ_BLOCK = "AI1:AN16"
 
 
-def copy_excel_to_word_pandas(excel_path, word_path, sheet_name, search_text):
-    """Копирует данные из Excel (все 40 столбцов) в Word документ, заменя указанную метку таблицей."""
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    import pandas as pd
+def copy_excel_to_word_pandas(excel_path, word_path, sheet_name, search_text, output_dir=None, sheet=None):
+    """
+    Копирует блок прогноза (столбцы AI-AN) из книги в Word документ, заменя указанную метку таблицей.
+    Результат сохраняется как KVD_For_Killing.docx в output_dir (по умолчанию — рядом с word_path).
+
+    Блок читается одним запросом Range(PROGNOZ_BLOCK).Value: из файла книги с вычислением
+    формул (EvaluatedSheet, без Excel) или из переданного листа sheet (EvaluatedSheet или лист Excel).
+    """
     from docx import Document
-    import win32com.client
-    import pythoncom
+    from docx_tables import Column, format_date, format_number, insert_table
     import os
     import logging
 
     # Настройка логирования
     logging.basicConfig(level=logging.INFO)
 
-    # 1. Проверка формата через ячейку AM1 и чтение данных через win32com
-    pythoncom.CoInitialize()
-    use_minimal_columns = False
-    all_data = []
+    # 1. Чтение блока и проверка формата через ячейку AM1
     try:
-        excel_app = win32com.client.Dispatch("Excel.Application")
-        excel_app.Visible = False
-        workbook = excel_app.Workbooks.Open(os.path.abspath(excel_path))
-        sheet = workbook.Sheets(sheet_name)
+        if sheet is None:
+            sheet = EvaluatedSheet(excel_path, sheet_name)
+        block = read_sheet_block(sheet, PROGNOZ_BLOCK)
+        all_data = [list(row) for row in block.values]
 
         # Проверка формата
-        AM1_value = sheet.Range("AM1").Value
+        AM1_value = block["AM1"]
         use_minimal_columns = str(AM1_value).strip() == ""
         logging.info(f"Формат таблицы: {'минимальный' if use_minimal_columns else 'полный'}")
 
-        # Чтение всех 40 столбцов (A-AN) и первых 16 строк
-        for row in range(1, 17):  # Строки 1-16 (нумерация с 1)
-            row_data = []
-            for col in range(1, 41):  # Колонки A-AN (1-40)
-                cell_value = sheet.Cells(row, col).Value
-                row_data.append(cell_value)
-            all_data.append(row_data)
-
     except Exception as e:
-        logging.error(f"Ошибка чтения Excel через win32com: {str(e)}")
+        logging.error(f"Ошибка чтения книги {excel_path}: {str(e)}")
         return None
-    finally:
-        # Гарантированное освобождение ресурсов
-        if workbook:
-            try:
-                workbook.Close(False)  # Закрываем только книгу
-            except Exception as e:
-                logging.warning(f"Ошибка при закрытии workbook в copy_excel_to_word_pandas: {e}")
 
-        excel_app = None
-        workbook = None
-        # pythoncom.CoUninitialize()
+    # 2. Столбцы таблицы: строка 2 блока — заголовки, первая колонка — дата, остальные — числа
+    width = 4 if use_minimal_columns else 6  # AI-AL или AI-AN
+    headers = all_data[1]
+    columns = [Column(str(headers[0]), 0, format_date())]
+    columns += [Column(str(headers[col]), col, format_number(1)) for col in range(1, width)]
 
-    # 2. Обработка данных
-    try:
-        # Создаем DataFrame из прочитанных данных
-        df = pd.DataFrame(all_data)
-
-        # Проверка структуры данных
-        if len(df.columns) < 40:
-            logging.warning(f"Файл содержит только {len(df.columns)} из 40 столбцов")
-
-        # Выбор формата таблицы
-        if use_minimal_columns:
-            columns = [34, 35, 36, 37]  # AI-AL (индексы 34-37, так как в Python нумерация с 0)
-        else:
-            columns = list(range(34, 40))  # AI-AN (34-39)
-
-        # Фильтрация данных (берем строки 3-16, так как в all_data строки 1-16)
-        data_df = df.iloc[2:16, columns].copy()
-        data_df.columns = [str(df.iloc[1, col]) for col in columns]
-
-        # Обработка данных
-        if not data_df.empty:
-            # Первая колонка - дата
-            data_df.iloc[:, 0] = pd.to_datetime(data_df.iloc[:, 0], errors='coerce').dt.strftime('%d.%m.%Y')
-
-            # Остальные колонки - числа
-            for col in data_df.columns[1:]:
-                data_df[col] = pd.to_numeric(data_df[col], errors='coerce').round(1)
-
-        data_df = data_df.dropna(how='all')
-        logging.info(f"Данные для вставки:\n{data_df.to_string()}")
-
-    except Exception as e:
-        logging.error(f"Ошибка обработки данных: {str(e)}")
-        return None
-
-    # 3. Вставка таблицы в Word (остается без изменений)
+    # 3. Вставка таблицы в Word на место метки (строки 3-16 блока, пустые пропускаются)
     try:
         doc = Document(word_path)
-        found = False
-
-        for paragraph in doc.paragraphs:
-            if search_text in paragraph.text:
-                table = doc.add_table(rows=data_df.shape[0] + 1, cols=data_df.shape[1])
-                table.style = 'Table Grid'
-
-                # Заголовки
-                for col_idx, header in enumerate(data_df.columns):
-                    cell = table.cell(0, col_idx)
-                    cell.text = str(header)
-                    cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-                    if cell.paragraphs[0].runs:
-                        cell.paragraphs[0].runs[0].font.bold = True
-
-                # Данные
-                for row_idx in range(data_df.shape[0]):
-                    for col_idx in range(data_df.shape[1]):
-                        value = data_df.iat[row_idx, col_idx]
-                        cell = table.cell(row_idx + 1, col_idx)
-                        cell.text = str(value) if not pd.isna(value) else ''
-                        cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-                # Замена метки
-                paragraph.text = ''
-                paragraph._element.addnext(table._element)
-                found = True
-                break
-
-        if not found:
+        table = insert_table(doc, search_text, all_data[2:16], columns)
+        if table is None:
             raise ValueError(f"Метка '{search_text}' не найдена в документе")
+        logging.info(f"Вставлено строк прогноза: {len(table.rows) - 1}")
 
-        output_path = os.path.join(os.path.dirname(word_path), 'KVD_For_Killing.docx')
+        output_path = os.path.join(output_dir or os.path.dirname(word_path), 'KVD_For_Killing.docx')
         doc.save(output_path)
         logging.info(f"Документ сохранен: {output_path}")
         return output_path
@@ -850,20 +873,61 @@ def copy_excel_to_word_pandas(excel_path, word_path, sheet_name, search_text):
         return None
 
 
+def update_helper_workbook(data, flush=True):
+    """
+    Добавляет строку с данными отчета в журнал Helper.xlsm и при flush переносит журнал в книгу.
+    Возвращает False, если Helper.xlsm не найден.
+    """
+    excel_file_path_helper = resource_path("Helper.xlsm")
+    if not os.path.exists(excel_file_path_helper):
+        logger.warning(f"Файл Helper.xlsm не найден: {excel_file_path_helper}")
+        return False
+
+    HELPER_JOURNAL.append(helper_row(data))
+    if flush:
+        flush_helper_journal()
+    return True
+
+
+def flush_helper_journal():
+    """Записывает накопленные строки в Helper.xlsm; при ошибке они остаются в журнале"""
+    try:
+        HELPER_JOURNAL.flush(resource_path("Helper.xlsm"), OFFICE_POOL)
+    except Exception as e:
+        logger.error(f"Ошибка при работе с Helper.xlsm (строки остались в журнале): {str(e)}")
+
+
 # --------------------------------------------------------------------------------------------------------------
-def generate_report_logic(doc, output_file_path, selected_template):
-    import win32com.client
+def insert_history_table(doc, previous_data_path, well_num, template_index=None):
+    """Таблица всех предыдущих исследований скважины на месте метки HISTORY_TABLE"""
+    from docx_tables import Column, find_placeholder, format_date, format_number, format_text, superscript_units, \
+        insert_table
+    from well_history import DATE_COLUMN
+
+    anchors = document_anchors(doc, template_index)
+    if find_placeholder(doc, HISTORY_TABLE, anchors) is None:
+        return
+    columns = [Column(DATE_COLUMN, DATE_COLUMN, format_date())]
+    columns += [Column(superscript_units(key.strip()), key, format_text if digits is None else format_number(digits))
+                for key, digits in HISTORY_COLUMNS.items()]
+    tests = WELL_HISTORY.tests(previous_data_path, well_num)
+    insert_table(doc, HISTORY_TABLE, tests, columns, anchors=anchors)
+    logging.info(f"Таблица истории скважины {well_num}: {len(tests)} исследований")
+
+
+def generate_report_logic(doc, output_file_path, selected_template, template_index=None, workbook_path=None,
+                          update_helper=True, flush_helper=True, job=None, save_workbook=False,
+                          strict_history=False, sheet=None):
     import os
     import docx
     from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
     import pandas as pd
     from datetime import datetime
     import logging
-    import pythoncom
 
     logging.info(f"Начало формирования отчета. Выходной файл: {output_file_path}, Шаблон: {selected_template}")
+    workbook_path = workbook_path or resource_path("Report.xlsx")
     try:
-        import win32com.client
         logging.info(f"Output file path: {output_file_path}")
         logging.info(f"Selected template: {selected_template}")
 
@@ -887,34 +951,15 @@ def generate_report_logic(doc, output_file_path, selected_template):
             doc_word = None
 
             try:
-                # Инициализация COM
-                logging.info("Инициализация COM-объектов")
-                pythoncom.CoInitialize()
-
                 # Открываем Excel-файл-----------------------------------------
+                # Формулы листа вычисляются без запуска Excel
                 logging.info("Открытие Excel-файла")
-                excel_app = win32com.client.DispatchEx("Excel.Application")
-                excel_app.Visible = False  # Наш экземпляр будет невидимым
-                excel_app.DisplayAlerts = False
-
-                workbook = excel_app.Workbooks.Open(resource_path("Report.xlsx"))
-                sheet = workbook.Sheets('current')
+                if sheet is None:
+                    with span("загрузка книги"):
+                        sheet = EvaluatedSheet(workbook_path, 'current')
 
                 # Выбор шаблона Word
-                template_map = {
-                    "КВД_Заполярка": templates_path("KVD_Zapolyarka.docx"),
-                    "КВД_Оренбург": templates_path("KVD_Orenburg.docx"),
-                    "КВД_Оренбург_газ": templates_path("KVD_Orenburg_gas.docx"),
-                    "КВД_Оренбург2": templates_path("KVD_Orenburg2.docx"),
-                    "КВД_Хантос": templates_path("KVD_Khantos.docx"),
-                    "КВД_глушение": templates_path("KVD_For_Killing.docx"),
-                    "КВД_ННГ": templates_path("KVD_NNG.docx"),
-                    "КВД+ИД": templates_path("KVD_ID.docx"),
-                    "КСД": templates_path("KSD.docx"),
-                    "КПД": templates_path("KPD.docx"),
-                    "КПД+ИД": templates_path("KPD_ID.docx"),
-                    "ГРП": templates_path("GRP.docx")
-                }
+                template_map = {key: templates_path(name) for key, name in TEMPLATE_FILES.items()}
 
 
                 # Преобразуем ключи в нижний регистр для сравнения
@@ -949,29 +994,17 @@ def generate_report_logic(doc, output_file_path, selected_template):
                 try:
                     if os.path.exists(previous_data_path):
 
-                        # Если файл существует, пытаемся его прочитать
+                        # Если файл существует, берем последнее исследование скважины из хранилища
                         try:
-                            final_table_df = pd.read_excel(previous_data_path, skiprows=11)
                             well_num = sheet.Range('B3').Value.split()[0]
                             logging.info(f"Скважина: {well_num}")
 
-                            # Фильтруем данные по номеру скважины
-                            final_table_df['Скважина'] = final_table_df['Скважина'].astype(str).str.strip()
-                            final_table_df = final_table_df.dropna(subset=['Скважина'])
-                            filtered_data = final_table_df[final_table_df['Скважина'] == well_num]
+                            with span("история скважины"):
+                                latest_entry = WELL_HISTORY.latest_test(previous_data_path, well_num)
 
-                            if filtered_data.empty:
+                            if latest_entry is None:
                                 logging.warning(f"Данные для скважины '{well_num}' не найдены в файле Excel.")
-                                filtered_data = None  # Устанавливаем filtered_data в None
                             else:
-                                # Обработка данных из файла
-                                pd.set_option('mode.use_inf_as_na', True)
-                                filtered_data.loc[:, 'Дата испытания'] = filtered_data['Дата испытания'].apply(
-                                    lambda x: datetime.strptime(x, "%d.%m.%Y") if isinstance(x, str) else x
-                                )
-
-                                latest_entry = filtered_data.loc[filtered_data['Дата испытания'].idxmax()]
-
                                 p_pl_value = latest_entry['Рпл  на ВНК, кгс/см2']
                                 # if isinstance(p_pl_value, (int, float)):
                                 sheet.Range('A23').Value = float(p_pl_value)
@@ -981,14 +1014,6 @@ def generate_report_logic(doc, output_file_path, selected_template):
                                 print(f'p_pl_value = {p_pl_value}')
                                 logging.info(f'p_pl_value = {p_pl_value}')
 
-                                workbook.Save()
-
-                                # Нормализуем строки в DataFrame
-                                final_table_df = final_table_df.map(
-                                    lambda x: normalize_string(x) if isinstance(x, str) else x)
-                                # Нормализация названий столбцов в DataFrame
-                                final_table_df.columns = [normalize_string(col) for col in final_table_df.columns]
-
                                 result_dict = {
                                     normalize_string('Рпл  на ВНК, кгс/см2'): latest_entry['Рпл  на ВНК, кгс/см2'],
                                     normalize_string('Рзаб  на ВНК, кгс/см2'): latest_entry['Рзаб  на ВНК, кгс/см2'],
@@ -1014,325 +1039,85 @@ def generate_report_logic(doc, output_file_path, selected_template):
                                 # replace_plain_tags(doc, result_dict)
                                 # replace_tags_preserve_format(doc, result_dict)
                                 # replace_tags_preserve_context(doc, result_dict)
-                                replace_tags_only(doc, result_dict)
+                                with span("замена меток: история"):
+                                    replace_tags_only(doc, result_dict, template_index)
+                                with span("таблица истории"):
+                                    insert_history_table(doc, previous_data_path, well_num, template_index)
 
                                 logging.info("Данные из файла предыдущих исследований успешно загружены.")
 
                         except Exception as e:
                             logging.error(f"Ошибка при чтении файла предыдущих данных Excel: {str(e)}")
+                            if strict_history:
+                                raise
 
                     else:
                         # Если файл не найден, выводим сообщение и продолжаем выполнение программы
                         logging.warning(f"Файл предыдущих данных не найден: {previous_data_path}")
-                        filtered_data = None  # Устанавливаем filtered_data в None
                         logging.info("Для данного отчета не требуется файл с предыдущими данными.")
 
                 except Exception as e:
                     logging.error(f"Ошибка при работе с историческими данными: {e}", exc_info=True)
+                    if strict_history:
+                        # Пакетный режим: отчет без истории — ошибка задания
+                        raise RuntimeError(f"Не удалось загрузить предыдущие исследования скважины: {e}") from e
                     # Продолжаем формирование отчёта
 
-                workbook.Save()
-
-                # Создаем словарь data
-                result_day = calculate_r_difference(resource_path('Report.xlsx'))
-                if sheet.Range('B66').Value == "Горизонтальная с ГРП":
-                    Leff1 = round(sheet.Range('B118').Value) if sheet.Range('B118').Value else 0
-                else:
-                    Leff1 = round(sheet.Range('B84').Value) if sheet.Range('B84').Value else 0
-
-                KVD_density = round(sheet.Range('A20').Value, 3) if sheet.Range('A20').Value else 0
-                work_density = round(sheet.Range('A19').Value, 3) if sheet.Range('A19').Value else 0
-                if sheet.Range('A19').Value is None:
-                    density = f'{KVD_density} г/см3'
-                else:
-                    density = f'{KVD_density} г/см3 для пересчета участка КВД и {work_density} г/см3 - для пересчета цикла отработки скважины'
-
-                data = {
-                    "company": sheet.Range('B1').Value,
-                    "field": sheet.Range('B2').Value,
-                    "well": sheet.Range('B3').Value,
-                    "VNK": str(sheet.Range('B4').Value) if sheet.Range('B4').Value is not None else "",
-                    "date_research": convert_to_datetime(sheet.Range('B5').Value).strftime("%d.%m.%Y") if sheet.Range(
-                        'B5').Value else "",
-                    "date_researcf": convert_to_datetime(sheet.Range('C5').Value).strftime("%d.%m.%Y") if sheet.Range(
-                        'C5').Value else "",
-                    "formation": sheet.Range('B6').Value,
-                    "Plast1_H": sheet.Range('C6').Value,
-                    "Plast2_H": sheet.Range('C7').Value,
-                    "Plast3_H": sheet.Range('C8').Value,
-                    "Plast4_H": sheet.Range('C9').Value,
-                    "perforation_interval": str(sheet.Range('B7').Value) if sheet.Range('B7').Value is not None else "",
-                    "device": sheet.Range('B8').Value,
-                    "depth": sheet.Range('B9').Value,
-                    "interpreter": sheet.Range('B10').Value,
-                    "date_of_interpretation": convert_to_datetime(sheet.Range('C11').Value).strftime(
-                        "%d.%m.%Y") if sheet.Range(
-                        'C11').Value else "",
-                    "date_of_analiz": convert_to_datetime(sheet.Range('B11').Value).strftime("%d.%m.%Y") if sheet.Range(
-                        'B11').Value else "",
-                    "time": sheet.Range('B12').Value,
-                    "water": sheet.Range('B13').Value,
-                    "packer": sheet.Range('B14').Value,
-                    "date_GRP": convert_to_datetime(sheet.Range('B15').Value).strftime(
-                        "%d.%m.%Y") if convert_to_datetime(
-                        sheet.Range('B15').Value) else "",
-                    "type_of_research": sheet.Range('B16').Value,
-                    "H_eff": sheet.Range('B46').Value,
-                    "P_pl_zam": round(sheet.Range('B35').Value, 1) if sheet.Range('B35').Value else 0,
-                    "P_pl_vdp": round(sheet.Range('B36').Value, 1) if sheet.Range('B36').Value else 0,
-                    "P_pl_вдп2": round(sheet.Range('C36').Value, 1) if sheet.Range('C36').Value else 0,
-                    "P_pl_gnk": round(sheet.Range('B37').Value, 1) if sheet.Range('B37').Value else 0,
-                    "P_pl_vnk": round(sheet.Range('B38').Value, 1) if sheet.Range('B38').Value else 0,
-                    "P_pl_внк2": round(sheet.Range('C38').Value, 1) if sheet.Range('C38').Value else 0,
-                    "P_pl_внк3": round(sheet.Range('C30').Value, 1) if sheet.Range('C30').Value else 0,
-                    "P_pl_внк4": round(sheet.Range('C35').Value, 1) if sheet.Range('C35').Value else 0,
-                    "Durat": round(sheet.Range('J4').Value) if sheet.Range('J4').Value else 0,
-                    "duration": round(sheet.Range('B12').Value) if sheet.Range('B12').Value else 0,
-                    "density": density,
-                    "Qoil": round(sheet.Range('B20').Value, 1) if sheet.Range('B20').Value else 0,
-                    "klass": round(sheet.Range('C14').Value) if sheet.Range('C14').Value else 0,
-                    "success": round(sheet.Range('C16').Value) if sheet.Range('C16').Value else 0,
-                    "P_zab_zam": round(sheet.Range('B39').Value, 1) if sheet.Range('B39').Value else 0,
-                    "P_zab_vdp": round(sheet.Range('B40').Value, 1) if sheet.Range('B40').Value else 0,
-                    "P_zab_gnk": round(sheet.Range('B41').Value, 1) if sheet.Range('B41').Value else 0,
-                    "P1_zab_vnk": round(sheet.Range('B42').Value, 1) if sheet.Range('B42').Value else 0,
-                    "P1_zab_vn2": round(sheet.Range('C42').Value, 1) if sheet.Range('C42').Value else 0,
-                    "P2_zab_vnk": round(sheet.Range('B43').Value, 1) if sheet.Range('B43').Value else 0,
-                    "productivity": round(sheet.Range('C19').Value, 2) if sheet.Range('C19').Value else 0,
-                    "Kh/Mu": round(sheet.Range('B49').Value, 2) if sheet.Range('B49').Value else 0,
-                    "delta": abs(round(sheet.Range('B23').Value, 1)) if sheet.Range('B23').Value else 0,
-                    "Phi": round(sheet.Range('B62').Value, 2),
-                    "model": sheet.Range('B66').Value,
-                    "plast": sheet.Range('B67').Value,
-                    "layer": sheet.Range('B68').Value,
-                    "Cs": round(sheet.Range('B73').Value, 4) if sheet.Range('B73').Value else 0,
-                    "integ_skin1": round(sheet.Range('B74').Value, 2) if sheet.Range('B74').Value else 0,
-                    "integ_skin2": round(sheet.Range('C74').Value, 2) if sheet.Range('C74').Value else 0,
-                    "permeability1": round(sheet.Range('B90').Value, 2) if sheet.Range('B90').Value else 0,
-                    "Delta Q": round(sheet.Range('B100').Value, 1) if sheet.Range('B100').Value else 0,
-                    "B_oil": round(sheet.Range('B113').Value, 2) if sheet.Range('B113').Value else 0,
-                    "viscosity": round(sheet.Range('B114').Value, 3) if sheet.Range('B114').Value else 0,
-                    "Compressibility": f"{float(sheet.Range('B115').Value):.1E}" if sheet.Range('B115').Value else "0",
-                    "num_frac1": round(sheet.Range('B120').Value) if sheet.Range('B120').Value else 0,
-                    "num_frac2": round(sheet.Range('C120').Value) if sheet.Range('C120').Value else 0,
-                    "Xf1": round(sheet.Range('B121').Value) if sheet.Range('B121').Value else 0,
-                    "Xf2": round(sheet.Range('C121').Value) if sheet.Range('C121').Value else 0,
-                    "permeability2": round(sheet.Range('C90').Value, 2) if sheet.Range('C90').Value else 0,
-                    "S_мех1": round(float(sheet.Range('B81').Value), 2) if isinstance(sheet.Range('B81').Value,
-                                                                                      (int, float)) or (
-                                                                                   isinstance(sheet.Range('B81').Value,
-                                                                                              str) and sheet.Range(
-                                                                               'B81').Value.replace('.', '',
-                                                                                                    1).isdigit()) else 0,
-                    "S_мех2": round(float(sheet.Range('C81').Value), 2) if isinstance(sheet.Range('C81').Value,
-                                                                                      (int, float)) or (
-                                                                                   isinstance(sheet.Range('C81').Value,
-                                                                                              str) and sheet.Range(
-                                                                               'C81').Value.replace('.', '',
-                                                                                                    1).isdigit()) else 0,
-                    "S_геом1": round(float(sheet.Range('B82').Value), 2) if isinstance(sheet.Range('B82').Value,
-                                                                                      (int, float)) or (
-                                                                                   isinstance(sheet.Range('B82').Value,
-                                                                                              str) and sheet.Range(
-                                                                               'B82').Value.replace('.', '',
-                                                                                                    1).isdigit()) else 0,
-                    "S_геом2": round(float(sheet.Range('C82').Value), 2) if isinstance(sheet.Range('C82').Value,
-                                                                                      (int, float)) or (
-                                                                                   isinstance(sheet.Range('C82').Value,
-                                                                                              str) and sheet.Range(
-                                                                               'C82').Value.replace('.', '',
-                                                                                                    1).isdigit()) else 0,
-                    "P1_2500": round(sheet.Range('AF1').Value, 1) if sheet.Range('AF1').Value else 0,
-                    "P1_8760": round(sheet.Range('AF2').Value, 1) if sheet.Range('AF2').Value else 0,
-                    "P1_17500": round(sheet.Range('AF3').Value, 1) if sheet.Range('AF3').Value else 0,
-                    "P1_26280": round(sheet.Range('AF4').Value, 1) if sheet.Range('AF4').Value else 0,
-                    "P2_2500": round(sheet.Range('AF5').Value, 1) if sheet.Range('AF5').Value else 0,
-                    "P2_8760": round(sheet.Range('AF6').Value, 1) if sheet.Range('AF6').Value else 0,
-                    "P2_17500": round(sheet.Range('AF7').Value, 1) if sheet.Range('AF7').Value else 0,
-                    "P2_26280": round(sheet.Range('AF8').Value, 1) if sheet.Range('AF8').Value else 0,
-                    "Pday": round(result_day, 2) if result_day is not None else 0.0,
-                    "Leff1": Leff1,
-                    "Leff2": round(sheet.Range('C84').Value) if sheet.Range('C84').Value else 0,
-                    "Pzb_dlta": round(sheet.Range('C44').Value, 2) if sheet.Range('C44').Value else 0,
-                    "R_inv1": round(sheet.Range('B106').Value, 2) if sheet.Range('B106').Value else 0,
-                    "R_inv2": round(sheet.Range('C106').Value, 2) if sheet.Range('C106').Value else 0,
-                    "dens1": work_density,
-                    "dens2": KVD_density,
-                    "P_asa": round(sheet.Range('B137').Value, 1) if sheet.Range('B137').Value else 0,
-                    "Tzakr": round(sheet.Range('B127').Value, 2) if sheet.Range('B127').Value else 0,
-                    "Pzakr": round(sheet.Range('B128').Value, 1) if sheet.Range('B128').Value else 0,
-                    "ISIIP": round(sheet.Range('B129').Value, 1) if sheet.Range('B129').Value else 0,
-                    "Frac_eff": round(sheet.Range('B131').Value, 2) if sheet.Range('B131').Value else 0,
-                    "Mobil": round(sheet.Range('B139').Value, 1) if sheet.Range('B139').Value else 0,
-                    "Pi_1": round(sheet.Range('B77').Value, 2) if sheet.Range('B77').Value else 0,
-                    "Pi_2": round(sheet.Range('C77').Value, 2) if sheet.Range('C77').Value else 0,
-                    "Pi_12": round(sheet.Range('C25').Value, 2) if sheet.Range('C25').Value else 0,
-                    "P22_zab_vnk": round(sheet.Range('C39').Value, 2) if sheet.Range('C39').Value else 0,
-                    "P2_asa": round(sheet.Range('C137').Value, 2) if sheet.Range('C137').Value else 0,
-                    "Rinv_Ppl1": round(sheet.Range('B140').Value) if sheet.Range('B140').Value else 0,
-                    "µгаза1": round(sheet.Range('B141').Value, 4) if sheet.Range('B141').Value else 0,
-                    "Bg1": round(sheet.Range('B142').Value, 4) if sheet.Range('B142').Value else 0,
-                    "µгаза2": round(sheet.Range('C141').Value, 4) if sheet.Range('C141').Value else 0,
-                    "Bg2": round(sheet.Range('C142').Value, 4) if sheet.Range('C142').Value else 0,
-                    "fluid": sheet.Range('B58').Value,
-                    "Fc1": round(sheet.Range('B144').Value, 4) if sheet.Range('B144').Value else 0,
-                }
-
-                model_params = {
-                    "Вертикальная": {
-                        "additional_params": [],  # Нет дополнительных параметров
-                        "diagnostic_text": "model_descriptions.Вертикальная"
-                    },
-                    "Наклонн.": {
-                        "additional_params": [],  # Нет дополнительных параметров
-                        "diagnostic_text": "model_descriptions.Наклонн."
-                    },
-                    "Вертикальная - частичное вскрытие": {
-                        "additional_params": [
-                            {"name": "Скин-фактор механический", "value": data.get("S_мех1"),
-                             "key": "S_мех1"},
-                            {"name": "Скин-фактор геометрический", "value": data.get("S_геом1"),
-                             "key": "S_геом1"},
-                            {"name": "Эффективная часть интервала перфорации (hw), (м)",
-                             "value": data.get("Leff1"), "key": "Leff1"}
-                        ],
-                        "diagnostic_text": "model_descriptions.Вертикальная - частичное вскрытие"
-                    },
-                    "Горизонтальн.": {
-                        "additional_params": [
-                            {"name": "Скин-фактор механический", "value": data.get("S_мех1"),
-                             "key": "S_мех1"},
-                            {"name": "Эффективная длина скважины, (м)", "value": data.get("Leff1"),
-                             "key": "Leff1"}
-                        ],
-                        "diagnostic_text": "model_descriptions.Горизонтальн."
-                    },
-                    "Горизонтальная с ГРП": {
-                        "additional_params": [
-                            {"name": "Скин-фактор механический", "value": data.get("S_мех1"),
-                             "key": "S_мех1"},
-                            {"name": "Количество трещин", "value": data.get("num_frac1"),
-                             "key": "num_frac1"},
-                            {"name": "Полудлина трещины, (м)", "value": data.get("Xf1"), "key": "Xf1"}
-                        ],
-                        "diagnostic_text": "model_descriptions.Горизонтальная с ГРП"
-                    },
-                    "Трещина - бесконечная проводимость": {
-                        "additional_params": [
-                            {"name": "Скин кольматации стенок трещины", "value": data.get("S_мех1"),
-                             "key": "S_мех1"},
-                            {"name": "Полудлина трещины, (м)", "value": data.get("Xf1"), "key": "Xf1"}
-                        ],
-                        "diagnostic_text": "model_descriptions.Трещина - бесконечная проводимость"
-                    },
-                    "Трещина - конечная проводимость": {
-                        "additional_params": [
-                            {"name": "Скин кольматации стенок трещины", "value": data.get("S_мех1"),
-                             "key": "S_мех1"},
-                            {"name": "Полудлина трещины, (м)", "value": data.get("Xf1"), "key": "Xf1"},
-                            {"name": "Проводимость трещины, (Fc)", "value": data.get("Fc1"),
-                             "key": "Fc1"}
-                        ],
-                        "diagnostic_text": "model_descriptions.Трещина - конечная проводимость"
-                    },
-                    "Трещина - равномерный поток": {
-                        "additional_params": [
-                            {"name": "Скин кольматации стенок трещины", "value": data.get("S_мех1"),
-                             "key": "S_мех1"},
-                            {"name": "Полудлина трещины, (м)", "value": data.get("Xf1"), "key": "Xf1"}
-                        ],
-                        "diagnostic_text": "model_descriptions.Трещина - равномерный поток"
-                    }
-                }
-
-
-                # Вставка параметров модели в таблицу результатов
-                def insert_model_params_to_table(doc, model_name, data):
-                    """Вставляет параметры модели после строки 'Проницаемость, (мД)'"""
-                    table = find_results_table(doc)
-                    if not table:
-                        logging.error("Таблица результатов не найдена")
-                        return False
-
-                    params = model_params.get(model_name, {}).get("additional_params", [])
-                    if not params:
-                        logging.warning(f"Нет дополнительных параметров для модели {model_name}")
-                        return False
-
-                    # Находим индекс строки с "Проницаемость, (мД)"
-                    target_row_idx = -1
-                    for i, row in enumerate(table.rows):
-                        if row.cells and "Проницаемость, (мД)" in row.cells[0].text:
-                            target_row_idx = i
-                            break
-
-                    if target_row_idx == -1:
-                        logging.error("Строка 'Проницаемость, (мД)' не найдена в таблице")
-                        return False
-
-                    # Вставляем параметры после найденной строки
-                    for param in params:
-                        new_row = table.add_row()
-                        table.rows._tbl.insert(target_row_idx + 1, new_row._tr)
-                        target_row_idx += 1
-
-                        # Форматируем и вставляем данные
-                        name = format_units(param["name"])
-                        value = format_units(str(param["value"]))
+                # A23 хранится в вычислителе; в файл книга пишется, только если об этом просят
+                if save_workbook:
+                    with span("запись A23"):
+                        sheet.save()
 
-                        new_row.cells[0].text = name
-                        new_row.cells[1].text = value
+                report_stage(job, "вычисление формул")
+                with span("извлечение данных"):
+                    # Создаем словарь data
+                    result_day = calculate_r_difference(workbook_path, evaluator=sheet.evaluator)
 
-                        # Устанавливаем выравнивание
-                        for paragraph in new_row.cells[0].paragraphs:
-                            paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-                            set_font_size(paragraph, 12)
-
-                        for paragraph in new_row.cells[1].paragraphs:
-                            paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-                            set_font_size(paragraph, 12)
+                    # Читаем лист одним блоком, дальше все значения берутся из памяти
+                    block = read_sheet_block(sheet, REPORT_FIELDS["block"])
+                    if block['B66'] == "Горизонтальная с ГРП":
+                        Leff1 = round(block['B118']) if block['B118'] else 0
+                    else:
+                        Leff1 = round(block['B84']) if block['B84'] else 0
 
-                    logging.info(f"Успешно вставлено {len(params)} параметров модели")
-                    return True
+                    KVD_density = round(block['A20'], 3) if block['A20'] else 0
+                    work_density = round(block['A19'], 3) if block['A19'] else 0
+                    if block['A19'] is None:
+                        density = f'{KVD_density} г/см3'
+                    else:
+                        density = f'{KVD_density} г/см3 для пересчета участка КВД и {work_density} г/см3 - для пересчета цикла отработки скважины'
 
+                    # Значения меток описаны в report_fields.json
+                    data = extract_report_data(block, REPORT_FIELDS, context={
+                        "density": density,
+                        "Pday": round(result_day, 2) if result_day is not None else 0.0,
+                        "Leff1": Leff1,
+                        "dens1": work_density,
+                        "dens2": KVD_density,
+                    })
 
                 # doc.save(output_file_path)
 
+                # Формулы вычислены — дальше заполнение текста документа
+                report_stage(job, "заполнение текста")
+
                 # Основной блок обработки документа
-                cell_value = str(sheet.Range('B66').Value).strip()
-
-                # Находим соответствующую модель
-                model_name = None
-                for key in model_params.keys():
-                    if cell_value.strip().lower() == key.strip().lower():
-                        model_name = key
-                        break
-
-                if model_name is None:
-                    for key in model_params.keys():
-                        if key.strip().lower() in cell_value.strip().lower():
-                            model_name = key
-                            break
-
-                if model_name is None:
-                    model_name = "Вертикальная"
-                    logging.warning(
-                        f"Предупреждение: Модель '{cell_value}' не найдена в model_params. Используется модель по умолчанию: {model_name}")
+                cell_value = str(block['B66']).strip()
 
-                # Добавляем параметры модели в словарь data
-                model_data = model_params.get(model_name, {})
-                # diagnostic_text = model_data.get("diagnostic_text", "")
+                # Находим соответствующую модель (model_registry.json)
+                model_name = MODEL_REGISTRY.resolve(cell_value)
 
                 # Получаем текст описания непосредственно из TEXT_TEMPLATES
                 model_description = TEXT_TEMPLATES["model_descriptions"].get(model_name, "")
                 if not model_description:
                     logging.warning(f"Описание для модели '{model_name}' не найдено в шаблонах")
 
+                # Добавляем параметры модели в словарь data
                 data.update({
                     "model_description": model_description,  # Используем текст напрямую из шаблонов
                     "model_name": model_name,
                     "diagnostic_text": model_description,  # Дублируем для совместимости
-                    **{f"param_{k}": v for k, v in enumerate(model_data.get("additional_params", []))},
+                    **{f"param_{k}": v for k, v in enumerate(MODEL_REGISTRY.params(model_name, data))},
                 })
 
                 # Применяем форматирование ко всем значениям в словаре data
@@ -1347,7 +1132,8 @@ def generate_report_logic(doc, output_file_path, selected_template):
                 # replace_plain_tags(doc, data)
                 # replace_tags_preserve_format(doc, data)
                 # replace_tags_preserve_context(doc, data)
-                replace_tags_only(doc, data)
+                with span("замена меток: данные"):
+                    replace_tags_only(doc, data, template_index)
 
                 # for paragraph in doc.paragraphs:
                 #     for run in paragraph.runs:
@@ -1365,144 +1151,63 @@ def generate_report_logic(doc, output_file_path, selected_template):
                 logging.info("Метки в отчете успешно заменены на значения.")
 
                 # Специальная обработка diagnostic_text
-                for paragraph in doc.paragraphs:
-                    if "{{diagnostic_text}}" in paragraph.text:
-                        # Сохраняем форматирование первого run
-                        if paragraph.runs:
-                            original_font = paragraph.runs[0].font
-
-                        paragraph.text = paragraph.text.replace(
-                            "{{diagnostic_text}}",
-                            data["model_description"]
-                        )
-
-                        # Восстанавливаем форматирование
-                        if paragraph.runs and original_font:
-                            paragraph.runs[0].font.name = original_font.name
-                            paragraph.runs[0].font.size = original_font.size
-                            paragraph.runs[0].font.bold = original_font.bold
-                            paragraph.runs[0].font.italic = original_font.italic
-                            paragraph.runs[0].font.underline = original_font.underline
-                            if original_font.color.rgb:
-                                paragraph.runs[0].font.color.rgb = original_font.color.rgb
+                with span("замена меток: diagnostic_text"):
+                    diagnostic_paragraphs = body_paragraphs(doc, template_index, ["{{diagnostic_text}}"])
+                    for paragraph in diagnostic_paragraphs:
+                        if "{{diagnostic_text}}" in paragraph.text:
+                            # Сохраняем форматирование первого run
+                            if paragraph.runs:
+                                original_font = paragraph.runs[0].font
+
+                            paragraph.text = paragraph.text.replace(
+                                "{{diagnostic_text}}",
+                                data["model_description"]
+                            )
+
+                            # Восстанавливаем форматирование
+                            if paragraph.runs and original_font:
+                                paragraph.runs[0].font.name = original_font.name
+                                paragraph.runs[0].font.size = original_font.size
+                                paragraph.runs[0].font.bold = original_font.bold
+                                paragraph.runs[0].font.italic = original_font.italic
+                                paragraph.runs[0].font.underline = original_font.underline
+                                if original_font.color.rgb:
+                                    paragraph.runs[0].font.color.rgb = original_font.color.rgb
 
                 # Вставка параметров модели в таблицу
-                if not insert_model_params_to_table(doc, model_name, data):
+                with span("параметры модели"):
+                    inserted = insert_model_rows(doc, MODEL_REGISTRY.result_rows(model_name, data), template_index)
+                if not inserted:
                     logging.warning("Не удалось вставить параметры модели в таблицу")
 
                 # Проверка и сохранение
-                if "{{diagnostic_text}}" in [p.text for p in doc.paragraphs]:
+                if "{{diagnostic_text}}" in [p.text for p in diagnostic_paragraphs]:
                     logging.error("Метка diagnostic_text не была заменена!")
                 else:
                     logging.info("метка diagnostic_text успешно заменена")
 
                 # Удаление лишних строк из таблицы результатов
-                replace_and_format_table(doc, data)
+                with span("таблица результатов"):
+                    replace_and_format_table(doc, data, template_index)
                 # fix_units(doc)
 
-                doc.save(output_file_path)
+                # Документ не сохраняется здесь: build_report записывает его один раз после fix_units
                 logging.info(f"Data dictionary content: {json.dumps(data, indent=2, ensure_ascii=False)}")
                 # Сохраняем результат
                 # output_file_path = os.path.join(output_directory,
                 #                                 f'Закл_{data["type_of_research"]}_{data["field"]}_{data["well"]}_{data["date_research"]}.doc')
 
                 # Внесение данных в Helper----------------------------------------------------------
-                try:
-                    excel = win32com.client.DispatchEx("Excel.Application")
-                    excel.Visible = False
-                    workbook = excel.Workbooks.Open(resource_path("Report.xlsx"))
-                    sheet = workbook.Sheets('current')
-
-                    logger.info("Начало обновления Helper.xlsm")
-
-                    new_row = {
-                        "Дата интерпретации": data.get("date_of_analiz"),
-                        "Дата начала исследования": data.get("date_research"),
-                        "Дата конца исследования": data.get("date_researcf"),
-                        "ДО": data.get("company"),
-                        "Месторождение": data.get("field"),
-                        "Пласт": data.get("formation"),
-                        "Куст": data.get("well").split()[2] if len(data.get("well", "").split()) > 1 else data.get(
-                            "well",
-                            ""),
-                        "№скв.": data.get("well").split()[0] if len(data.get("well", "").split()) > 1 else data.get(
-                            "well",
-                            ""),
-                        "Категория скважин": "доб",
-                        "Вид исследования": data.get("type_of_research"),
-                        "Исполнитель (организация)": "ИТС",
-                        "Интерпретатор": data.get("interpreter"),
-                        "Наличие в базе": "база",
-                        "Оборудование": data.get("device").split()[1] if len(
-                            data.get("device", "").split()) > 1 else data.get(
-                            "device",
-                            ""),
-                        "Назначение": "Запрос ДО",
-                        "Класс исследования": data.get("klass"),
-                        "Успешность": data.get("success"),
-                        "Длительность факт": data.get("duration"),
-                        "Qн": data.get("Qoil")
-                    }
-
-                    # Открытие файла Excel 2
-                    logging.info("Обновление Helper.xlsm")
-                    excel_helper = win32com.client.DispatchEx("Excel.Application")
-                    excel_helper.Visible = False
-                    excel_helper.DisplayAlerts = False
-
-                    excel_file_path_helper = resource_path("Helper.xlsm")
-                    if not os.path.exists(excel_file_path_helper):
-                        logger.warning(f"Файл Helper.xlsm не найден: {excel_file_path_helper}")
+                if update_helper:
+                    with span("Helper.xlsm"):
+                        helper_updated = update_helper_workbook(data, flush_helper)
+                    if not helper_updated:
                         return False
 
-                    # Открываем Helper.xlsm
-                    workbook2 = excel_helper.Workbooks.Open(excel_file_path_helper)
-                    sheet1 = workbook2.Sheets['Sheet1']
-
-                    # Находим первую полностью пустую строку
-                    # empty_row_index = find_first_empty_row(sheet1)
-                    empty_row_index = sheet1.Cells(sheet1.Rows.Count, 4).End(
-                        -4162).Row + 1  # -4162 is the constant for xlUp
-
-                    # Добавляем значения из словаря в соответствующие столбцы
-                    for key, value in new_row.items():
-                        # Получаем индекс столбца по имени
-                        column_index = None
-                        for col in sheet1.Range(sheet1.Cells(1, 1), sheet1.Cells(1, sheet1.Columns.Count)).Columns:
-                            if col.Cells(1, 1).Value == key:
-                                column_index = col.Cells(1, 1).Column
-                                break
-
-                        # Если столбец найден, добавляем значение
-                        if column_index is not None:
-                            sheet1.Cells(empty_row_index, column_index).Value = value
-
-                    # Сохраняем книгу с поддержкой макросов
-                    workbook2.Save()  # FileFormat=52 - это код для формата .xlsm
-                    logger.info("Данные успешно записаны в Helper.xlsm")
-
-                except Exception as e:
-                    logger.error(f"Ошибка при работе с Helper.xlsm: {str(e)}")
-                finally:
-                    if 'workbook' in locals() and workbook is not None:
-                        try:
-                            workbook.Close(SaveChanges=False)
-                        except Exception as e:
-                            logging.warning(f"Ошибка при закрытии Workbook: {str(e)}")
-
-                    if 'workbook2' in locals() and workbook2:
-                        try:
-                            workbook2.Close(SaveChanges=True)
-                        except Exception as e:
-                            logging.warning(f"Ошибка при закрытии Workbook2 (Helper.xlsm): {str(e)}")
-                    excel_helper = None
-                    excel = None
-                    workbook = None  # Обнуляем ссылки
-                    workbook2 = None
-
-                    # safe_quit_office(excel_file_path_helper, False)
                 logger.info("Отчет успешно сформирован!")
 
+            except JobCancelled:
+                raise
             except Exception as e:
                 logging.error(f"Ошибка при работе с Helper.xlsm: {str(e)}", exc_info=True)
                 raise RuntimeError(f"Ошибка формирования отчета: {str(e)}")
@@ -1523,12 +1228,16 @@ def generate_report_logic(doc, output_file_path, selected_template):
 
                 # pythoncom.CoUninitialize()
 
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f"Ошибка при формировании отчета: {str(e)}")
             raise RuntimeError(f"Ошибка при формировании отчета: {str(e)}")
 
         return True
 
+    except JobCancelled:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()  # Вывод полного стека ошибки
@@ -1538,14 +1247,23 @@ def generate_report_logic(doc, output_file_path, selected_template):
 
 # PDFReader-----------------------------------------------------------------------------------
 class PDFReader:
-    def __init__(self, pdf_path, output_dir="plots"):
+    # Разрешение и область графика на странице (в пикселях при DPI)
+    DPI = 200
+    CROP_BOX = (150, 300, 1500, 1100)  # x0, y0, x1, y1
+
+    def __init__(self, pdf_path, output_dir="plots", workers=None, cache=None):
         """
         Инициализация класса для работы с PDF.
         :param pdf_path: Путь к PDF-файлу.
         :param output_dir: Папка для сохранения изображений.
+        :param workers: Число процессов для отрисовки (1 — без пула, None — по числу ядер).
+        :param cache: RenderCache; страницы из кеша не рисуются повторно.
         """
         self.pdf_path = pdf_path
         self.output_dir = output_dir
+        self.workers = workers or default_workers()
+        self.cache = cache
+        self.doc = None
         self.pages = []
         self.result_list = []
 
@@ -1576,8 +1294,8 @@ class PDFReader:
         Загружает все страницы PDF.
         """
         try:
-            doc = fitz.open(self.pdf_path)
-            self.pages = [page for page in doc]
+            self.doc = fitz.open(self.pdf_path)
+            self.pages = [page for page in self.doc]
         except Exception as e:
             print(f"Ошибка при загрузке PDF: {e}")
 
@@ -1589,11 +1307,9 @@ class PDFReader:
             text = page.get_text("text")
             self.result_list.append(text)
 
-    def plot(self, inner_type_page, page_number):
-        """
-        Сохраняет изображение с указанной страницы PDF.
-        Если график встречается дважды, добавляет уникальный суффикс к имени файла.
-        """
+    @staticmethod
+    def plot_type(inner_type_page):
+        """Тип графика для имени файла по первому слову страницы"""
         trans = {
             "Граф": "Graph",
             "Полулогарифмический": "Semi",
@@ -1604,11 +1320,15 @@ class PDFReader:
             "Аса": "АСА",
         }
 
-        if inner_type_page in trans:
-            inner_type_page = trans[inner_type_page]
+        return trans.get(inner_type_page, inner_type_page)
 
+    def plot(self, inner_type_page, page_number):
+        """
+        Сохраняет изображение с указанной страницы PDF.
+        Если график встречается дважды, добавляет уникальный суффикс к имени файла.
+        """
         # Генерируем уникальное имя файла с учетом возможных дубликатов
-        base_name = f"cropped_image_{inner_type_page}"
+        base_name = f"cropped_image_{self.plot_type(inner_type_page)}"
         suffix = 1
         while True:
             output_name = f"{base_name}_{suffix}.png"  # Добавляем суффикс
@@ -1617,34 +1337,227 @@ class PDFReader:
                 break
             suffix += 1
 
-        # Открываем PDF и сохраняем изображение
-        doc = fitz.open(self.pdf_path)
-        page = doc.load_page(page_number)
-        pix = page.get_pixmap(dpi=200)
-        pix.save(output_path)
-
-        # Обрезаем изображение
-        image = cv2.imdecode(np.fromfile(output_path, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
-        cropped_image = image[300:1100, 150:1500]
-        cv2.imwrite(output_path, cropped_image)
+        # Рисуем только область графика и сохраняем изображение один раз
+        self.render_clip(page_number).save(output_path)
 
         return output_path
 
+    def render_clip(self, page_number):
+        """
+        Рисует область графика страницы через clip-прямоугольник.
+        Возвращает fitz.Pixmap; байты PNG без записи на диск — pixmap.tobytes("png").
+        """
+        return render_clip(self.doc, page_number, self.DPI, self.CROP_BOX)
+
+    def plan_plots(self):
+        """
+        Список (номер страницы, путь PNG) для страниц с графиками.
+        Суффиксы (Log_1, Log_2, ...) назначаются по порядку страниц.
+        """
+        counters = {}
+        jobs = []
+        for page_number, page_text in enumerate(self.result_list):
+            type_page = re.search(r'^\w+', page_text)
+            if type_page:
+                plot_type = self.plot_type(type_page.group())
+                counters[plot_type] = counters.get(plot_type, 0) + 1
+                output_name = f"cropped_image_{plot_type}_{counters[plot_type]}.png"
+                jobs.append((page_number, os.path.join(self.output_dir, output_name)))
+        return jobs
+
     def process_pdf(self):
         """
         Основной метод для обработки PDF.
+        Большие PDF рисуются в пуле процессов, небольшие — в текущем процессе.
         """
         self.extract_text()
-        for page_number, page_text in enumerate(self.result_list):
-            type_page_reg = r'^\w+'
-            type_page = re.search(type_page_reg, page_text)
-            if type_page:
-                graphic = self.plot(type_page.group(), page_number)
-                print(f"Сохранено изображение: {graphic}")
+        jobs = self.plan_plots()
+
+        if self.cache is None:
+            self.render_jobs(jobs)
+        else:
+            # Рисуем в кеш только отсутствующие там страницы, затем копируем в output_dir
+            pdf_hash = file_hash(self.pdf_path)
+            cached = []
+            missing = []
+            for page_number, output_path in jobs:
+                key = self.cache.key(pdf_hash, page_number, self.DPI, self.CROP_BOX)
+                cached.append((self.cache.path(key), output_path))
+                if self.cache.get(key) is None:
+                    missing.append((page_number, self.cache.path(key)))
+
+            logging.info(f"Графики из кеша: {len(jobs) - len(missing)}, отрисовка: {len(missing)}")
+            self.render_jobs(missing)
+            for cache_path, output_path in cached:
+                shutil.copyfile(cache_path, output_path)
+            self.cache.evict()
+
+        for page_number, graphic in jobs:
+            print(f"Сохранено изображение: {graphic}")
+
+    def render_jobs(self, jobs):
+        """Рисует страницы jobs (номер страницы, путь PNG) в пуле процессов или в текущем процессе"""
+        if self.workers > 1 and len(jobs) >= PARALLEL_MIN_PAGES:
+            render_pages(self.pdf_path, jobs, self.DPI, self.CROP_BOX, self.workers)
+        else:
+            for page_number, output_path in jobs:
+                save_png(self.render_clip(page_number), output_path)
 
 
 
 
+def insert_plot_images(doc, pdf_path, template_index=None, plots_dir="plots", workers=None):
+    """Вставляет изображения из PDF в Word-документ на места меток {{PictureN}}"""
+    pdf_reader = PDFReader(pdf_path, output_dir=plots_dir, workers=workers, cache=PLOT_CACHE)
+    with span("отрисовка PDF"):
+        pdf_reader.process_pdf()
+
+    # Сопоставление типов графиков с метками
+    image_mapping = {
+        "Graph_1": "{{Picture3}}",  # Граф.Хорнера
+        "Log_1": "{{Picture2}}",  # Диагностический (log)
+        "Log_2": "{{Picture6}}",  # Диагностический сравнение
+        "Semi_1": "{{Picture4}}",  # Полулогарифмический (semi),
+        "History_1": "{{Picture1}}", # Обзорный на ВНК
+        "History_2": "{{Picture7}}",  # Обзорный на ВНК сравнение
+        "Map_1": "{{Picture5}}", # Карта
+        "ACA_1": "{{Picture8}}",  # АСА график
+    }
+
+    # Абзацы с метками изображений — из индекса якорей, без обхода всех параграфов и таблиц
+    anchors = document_anchors(doc, template_index)
+    for image_type, placeholder in image_mapping.items():
+        image_path = os.path.join(plots_dir, f"cropped_image_{image_type}.png")
+        for paragraph, in_table in anchors.placeholders(placeholder):
+            if placeholder in paragraph.text and os.path.exists(image_path):
+                paragraph.text = paragraph.text.replace(placeholder, "")
+                run = paragraph.add_run()
+                # В таблицах — меньший размер
+                run.add_picture(image_path, width=Inches(4 if in_table else 6))
+                paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+                logging.info(f"Вставлено изображение {image_type} на место {placeholder}")
+
+
+def resolve_template(template_key, workbook_path, work_dir=None, sheet=None):
+    """
+    Путь к файлу шаблона по ключу.
+    Для 'КВД_глушение' шаблон собирается из листа книги workbook_path (или загруженного sheet) в work_dir.
+    """
+    if template_key not in TEMPLATE_FILES:
+        raise ValueError(f"Шаблон '{template_key}' не найден! Доступные шаблоны: {list(TEMPLATE_FILES)}")
+
+    if template_key.lower() == "квд_глушение":
+        logging.info("Создание файла KVD_For_Killing.docx...")
+        result = copy_excel_to_word_pandas(
+            excel_path=workbook_path,
+            word_path=os.path.abspath(templates_path('КВД для глушения_prev.docx')),
+            sheet_name='current',
+            search_text='Prognoz_Ppl',
+            output_dir=work_dir,
+            sheet=sheet
+        )
+        if result is None:
+            logging.error("Ошибка: copy_excel_to_word_pandas вернул None")
+            raise RuntimeError("Не удалось создать временный Word-документ")
+        logging.info(f"Файл KVD_For_Killing.docx успешно создан: {result}")
+        return result
+
+    template_path = templates_path(TEMPLATE_FILES[template_key])
+    if not os.path.exists(template_path):
+        raise FileNotFoundError(f"Шаблон не найден: {template_path}")
+    return template_path
+
+
+def insert_pressure_tables(doc, workbook_path, template_index=None, evaluator=None):
+    """
+    Таблицы рядов давления (дата, давление) на месте меток PRESSURE_TABLES.
+    Столбцы берутся из evaluator уже загруженного листа, если он передан.
+    """
+    from docx_tables import Column, find_placeholder, format_date, format_number, insert_table
+    from pressure_series import read_pressure_columns
+
+    date_formatter = format_date("%d.%m.%Y %H:%M")
+    columns = [Column("Дата, время", 0, date_formatter), Column("Давление, кгс/см²", 1, format_number(2))]
+    anchors = document_anchors(doc, template_index)
+    for placeholder, (date_column, value_column) in PRESSURE_TABLES.items():
+        if find_placeholder(doc, placeholder, anchors) is None:
+            continue
+        _, dates, values = read_pressure_columns(workbook_path, date_column=date_column, value_column=value_column,
+                                                 evaluator=evaluator)
+        # Строки без даты (заголовок листа, пустые строки) в таблицу не попадают
+        rows = [(date, value) for date, value in zip(dates, values) if date_formatter(date)]
+        table = insert_table(doc, placeholder, rows, columns, anchors=anchors)
+        logging.info(f"Таблица {placeholder}: {len(table.rows)} строк")
+
+
+def build_report(template_key, output_file_path, workbook_path=None, pdf_path=None, plots_dir="plots",
+                 update_helper=True, work_dir=None, pdf_workers=None, output_format="docx", converter=None,
+                 flush_helper=True, job=None, save_workbook=False, strict_history=False):
+    """
+    Формирует отчет без участия GUI: шаблон, изображения из PDF, метки, единицы измерения.
+
+    :param template_key: ключ шаблона из TEMPLATE_FILES
+    :param output_file_path: путь или открытый двоичный файл для отчета
+    :param workbook_path: книга с данными исследования (по умолчанию Report.xlsx)
+    :param pdf_path: PDF интерпретации; без него изображения не вставляются
+    :param plots_dir: папка для изображений графиков
+    :param update_helper: добавлять ли строку в Helper.xlsm
+    :param flush_helper: записать ли строку в Helper.xlsm сразу (иначе она остается в журнале)
+    :param work_dir: папка для промежуточных файлов (шаблон 'КВД_глушение')
+    :param pdf_workers: число процессов отрисовки PDF
+    :param output_format: формат отчета из OUTPUT_FORMATS ('docx', 'doc', 'pdf')
+    :param converter: конвертер .doc/.pdf (по умолчанию OFFICE_CONVERTER)
+    :param job: фоновое задание; между этапами проверяется его отмена (JobCancelled)
+    :param save_workbook: записать ли измененные входные ячейки (A23) в workbook_path
+    :param strict_history: ошибка чтения предыдущих исследований прерывает отчет (иначе только пишется в журнал)
+    :return: True, если отчет сформирован
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Неизвестный формат отчета: {output_format}")
+    workbook_path = workbook_path or resource_path("Report.xlsx")
+    # Лист загружается один раз: из него читают шаблон 'КВД_глушение', метки и таблицы давления
+    with span("загрузка книги"):
+        sheet = EvaluatedSheet(workbook_path, 'current')
+    with span("шаблон"):
+        template_path = resolve_template(template_key, workbook_path, work_dir, sheet)
+        logging.info(f"Путь к шаблону Word: {template_path}")
+
+        doc = Document(template_path)
+        template_index = TEMPLATE_INDEX.get(template_path, doc)
+
+    if pdf_path:
+        report_stage(job, "изображения из PDF")
+        with span("вставка изображений"):
+            insert_plot_images(doc, pdf_path, template_index, plots_dir, pdf_workers)
+    else:
+        logging.warning("PDF файл не выбран, пропускаем вставку изображений")
+
+    logging.info(f"Вызов generate_report_logic с параметрами: {output_file_path}, {template_key}")
+    with span("данные и метки"):
+        success = generate_report_logic(doc, output_file_path, template_key, template_index,
+                                        workbook_path=workbook_path, update_helper=update_helper,
+                                        flush_helper=flush_helper, job=job, save_workbook=save_workbook,
+                                        strict_history=strict_history, sheet=sheet)
+    if success:
+        report_stage(job, "таблицы давления")
+        with span("таблицы давления"):
+            insert_pressure_tables(doc, workbook_path, template_index, sheet.evaluator)
+    with span("fix_units"):
+        fix_units(doc, template_index)
+    if success:
+        report_stage(job, f"запись {OUTPUT_FORMATS[output_format]}")
+        # Все проходы выполнены над документом в памяти — единственная запись
+        with span("запись отчета", format=output_format):
+            write_report(doc, output_file_path, output_format, converter or OFFICE_CONVERTER)
+    return success
+
+
+def report_trace_path(output_file_path, trace_dir=None):
+    """Путь трассы этапов отчета (JSON Chrome trace-event)"""
+    name = os.path.splitext(os.path.basename(output_file_path))[0]
+    return os.path.join(trace_dir or TRACE_DIR, f"{name}.trace.json")
+
+
 # GUI--------------------------------------------------------------------------------
 
 def ensure_python_dll():
@@ -1664,12 +1577,8 @@ def ensure_python_dll():
 # Вызов функции в начале работы программы
 # ensure_python_dll()
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    filename='app.log',  # Имя файла для логов
-    filemode='w'  # 'w' для перезаписи файла, 'a' для добавления
-)
+
+STARTUP.mark("загрузка настроек и кешей")
 
 
 class ReportGUI:
@@ -1723,21 +1632,32 @@ class ReportGUI:
 
         # Пути к ресурсам
         self.excel_file = resource_path('Report.xlsx')
+        # Книга держится в памяти, на диск пишется перед формированием отчета
+        self.workbook = WorkbookSession(self.excel_file, snapshot_dir=os.path.abspath("workbook_cache"))
+
+        # Фоновые задания: изменения книги и формирование отчетов идут в отдельных очередях,
+        # поэтому данные следующей скважины можно вносить, пока формируется отчет
+        self.jobs = JobExecutor(self.root, lanes=("workbook", "report"))
+        self.queued_reports = set()
+        # Папки с копиями книги для отчетов, которые еще не сформированы
+        self.report_work_dirs = set()
+        self.status_var = tk.StringVar(value="Готово")
         # self.report_generation_script = resource_path('report_generation.py')
 
-        self.section_params = {
-            1: {"start_cell": "A1", "expected_columns": 2, "description": "Входные данные"},
-            2: {"start_cell": "L1", "expected_columns": 4, "description": "Модель давления на ВНК"},
-            3: {"start_cell": "Q1", "expected_columns": 2, "description": "Данные давления на ВНК"},
-            4: {"start_cell": "G1", "expected_columns": 3, "description": "Параметры_2"},
-            5: {"start_cell": "T1", "expected_columns": 4, "description": "Модель давления_2"},
-            6: {"start_cell": "Y1", "expected_columns": 2, "description": "Данные давления_2"}
-        }
+        self.section_params = SECTION_PARAMS
 
         # Очистка Excel-файла при запуске
         self.clear_excel_on_startup()
 
         self.setup_gui(self.scrollable_frame)
+        STARTUP.mark("создание окна")
+        # Отчет о запуске — после первой отрисовки окна
+        self.root.after_idle(self.log_startup_timing)
+
+    def log_startup_timing(self):
+        self.root.update_idletasks()
+        STARTUP.mark("отрисовка окна")
+        STARTUP.report()
 
     def _on_canvas_configure(self, event):
         self.canvas.configure(scrollregion=self.canvas.bbox("all"))
@@ -1758,60 +1678,13 @@ class ReportGUI:
                 messagebox.showerror("Ошибка", f"Файл не найден: {self.excel_file}")
                 return
 
-            wb = load_workbook(self.excel_file)
-            ws = wb['current']
-
-            # Очистка диапазона A1:B16
-            for row in range(1, 17):  # Строки 1–16
-                for col in ['A', 'B']:
-                    cell = ws[f"{col}{row}"]
-                    if not isinstance(cell, MergedCell):
-                        cell.value = None
-
-            # Очистка конкретных ячеек
-            specific_cells = ['C14', 'C16', 'A19', 'A20', 'A23', 'C29', 'C34', 'J4']
-            for cell_address in specific_cells:
-                cell = ws[cell_address]
-                if not isinstance(cell, MergedCell):
-                    cell.value = None
-
-            # Очистка диапазонов B26:C28 и B31:C33
-            for row in range(26, 29):  # Строки 26–28
-                for col in ['B', 'C']:
-                    cell = ws[f"{col}{row}"]
-                    if not isinstance(cell, MergedCell):
-                        cell.value = None
-            for row in range(31, 34):  # Строки 31–33
-                for col in ['B', 'C']:
-                    cell = ws[f"{col}{row}"]
-                    if not isinstance(cell, MergedCell):
-                        cell.value = None
-
-            # Очистка столбцов D, E, F, G, H, I, L, M, N, O, Q, R, T, U, V, W, Y, Z
-            columns_to_clear = ['D', 'E', 'F', 'G', 'H', 'I', 'L', 'M', 'N', 'O', 'Q', 'R', 'T', 'U', 'V', 'W', 'Y',
-                                'Z']
-            for col in columns_to_clear:
-                for row in range(1, ws.max_row + 1):  # Все строки в столбце
-                    cell = ws[f"{col}{row}"]
-                    if not isinstance(cell, MergedCell):
-                        cell.value = None
-
-            wb.save(self.excel_file)
+            # Очищенная книга берется из снимка, если он подходит к файлу на диске.
+            # Загрузка идет в фоне, вставки встают в очередь книги за ней
+            self.run_workbook_job("Загрузка книги", lambda job: self.workbook.reset(REPORT_CLEAR_RANGES),
+                                  error_prefix="Ошибка при очистке Excel")
         except Exception as e:
             logging.error(f"Ошибка при очистке Excel: {str(e)}")
             messagebox.showerror("Ошибка", f"Ошибка при очистке Excel: {str(e)}")
-        finally:
-            # Гарантированное освобождение ресурсов в правильном порядке
-            try:
-                if wb:
-                    wb.close()  # Закрываем без сохранения (изменения уже сохранены)
-            except Exception as e:
-                logging.warning(f"Ошибка при закрытии workbook: {str(e)}")
-
-            # Принудительное освобождение COM-объектов
-            # pythoncom.CoUninitialize()
-            del wb
-            time.sleep(0.9)  # Даем время системе освободить ресурсы
 
     def clear_excel_file(self):
         """Очищает указанные ячейки в Excel файле и сбрасывает цвет кнопок"""
@@ -1821,63 +1694,61 @@ class ReportGUI:
                 messagebox.showerror("Ошибка", f"Файл не найден: {self.excel_file}")
                 return False
 
-            wb = load_workbook(self.excel_file)
-            ws = wb['current']
-
-            # Очистка диапазона A1:B16
-            for row in range(1, 17):  # Строки 1–16
-                for col in ['A', 'B']:
-                    cell = ws[f"{col}{row}"]
-                    if not isinstance(cell, MergedCell):
-                        cell.value = None
-
-            # Очистка конкретных ячеек
-            specific_cells = ['C14', 'C16', 'A19', 'A20', 'A23', 'C29', 'C34', 'J4']
-            for cell_address in specific_cells:
-                cell = ws[cell_address]
-                if not isinstance(cell, MergedCell):
-                    cell.value = None
-
-            # Очистка диапазонов B26:C28 и B31:C33
-            for row in range(26, 29):  # Строки 26–28
-                for col in ['B', 'C']:
-                    cell = ws[f"{col}{row}"]
-                    if not isinstance(cell, MergedCell):
-                        cell.value = None
-            for row in range(31, 34):  # Строки 31–33
-                for col in ['B', 'C']:
-                    cell = ws[f"{col}{row}"]
-                    if not isinstance(cell, MergedCell):
-                        cell.value = None
-
-            # Очистка столбцов D, E, F, G, H, I, L, M, N, O, Q, R, T, U, V, W, Y, Z
-            columns_to_clear = ['D', 'E', 'F', 'G', 'H', 'I', 'L', 'M', 'N', 'O', 'Q', 'R', 'T', 'U', 'V', 'W', 'Y',
-                                'Z']
-            for col in columns_to_clear:
-                for row in range(1, ws.max_row + 1):  # Все строки в столбце
-                    cell = ws[f"{col}{row}"]
-                    if not isinstance(cell, MergedCell):
-                        cell.value = None
-
-            wb.save(self.excel_file)
+            # Очистка в памяти; на диск книга запишется перед формированием отчета
+            self.run_workbook_job("Очистка данных", lambda job: self.workbook.clear_ranges(REPORT_CLEAR_RANGES),
+                                  success_message="данные успешно удалены", error_prefix="Ошибка при очистке Excel")
 
             # Сбрасываем цвет всех кнопок
             self.reset_button_colors()
-
-            messagebox.showinfo("Успех", "данные успешно удалены")
             return True
 
         except Exception as e:
             logging.error(f"Ошибка при очистке Excel: {str(e)}")
             messagebox.showerror("Ошибка", f"Ошибка при очистке Excel: {str(e)}")
             return False
-        finally:
-            # Гарантированное освобождение ресурсов
-            try:
-                if 'wb' in locals():
-                    wb.close()
-            except Exception as e:
-                logging.warning(f"Ошибка при закрытии workbook: {str(e)}")
+
+    def run_workbook_job(self, name, function, *args, button=None, success_message=None, error_prefix="Ошибка"):
+        """
+        Ставит изменение книги в очередь книги. По завершении в главном потоке
+        меняется цвет кнопки и показывается сообщение.
+        """
+        def done(job, result):
+            if button is not None:
+                self.change_button_color(button, True)
+            if success_message:
+                messagebox.showinfo("Успех", success_message)
+            self.update_status()
+
+        def failed(job, e):
+            if button is not None:
+                self.change_button_color(button, False)
+            if isinstance(e, PasteError):
+                messagebox.showerror("Ошибка", str(e))
+            else:
+                messagebox.showerror("Ошибка", f"{error_prefix}: {str(e)}")
+            self.update_status()
+
+        job = self.jobs.submit("workbook", name, function, *args, on_done=done, on_error=failed,
+                               on_cancel=lambda job: self.update_status())
+        self.update_status()
+        return job
+
+    def update_status(self):
+        """Строка состояния: выполняющиеся и ожидающие задания"""
+        pending = self.jobs.pending()
+        if not pending:
+            self.status_var.set("Готово")
+            return
+        reports = [job for job in pending if job.lane == "report"]
+        status = pending[0].name if not reports else reports[0].name
+        if len(reports) > 1:
+            status += f" (в очереди отчетов: {len(reports) - 1})"
+        self.status_var.set(status + "...")
+
+    def cancel_reports(self):
+        """Отменяет формирование отчетов: ожидающие снимаются с очереди, текущий — после текущего этапа"""
+        self.jobs.cancel_all("report")
+        self.update_status()
 
     def reset_button_colors(self):
         """Сбрасывает цвет всех кнопок, которые были зелеными"""
@@ -1888,7 +1759,21 @@ class ReportGUI:
 
     def on_close(self):
         """Обработчик закрытия приложения"""
-        # self.kill_excel_processes()
+        if self.jobs.pending("report") and not messagebox.askyesno(
+                "Формирование отчета", "Отчеты еще формируются. Отменить оставшиеся и закрыть программу?"):
+            return
+        # Ожидающие задания отменяются, выполняющиеся дорабатывают. Экземпляры Excel/Word
+        # закрываются в потоках очередей, которые их запустили (COM привязан к потоку)
+        self.jobs.shutdown(wait=True, finalizer=OFFICE_POOL.close_thread)
+        # Обработчики отмененных заданий после остановки не вызываются — убираем их папки здесь
+        for work_dir in list(self.report_work_dirs):
+            self.remove_work_dir(work_dir)
+        OFFICE_POOL.close()
+        try:
+            self.workbook.save()
+        except Exception as e:
+            logging.warning(f"Не удалось сохранить {self.excel_file}: {str(e)}")
+        self.workbook.close()
         self.root.destroy()
 
     def setup_gui(self, parent):
@@ -2114,6 +1999,12 @@ class ReportGUI:
         self.template_combobox.current(0)
         self.template_combobox.pack(side='left', padx=3)
 
+        ttk.Label(template_frame, text="Формат:").pack(side='left', padx=3)
+        self.format_var = tk.StringVar(value="doc")
+        format_combobox = ttk.Combobox(template_frame, textvariable=self.format_var, state="readonly", width=6,
+                                       values=list(OUTPUT_FORMATS))
+        format_combobox.pack(side='left', padx=3)
+
         # Добавляем кнопку очистки Excel
         clear_btn = ttk.Button(
             button_frame,
@@ -2141,6 +2032,12 @@ class ReportGUI:
         generate_btn = ttk.Button(button_frame, text="Формировать отчет", command=self.generate_report)
         generate_btn.pack(side='left', padx=5)
 
+        # Строка состояния фоновых заданий и отмена отчетов
+        status_frame = ttk.Frame(self.root)
+        status_frame.pack(fill='x', padx=10, pady=3)
+        ttk.Label(status_frame, textvariable=self.status_var).pack(side='left')
+        ttk.Button(status_frame, text="Отменить отчеты", command=self.cancel_reports).pack(side='right')
+
     def setup_pdf_processing(self):
         """Добавляет элементы интерфейса для обработки PDF."""
         pdf_frame = ttk.LabelFrame(self.tab1, text="Обработка PDF")
@@ -2174,21 +2071,31 @@ class ReportGUI:
             messagebox.showerror("Ошибка", "PDF файл не выбран!")
             return
 
-        try:
+        def run(job):
             # Создаем экземпляр PDFReader
-            pdf_reader = PDFReader(pdf_path)
+            pdf_reader = PDFReader(pdf_path, cache=PLOT_CACHE)
 
             # Обрабатываем PDF
             pdf_reader.process_pdf()
+
+        def done(job, result):
+            self.update_status()
             messagebox.showinfo("Успех", "PDF успешно обработан!")
-        except Exception as e:
+
+        def failed(job, e):
+            self.update_status()
             messagebox.showerror("Ошибка", f"Ошибка при обработке PDF: {str(e)}")
 
+        # Графики пишутся в ту же папку, что и при формировании отчета, — очередь отчетов
+        self.jobs.submit("report", "Обработка PDF", run, on_done=done, on_error=failed,
+                         on_cancel=lambda job: self.update_status())
+        self.update_status()
+
     def log_invalid_characters(self, text):
         """
         Логирует недопустимые символы в тексте.
         """
-        invalid_chars = [char for char in text if ord(char) > 65535]
+        invalid_chars = SUPPLEMENTARY_CHARS.findall(text)
         if invalid_chars:
             print(f"Обнаружены недопустимые символы: {invalid_chars}")
 
@@ -2202,12 +2109,12 @@ class ReportGUI:
             # Очистка данных от недопустимых символов
             clipboard_data = clean_text(clipboard_data)
 
-            success = self.paste_data_to_excel(clipboard_data, section)
-
-            # Меняем цвет кнопки в зависимости от успеха
+            # Разбор и запись в книгу — в фоновом потоке, цвет кнопки меняется по завершении
             button = self.get_button_by_section(section)
-            if button:
-                self.change_button_color(button, success)
+            self.run_workbook_job(f"Вставка данных (раздел {section})", self.paste_data_to_excel,
+                                  clipboard_data, section, button=button,
+                                  success_message="Данные вставлены успешно",
+                                  error_prefix="Ошибка при вставке данных")
 
         except tk.TclError:
             messagebox.showerror("Ошибка", "Буфер обмена пуст")
@@ -2226,96 +2133,110 @@ class ReportGUI:
         }
         return button_map.get(section)
 
-    def paste_data_to_excel(self, data, section_number):
-        try:
-            # Очистка данных от недопустимых символов
-            data = clean_text(data)
-            self.log_invalid_characters(data)
-
-            # Загрузка Excel-файла
-            wb = load_workbook(self.excel_file)
-            ws = wb['current']
+    def paste_data_to_excel(self, job, data, section_number):
+        """
+        Записывает вставленные данные раздела в книгу (выполняется в фоновом потоке).
+        Ошибки во входных данных сообщаются исключением PasteError.
+        """
+        # Очистка данных от недопустимых символов
+        data = clean_text(data)
+        self.log_invalid_characters(data)
+
+        # Таблицы давления (дата и значение) вставляются блоком
+        if section_number in BULK_PASTE_SECTIONS:
+            return self.paste_columns_to_excel(job, data, section_number)
+
+        # Логирование: Проверяем исходные данные
+        # logging.info(f"Исходные данные из буфера обмена:\n{data}")
+
+        # Разделяем данные на строки и столбцы
+        rows = [r.split('\t') for r in data.split('\n') if r.strip()]
+        # logging.info(f"Разобранные строки: {rows}")
+
+        if not rows:
+            raise PasteError("Нет данных для вставки")
+
+        # Получаем ожидаемое количество столбцов
+        expected_cols = self.section_params[section_number]["expected_columns"]
+        logging.info(f"Ожидаемое количество столбцов: {expected_cols}")
+
+        # Проверяем количество столбцов в каждой строке
+        for row in rows:
+            if len(row) < expected_cols:
+                row.extend([''] * (expected_cols - len(row)))  # Дополняем пустыми значениями
+            elif len(row) > expected_cols:
+                raise PasteError(f"Неверное количество столбцов. Ожидается {expected_cols}, получено {len(row)}.")
+
+        # Определяем начальную ячейку
+        start_cell = self.section_params[section_number]["start_cell"]
+        start_row = int(''.join(filter(str.isdigit, start_cell)))
+        start_col = ord(''.join(filter(str.isalpha, start_cell)).upper()) - ord('A') + 1
+        print(f"Начальная ячейка: {start_cell} (строка={start_row}, столбец={start_col})")
+
+        # Вставка данных в Excel
+        for i, row in enumerate(rows):
+            for j, value in enumerate(row):
+                value = value.strip()  # Удаляем лишние пробелы
+
+                # Определяем текущие координаты ячейки
+                current_row = start_row + i
+                current_col = start_col + j
+                cell_address = f"{chr(64 + current_col)}{current_row}"
+
+                # Проверка на неподдерживаемые символы
+                if any(ord(char) > 65535 for char in value):
+                    raise PasteError(f"Обнаружен неподдерживаемый символ: {value}")
+
+                # Особые ячейки - всегда вставляем как текст
+                if cell_address in ['B4', 'B6', 'B7']:
+                    self.workbook[cell_address] = str(value)
+                    logging.info(f"Вставка ТЕКСТА '{value}' в ячейку {cell_address}")
+                    continue
 
-            # Логирование: Проверяем исходные данные
-            # logging.info(f"Исходные данные из буфера обмена:\n{data}")
+                try:
+                    # Преобразуем значение в число, если это возможно
+                    value = value.replace(',', '.') if ',' in value else value
+                    cell_value = float(value) if value else None  # Обрабатываем пустые значения
+                except ValueError:
+                    cell_value = value  # Оставляем как текст, если преобразование не удалось
 
-            # Разделяем данные на строки и столбцы
-            rows = [r.split('\t') for r in data.split('\n') if r.strip()]
-            # logging.info(f"Разобранные строки: {rows}")
+                # Логирование: Выводим значение для каждой ячейки
+                # logging.info(f"Вставка значения '{cell_value}' в ячейку ({start_row + i}, {start_col + j})")
 
-            if not rows:
-                messagebox.showerror("Ошибка", "Нет данных для вставки")
-                return
+                # Записываем значение в ячейку
+                self.workbook.write(start_row + i, start_col + j, cell_value)
 
-            # Получаем ожидаемое количество столбцов
-            expected_cols = self.section_params[section_number]["expected_columns"]
-            logging.info(f"Ожидаемое количество столбцов: {expected_cols}")
-
-            # Проверяем количество столбцов в каждой строке
-            for row in rows:
-                if len(row) < expected_cols:
-                    row.extend([''] * (expected_cols - len(row)))  # Дополняем пустыми значениями
-                elif len(row) > expected_cols:
-                    messagebox.showerror(
-                        "Ошибка",
-                        f"Неверное количество столбцов. Ожидается {expected_cols}, получено {len(row)}."
-                    )
-                    return
-
-            # Определяем начальную ячейку
-            start_cell = self.section_params[section_number]["start_cell"]
-            start_row = int(''.join(filter(str.isdigit, start_cell)))
-            start_col = ord(''.join(filter(str.isalpha, start_cell)).upper()) - ord('A') + 1
-            print(f"Начальная ячейка: {start_cell} (строка={start_row}, столбец={start_col})")
-
-            # Вставка данных в Excel
-            for i, row in enumerate(rows):
-                for j, value in enumerate(row):
-                    value = value.strip()  # Удаляем лишние пробелы
-
-                    # Определяем текущие координаты ячейки
-                    current_row = start_row + i
-                    current_col = start_col + j
-                    cell_address = f"{chr(64 + current_col)}{current_row}"
-
-                    # Проверка на неподдерживаемые символы
-                    if any(ord(char) > 65535 for char in value):
-                        messagebox.showerror("Ошибка", f"Обнаружен неподдерживаемый символ: {value}")
-                        return
-
-                    # Особые ячейки - всегда вставляем как текст
-                    if cell_address in ['B4', 'B6', 'B7']:
-                        ws[cell_address] = str(value)
-                        logging.info(f"Вставка ТЕКСТА '{value}' в ячейку {cell_address}")
-                        continue
+        return True
 
-                    try:
-                        # Преобразуем значение в число, если это возможно
-                        value = value.replace(',', '.') if ',' in value else value
-                        cell_value = float(value) if value else None  # Обрабатываем пустые значения
-                    except ValueError:
-                        cell_value = value  # Оставляем как текст, если преобразование не удалось
+    def paste_columns_to_excel(self, job, data, section_number):
+        """Вставка больших таблиц: разбор по столбцам и запись блоком"""
+        unsupported = find_unsupported_value(data)
+        if unsupported is not None:
+            raise PasteError(f"Обнаружен неподдерживаемый символ: {unsupported}")
 
-                    # Логирование: Выводим значение для каждой ячейки
-                    # logging.info(f"Вставка значения '{cell_value}' в ячейку ({start_row + i}, {start_col + j})")
+        expected_cols = self.section_params[section_number]["expected_columns"]
+        try:
+            columns = parse_clipboard_table(data, expected_cols)
+        except ValueError as e:
+            raise PasteError(str(e))
 
-                    # Записываем значение в ячейку
-                    ws.cell(row=start_row + i, column=start_col + j, value=cell_value)
+        if not columns:
+            raise PasteError("Нет данных для вставки")
 
-            # Сохраняем файл
-            wb.save(self.excel_file)
-            wb.close()
-            messagebox.showinfo("Успех", "Данные вставлены успешно")
+        job.check_cancelled()
+        start_row, start_col = coordinate_to_tuple(self.section_params[section_number]["start_cell"])
+        self.workbook.write_columns(start_row, start_col, columns)
+        logging.info(f"Раздел {section_number}: вставлено строк: {len(columns[0])}")
+        return True
 
-            return True
+    def paste_research_params(self):
+        self._paste_research_params(4, self.insert_button2)
 
-        except Exception as e:
-            # Логирование: Выводим полное описание ошибки
-            logging.error(f"Произошла ошибка: {str(e)}")
-            messagebox.showerror("Ошибка", f"Ошибка при вставке данных: {str(e)}")
-            return False
+    def paste_research_params_2(self):
+        self._paste_research_params(7, self.insert_button2_2)
 
-    def paste_research_params(self):
+    def _paste_research_params(self, first_col, button):
+        """Вставка параметров исследования в три столбца, начиная с first_col (D:F или G:I)"""
         try:
             # Проверяем, есть ли данные в буфере обмена
             clipboard_data = self.root.clipboard_get()
@@ -2329,101 +2250,36 @@ class ReportGUI:
                 messagebox.showerror("Ошибка", "Нет данных для вставки")
                 return
 
-            wb = load_workbook(self.excel_file)
-            ws = wb['current']
-
-            # Очищаем диапазон D:F перед вставкой новых данных
-            for row in ws.iter_rows(min_row=1, max_row=ws.max_row, min_col=4, max_col=6):
-                for cell in row:
-                    cell.value = None
-
-            # Вставляем данные в диапазон D:F
-            for i, row in enumerate(rows):
-                for j, value in enumerate(row):
-                    value = value.strip()
-                    if j == 1:  # Преобразуем второй столбец в число, если это возможно
-                        try:
-                            value = value.replace(',', '.') if ',' in value else value
-                            cell_value = float(value)
-                        except ValueError:
-                            cell_value = value
-                    else:
-                        cell_value = value
-                    ws.cell(row=i + 1, column=4 + j, value=cell_value)
-
-            # Форматируем числовой столбец (E)
-            for row in ws.iter_rows(min_row=1, max_row=len(rows), min_col=5, max_col=5):
-                for cell in row:
-                    cell.number_format = numbers.FORMAT_NUMBER
-
-            wb.save(self.excel_file)
-            wb.close()
-            messagebox.showinfo("Успех", "Параметры исследования вставлены успешно")
-
-            # Меняем цвет кнопки на зеленый после успешной вставки
-            self.change_button_color(self.insert_button2, True)
-
+            self.run_workbook_job("Вставка параметров исследования", self.write_research_params, rows, first_col,
+                                  button=button, success_message="Параметры исследования вставлены успешно",
+                                  error_prefix="Ошибка при вставке параметров")
 
         except tk.TclError:
             messagebox.showerror("Ошибка", "Буфер обмена пуст или данные недоступны")
-            self.change_button_color(self.insert_button2, False)  # Сбрасываем цвет
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при вставке параметров: {str(e)}")
-            self.change_button_color(self.insert_button2, False)  # Сбрасываем цвет
+            self.change_button_color(button, False)  # Сбрасываем цвет
 
-    def paste_research_params_2(self):
-        try:
-            # Проверяем, есть ли данные в буфере обмена
-            clipboard_data = self.root.clipboard_get()
-            if not clipboard_data.strip():
-                messagebox.showerror("Ошибка", "Буфер обмена пуст. Скопируйте данные перед вставкой.")
-                return
+    def write_research_params(self, job, rows, first_col):
+        """Записывает параметры исследования в книгу (выполняется в фоновом потоке)"""
+        # Очищаем диапазон из трех столбцов перед вставкой новых данных
+        self.workbook.clear_ranges([f"{get_column_letter(first_col)}:{get_column_letter(first_col + 2)}"])
 
-            # Разделяем данные на строки и столбцы
-            rows = [r.split('\t') for r in clipboard_data.split('\n') if r.strip()]
-            if not rows:
-                messagebox.showerror("Ошибка", "Нет данных для вставки")
-                return
-
-            wb = load_workbook(self.excel_file)
-            ws = wb['current']
-
-            # Очищаем диапазон G:I перед вставкой новых данных
-            for row in ws.iter_rows(min_row=1, max_row=ws.max_row, min_col=7, max_col=9):
-                for cell in row:
-                    cell.value = None
-
-            # Вставляем данные в диапазон G:I
-            for i, row in enumerate(rows):
-                for j, value in enumerate(row):
-                    value = value.strip()
-                    if j == 1:  # Преобразуем второй столбец в число, если это возможно
-                        try:
-                            value = value.replace(',', '.') if ',' in value else value
-                            cell_value = float(value)
-                        except ValueError:
-                            cell_value = value
-                    else:
+        for i, row in enumerate(rows):
+            for j, value in enumerate(row):
+                value = value.strip()
+                if j == 1:  # Преобразуем второй столбец в число, если это возможно
+                    try:
+                        value = value.replace(',', '.') if ',' in value else value
+                        cell_value = float(value)
+                    except ValueError:
                         cell_value = value
-                    ws.cell(row=i + 1, column=7 + j, value=cell_value)
-
-            # Форматируем числовой столбец (H)
-            for row in ws.iter_rows(min_row=1, max_row=len(rows), min_col=8, max_col=8):
-                for cell in row:
-                    cell.number_format = numbers.FORMAT_NUMBER
-
-            wb.save(self.excel_file)
-            wb.close()
-            messagebox.showinfo("Успех", "Параметры исследования вставлены успешно")
-
-            self.change_button_color(self.insert_button2_2, True)
+                else:
+                    cell_value = value
+                self.workbook.write(i + 1, first_col + j, cell_value)
 
-        except tk.TclError:
-            messagebox.showerror("Ошибка", "Буфер обмена пуст или данные недоступны")
-            self.change_button_color(self.insert_button2_2, False)
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при вставке параметров: {str(e)}")
-            self.change_button_color(self.insert_button2_2, False)
+        # Форматируем числовой столбец (второй из трех)
+        for i in range(len(rows)):
+            self.workbook.sheet.cell(row=i + 1, column=first_col + 1).number_format = numbers.FORMAT_NUMBER
+        return True
 
     def save_to_excel(self):
         try:
@@ -2431,60 +2287,59 @@ class ReportGUI:
                 messagebox.showerror("Ошибка", "Заполните обязательные поля")
                 return
 
-            wb = load_workbook(self.excel_file)
-            ws = wb['current']
+            # Значения полей формы собираются в главном потоке (адрес -> значение)
+            values = {}
 
             # Сохраняем расчетное время в J4
             calc_time = self.calc_time_entry.get()
             if calc_time:
                 try:
                     # Пробуем преобразовать в число, если это возможно
-                    ws['J4'] = float(calc_time.replace(',', '.'))
+                    values['J4'] = float(calc_time.replace(',', '.'))
                 except ValueError:
                     # Если не число, сохраняем как строку
-                    ws['J4'] = calc_time
+                    values['J4'] = calc_time
 
-            ws['C14'] = float(self.class_entry.get())
-            ws['C16'] = float(self.success_entry.get())
+            values['C14'] = float(self.class_entry.get())
+            values['C16'] = float(self.success_entry.get())
 
             # Сохраняем данные для каждой группы поправок
             Ppl_entries = [
-                (self.ppl_entries, 2),  # Столбец B
-                (self.ppl2_entries, 3),  # Столбец D
+                (self.ppl_entries, 'B'),  # Столбец B
+                (self.ppl2_entries, 'C'),  # Столбец D
             ]
 
             Pzab_entries = [
-                (self.pzab_entries, 2),  # Столбец C
-                (self.pzab2_entries, 3),  # Столбец E
+                (self.pzab_entries, 'B'),  # Столбец C
+                (self.pzab2_entries, 'C'),  # Столбец E
             ]
 
             for entries, column in Ppl_entries:
                 for i, entry in enumerate(entries):
-                    ws.cell(row=26 + i, column=column, value=float(entry.get()) if entry.get() else None)
+                    values[f"{column}{26 + i}"] = float(entry.get()) if entry.get() else None
 
             for entries, column in Pzab_entries:
                 for i, entry in enumerate(entries):
-                    ws.cell(row=31 + i, column=column, value=float(entry.get()) if entry.get() else None)
+                    values[f"{column}{31 + i}"] = float(entry.get()) if entry.get() else None
 
             # Сохраняем новые поля "Поправка на ВНК Рпл_3" и "Поправка на ВНК Рпл_4"
-            ws['C29'] = float(self.vnkp_pl3_entry.get()) if self.vnkp_pl3_entry.get() else None
-            ws['C34'] = float(self.vnkp_pl4_entry.get()) if self.vnkp_pl4_entry.get() else None
+            values['C29'] = float(self.vnkp_pl3_entry.get()) if self.vnkp_pl3_entry.get() else None
+            values['C34'] = float(self.vnkp_pl4_entry.get()) if self.vnkp_pl4_entry.get() else None
 
-            ws['A19'] = float(self.density_zab_entry.get()) if self.density_zab_entry.get() else None
-            ws['A20'] = float(self.density_pl_entry.get()) if self.density_pl_entry.get() else None
+            values['A19'] = float(self.density_zab_entry.get()) if self.density_zab_entry.get() else None
+            values['A20'] = float(self.density_pl_entry.get()) if self.density_pl_entry.get() else None
 
-            wb.save(self.excel_file)
-            messagebox.showinfo("Успех", "Данные сохранены успешно")
+            self.run_workbook_job("Сохранение данных формы", self.write_form_values, values,
+                                  success_message="Данные сохранены успешно", error_prefix="Ошибка при сохранении")
 
         except Exception as e:
             messagebox.showerror("Ошибка", f"Ошибка при сохранении: {str(e)}")
-        finally:
-            if wb is not None:
-                try:
-                    wb.close()
-                except:
-                    pass
-            self.kill_excel_processes()
+
+    def write_form_values(self, job, values):
+        """Записывает значения полей формы в книгу (выполняется в фоновом потоке)"""
+        for address, value in values.items():
+            self.workbook[address] = value
+        return True
 
     def select_output_file(self):
         self.output_file_path = filedialog.asksaveasfilename(
@@ -2517,290 +2372,179 @@ class ReportGUI:
     # Вызов функции
     # show_meipass_content()
 
-    def insert_images_to_word(self, doc):
+    def insert_images_to_word(self, doc, template_index=None):
         """Вставляет изображения из PDF в Word-документ на места меток"""
         try:
             if not self.pdf_var.get():
                 logging.warning("PDF файл не выбран, пропускаем вставку изображений")
                 return
 
-            pdf_path = self.pdf_var.get()
-            pdf_reader = PDFReader(pdf_path)
-            pdf_reader.process_pdf()
-
-            # Сопоставление типов графиков с метками
-            image_mapping = {
-                "Graph_1": "{{Picture3}}",  # Граф.Хорнера
-                "Log_1": "{{Picture2}}",  # Диагностический (log)
-                "Log_2": "{{Picture6}}",  # Диагностический сравнение
-                "Semi_1": "{{Picture4}}",  # Полулогарифмический (semi),
-                "History_1": "{{Picture1}}", # Обзорный на ВНК
-                "History_2": "{{Picture7}}",  # Обзорный на ВНК сравнение
-                "Map_1": "{{Picture5}}", # Карта
-                "ACA_1": "{{Picture8}}",  # АСА график
-            }
-
-            # Замена меток изображениями
-            for paragraph in doc.paragraphs:
-                for image_type, placeholder in image_mapping.items():
-                    if placeholder in paragraph.text:
-                        image_path = os.path.join("plots", f"cropped_image_{image_type}.png")
-                        if os.path.exists(image_path):
-                            # Удаляем метку
-                            paragraph.text = paragraph.text.replace(placeholder, "")
-
-                            # Добавляем изображение
-                            run = paragraph.add_run()
-                            run.add_picture(image_path, width=Inches(6))  # Ширина 6 дюймов
-                            paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-                            logging.info(f"Вставлено изображение {image_type} на место {placeholder}")
-
-            # Аналогичная замена в таблицах
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        for paragraph in cell.paragraphs:
-                            for image_type, placeholder in image_mapping.items():
-                                if placeholder in paragraph.text:
-                                    image_path = os.path.join("plots", f"cropped_image_{image_type}.png")
-                                    if os.path.exists(image_path):
-                                        paragraph.text = paragraph.text.replace(placeholder, "")
-                                        run = paragraph.add_run()
-                                        run.add_picture(image_path, width=Inches(4))  # Меньший размер для таблиц
-                                        paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+            insert_plot_images(doc, self.pdf_var.get(), template_index)
 
         except Exception as e:
             logging.error(f"Ошибка при вставке изображений: {str(e)}")
             raise RuntimeError(f"Не удалось вставить изображения: {str(e)}")
 
-    def convert_docx_to_doc(self, docx_path, doc_path):
-        """
-        Конвертирует файл .docx в .doc с использованием Microsoft Word через pywin32.
-        """
-        word = None
-        doc = None
-        try:
-            # Создаем объект Word
-            word = win32com.client.Dispatch("Word.Application")
-            word.Visible = False
-
-            # Открываем документ .docx
-            doc = word.Documents.Open(docx_path)
-
-            # Сохраняем как .doc
-            doc.SaveAs(doc_path, FileFormat=0)  # FileFormat=0 означает формат Word 97-2003 (.doc)
-            logging.info(f"Файл успешно сконвертирован: {doc_path}")
-
-        except Exception as e:
-            logging.error(f"Ошибка при конвертации .docx в .doc: {str(e)}")
-            raise RuntimeError(f"Не удалось сконвертировать файл: {str(e)}")
-
-        finally:
-            # Закрываем документ и приложение Word
-            if doc:
-                doc.Close(SaveChanges=False)  # Явно указываем, что изменения не сохраняем
-            if word:
-                word.Quit()
-
-            # Освобождаем ресурсы COM
-            del doc
-            del word
-
-    def kill_excel_processes(self):
-        """Принудительно закрывает все процессы Excel"""
-        try:
-            excel_app = win32com.client.Dispatch("Excel.Application")
-            excel_app.Quit()
-            del excel_app
-        except Exception as e:
-            logging.warning(f"Ошибка при закрытии Excel: {str(e)}")
-
-        # Дополнительная проверка через taskkill
-        try:
-            os.system('taskkill /f /im excel.exe')
-        except Exception as e:
-            logging.warning(f"Ошибка при завершении процесса Excel: {str(e)}")
-
     def generate_report(self):
-        try:
-            logging.info("Начало формирования отчета")
-            # Проверяем, выбрана ли директория
-            if not hasattr(self, 'output_directory') or not self.output_directory:
-                logging.error("Не выбрана папка для сохранения отчета")
-                messagebox.showerror("Ошибка", "Сначала выберите папку для сохранения!")
-                return False
-
-            # if not self.output_file_path:
-            #     logging.error("Не выбран путь для сохранения отчета")
-            #     messagebox.showerror("Ошибка", "Сначала выберите место сохранения!")
-            #     return
+        logging.info("Начало формирования отчета")
+        # Проверяем, выбрана ли директория
+        if not hasattr(self, 'output_directory') or not self.output_directory:
+            logging.error("Не выбрана папка для сохранения отчета")
+            messagebox.showerror("Ошибка", "Сначала выберите папку для сохранения!")
+            return False
 
-            # Проверка заполнения полей поправок
-            if not all([entry.get() for entry in self.ppl_entries]) or not all(
-                    [entry.get() for entry in self.pzab_entries]):
-                logging.error("Не все данные для первого варианта заполнены")
-                messagebox.showerror("Ошибка", "Заполните все данные для первого варианта!")
-                return False
+        # if not self.output_file_path:
+        #     logging.error("Не выбран путь для сохранения отчета")
+        #     messagebox.showerror("Ошибка", "Сначала выберите место сохранения!")
+        #     return
 
-            # Загружаем данные из Excel для формирования имени файла
-            wb = load_workbook(self.excel_file)
-            ws = wb['current']
-
-            # Функция для безопасного получения значений ячеек
-            def get_cell_value(cell):
-                value = ws[cell].value
-                if isinstance(value, datetime):
-                    return value.strftime("%d.%m.%Y")
-                elif isinstance(value, str):
-                    # Пытаемся преобразовать строку в дату, если это возможно
-                    try:
-                        date_obj = datetime.strptime(value, "%d.%m.%Y")
-                        return date_obj.strftime("%d.%m.%Y")
-                    except (ValueError, AttributeError):
-                        return value.strip() if value else "Без_данных"
-                return str(value) if value else "Без_данных"
-
-            wb.close()
-
-            template_mapping = {
-                "КВД_Заполярка": templates_path("KVD_Zapolyarka.docx"),
-                "КВД_Оренбург": templates_path("KVD_Orenburg.docx"),
-                "КВД_Оренбург_газ": templates_path("KVD_Orenburg_gas.docx"),
-                "КВД_Оренбург2": templates_path("KVD_Orenburg2.docx"),
-                "КВД_Хантос": templates_path("KVD_Khantos.docx"),
-                "КВД_глушение": templates_path("KVD_For_Killing.docx"),
-                "КВД_ННГ": templates_path("KVD_NNG.docx"),
-                "КВД+ИД": templates_path("KVD_ID.docx"),
-                "КСД": templates_path("KSD.docx"),
-                "КПД": templates_path("KPD.docx"),
-                "КПД+ИД": templates_path("KPD_ID.docx"),
-                "ГРП": templates_path("GRP.docx")
-            }
-
-            # Получаем выбранный шаблон (ключ)
-            selected_template_key = self.template_var.get().strip()
-            print(f"Выбранный шаблон (ключ): {selected_template_key}")
-
-            # Проверяем, существует ли ключ в словаре
-            if selected_template_key not in template_mapping:
-                messagebox.showerror("Ошибка", f"Шаблон '{selected_template_key}' не найден!")
-                return False
+        # Проверка заполнения полей поправок
+        if not all([entry.get() for entry in self.ppl_entries]) or not all(
+                [entry.get() for entry in self.pzab_entries]):
+            logging.error("Не все данные для первого варианта заполнены")
+            messagebox.showerror("Ошибка", "Заполните все данные для первого варианта!")
+            return False
 
-            if selected_template_key.lower() == "квд_глушение":
-                # Создаем временный файл KVD_For_Killing.docx
-                logging.info("Создание файла KVD_For_Killing.docx...")
-                result = copy_excel_to_word_pandas(
-                    excel_path=resource_path('Report.xlsx'),
-                    word_path=os.path.abspath(templates_path('КВД для глушения_prev.docx')),
-                    sheet_name='current',
-                    search_text='Prognoz_Ppl'
-                )
+        # Получаем выбранный шаблон (ключ)
+        selected_template_key = self.template_var.get().strip()
+        print(f"Выбранный шаблон (ключ): {selected_template_key}")
 
-                if result is None:
-                    logging.error("Ошибка: copy_excel_to_word_pandas вернул None")
-                    raise RuntimeError("Не удалось создать временный Word-документ")
+        # Проверяем, существует ли ключ в словаре
+        if selected_template_key not in TEMPLATE_FILES:
+            messagebox.showerror("Ошибка", f"Шаблон '{selected_template_key}' не найден!")
+            return False
 
-                logging.info(f"Файл KVD_For_Killing.docx успешно создан: {result}")
+        def failed(job, e):
+            self.update_status()
+            messagebox.showerror("Ошибка", f"Произошла ошибка: {str(e)}")
 
-                # Обновляем имя шаблона
-                selected_template_file = os.path.basename(result)
-            else:
-                # Получаем имя файла шаблона из словаря
-                selected_template_file = template_mapping[selected_template_key]
-                logging.info(f"Имя файла шаблона: {selected_template_file}")
-
-            # Формируем полный путь к файлу шаблона
-            template_path = resource_path(selected_template_file)
-            print(f"Путь к шаблону: {template_path}")
-            logging.info(f"Путь к шаблону Word: {template_path}")
-
-            # Проверяем существование файла шаблона
-            if not os.path.exists(template_path):
-                logging.error(f"Шаблон не найден: {template_path}")
-                messagebox.showerror("Ошибка", f"Шаблон '{selected_template_file}' не найден!")
-                return False
+        # Книга фиксируется в очереди книги (после уже поставленных вставок),
+        # отчет формируется по ее копии в очереди отчетов
+        self.jobs.submit("workbook", "Подготовка отчета", self.prepare_report, selected_template_key,
+                         self.output_directory, self.pdf_var.get() or None, self.format_var.get(),
+                         on_done=self._on_report_prepared, on_error=failed,
+                         on_cancel=lambda job: self.update_status())
+        self.update_status()
+        return True
 
-            # Создаем объект Document из шаблона
-            doc = Document(template_path)
-
-            # Формируем базовое имя файла
-            base_name = (
-                f"Закл_"
-                f"{get_cell_value('B16')}_"
-                f"{get_cell_value('B2')}_"
-                f"{get_cell_value('B3')}_"
-                f"{get_cell_value('B5')}"
-            )
-
-            # Убираем недопустимые символы
-            import re
-            clean_name = re.sub(r'[<>:"/\\|?*]', '_', base_name)
-            report_name_docx = f"{clean_name}.docx"
-            report_name_doc = f"{clean_name}.doc"
-
-            # Полный путь для сохранения
-            output_file_path_docx = os.path.normpath(os.path.join(self.output_directory, report_name_docx))
-            output_file_path_doc = os.path.normpath(os.path.join(self.output_directory, report_name_doc))
-
-            # Проверяем и обрабатываем дубликаты
-            counter = 1
-            while os.path.exists(output_file_path_docx) or os.path.exists(output_file_path_doc):
-                new_name = f"{clean_name}_{counter}"
-                output_file_path_docx = os.path.join(self.output_directory, f"{new_name}.docx")
-                output_file_path_doc = os.path.join(self.output_directory, f"{new_name}.doc")
-                counter += 1
-
-            # Вставка изображений
-            self.insert_images_to_word(doc)
-
-            # Сохранение временного .docx файла
-            doc.save(output_file_path_docx)
-            logging.info(f"Отчет успешно сохранен во временном формате: {output_file_path_docx}")
-
-            # Вызываем функцию для формирования отчета
-            logging.info(f"Вызов generate_report_logic с параметрами: {output_file_path_docx}, {selected_template_key}")
-            success = generate_report_logic(doc, output_file_path_docx, selected_template_key)
-            fix_units(doc)
-            if success:
-                # Сохраняем финальную версию документа
-                doc.save(output_file_path_docx)
-                # Конвертация .docx в .doc
-                self.convert_docx_to_doc(output_file_path_docx, output_file_path_doc)
-
-                logging.info(f"Отчет успешно сохранен: {output_file_path_doc}")
-                messagebox.showinfo("Успех", f"Отчет сформирован успешно: {output_file_path_doc}")
-
-                # Удаление временного файла
-                time.sleep(3)  # Ждем, пока файл перестанет быть заблокированным
+    def prepare_report(self, job, template_key, output_directory, pdf_path, output_format="doc"):
+        """
+        Имена файлов отчета и копия книги для его формирования (выполняется в фоновом потоке).
+        Пока отчет формируется, в книгу можно вносить данные следующей скважины.
+        """
+        # Функция для безопасного получения значений ячеек
+        def get_cell_value(cell):
+            value = self.workbook[cell]
+            if isinstance(value, datetime):
+                return value.strftime("%d.%m.%Y")
+            elif isinstance(value, str):
+                # Пытаемся преобразовать строку в дату, если это возможно
                 try:
-                    if os.path.exists(output_file_path_docx):
-                        os.remove(output_file_path_docx)
-                        logging.info(f"Временный файл удален: {output_file_path_docx}")
-                except Exception as e:
-                    logging.warning(f"Не удалось удалить временный файл: {str(e)}")
-            else:
-                logging.error("Не удалось сформировать отчет")
-                messagebox.showerror("Ошибка", "Не удалось сформировать отчет.")
-                return False
+                    date_obj = datetime.strptime(value, "%d.%m.%Y")
+                    return date_obj.strftime("%d.%m.%Y")
+                except (ValueError, AttributeError):
+                    return value.strip() if value else "Без_данных"
+            return str(value) if value else "Без_данных"
+
+        # Формируем базовое имя файла
+        base_name = (
+            f"Закл_"
+            f"{get_cell_value('B16')}_"
+            f"{get_cell_value('B2')}_"
+            f"{get_cell_value('B3')}_"
+            f"{get_cell_value('B5')}"
+        )
 
-        except Exception as e:
-            logging.error(f"Произошла ошибка: {str(e)}", exc_info=True)
-            import traceback
-            traceback.print_exc()
+        # Убираем недопустимые символы
+        clean_name = re.sub(r'[<>:"/\\|?*]', '_', base_name)
+        extension = OUTPUT_FORMATS[output_format]
+
+        # Полный путь для сохранения
+        output_file_path = os.path.normpath(os.path.join(output_directory, f"{clean_name}{extension}"))
+
+        # Проверяем и обрабатываем дубликаты (в том числе отчеты, которые еще в очереди)
+        counter = 1
+        while os.path.exists(output_file_path) or output_file_path in self.queued_reports:
+            new_name = f"{clean_name}_{counter}"
+            output_file_path = os.path.normpath(os.path.join(output_directory, f"{new_name}{extension}"))
+            counter += 1
+        self.queued_reports.add(output_file_path)
+
+        # Отчет читает книгу с диска — записываем накопленные изменения и снимаем копию
+        report = {
+            "template_key": template_key,
+            "output": output_file_path,
+            "format": output_format,
+            "work_dir": None,
+            "pdf": pdf_path,
+        }
+        try:
+            self.workbook.save()
+            report["work_dir"] = tempfile.mkdtemp(prefix="report_job_")
+            self.report_work_dirs.add(report["work_dir"])
+            report["workbook"] = os.path.join(report["work_dir"], os.path.basename(self.excel_file))
+            shutil.copyfile(self.excel_file, report["workbook"])
+            job.check_cancelled()
+        except Exception:
+            self.queued_reports.discard(output_file_path)
+            self.remove_work_dir(report["work_dir"])
+            raise
+        return report
+
+    def remove_work_dir(self, work_dir):
+        """Удаляет папку с копией книги отчета (после формирования, отмены или ошибки)"""
+        if work_dir is not None:
+            self.report_work_dirs.discard(work_dir)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _on_report_prepared(self, job, report):
+        name = os.path.basename(report["output"])
+
+        def finished(job, *args):
+            self.queued_reports.discard(report["output"])
+            # Задание, отмененное до начала, не удаляет свою папку само
+            self.remove_work_dir(report["work_dir"])
+            self.update_status()
+
+        def done(job, output_file_path):
+            finished(job)
+            messagebox.showinfo("Успех", f"Отчет сформирован успешно: {output_file_path}")
+
+        def failed(job, e):
+            finished(job)
             messagebox.showerror("Ошибка", f"Произошла ошибка: {str(e)}")
-        finally:
-            # Закрываем workbook если он был открыт
-            if 'wb' in locals():
-                try:
-                    wb.close()
-                except:
-                    pass
 
-            # Принудительно закрываем Excel процессы
-            self.kill_excel_processes()
+        self.jobs.submit("report", f"Отчет {name}", self.render_report, report,
+                         on_done=done, on_error=failed, on_cancel=finished,
+                         on_progress=lambda job, message: self.status_var.set(f"{name}: {message}"))
+        self.update_status()
+
+    def render_report(self, job, report):
+        """Формирует отчет в выбранном формате (выполняется в фоновом потоке)"""
+        # COM в рабочем потоке инициализирует OFFICE_POOL при первой аренде Excel/Word
+        try:
+            output_file_path = report["output"]
+
+            with tracing(report_trace_path(output_file_path), os.path.basename(output_file_path)):
+                # Шаблон, изображения из PDF, метки и единицы измерения; .doc/.pdf — конвертация без Word
+                job.progress(f"формирование {OUTPUT_FORMATS[report['format']]}")
+                success = build_report(report["template_key"], output_file_path,
+                                       workbook_path=report["workbook"], pdf_path=report["pdf"],
+                                       work_dir=report["work_dir"], output_format=report["format"], job=job)
+                if not success:
+                    logging.error("Не удалось сформировать отчет")
+                    raise RuntimeError("Не удалось сформировать отчет.")
+            logging.info(f"Отчет успешно сохранен: {output_file_path}")
+
+            return output_file_path
+        finally:
+            self.remove_work_dir(report["work_dir"])
 
 
 if __name__ == "__main__":
+    # Пул процессов отрисовки PDF в собранном приложении
+    multiprocessing.freeze_support()
+    init_app()
     root = tk.Tk()
     app = ReportGUI(root)
     root.mainloop()
@@ -29,8 +29,14 @@ a = Analysis(
         ('Итоговая таблица_Западно-Таркосалинское.xlsx', '.'),
         ('Helper.xlsm', '.'),
         ('text_templates.json', '.'),
+        ('report_fields.json', '.'),
+        ('model_registry.json', '.'),
     ],
-    hiddenimports=['win32timezone', 'pandas', 'openpyxl', 'docx'],     # Если нужны скрытые импорты, добавьте их здесь
+    # Если нужны скрытые импорты, добавьте их здесь.
+    # Модули, загружаемые через lazy_import, PyInstaller сам не находит
+    hiddenimports=['win32timezone', 'pandas', 'openpyxl', 'docx', 'numpy', 'fitz', 'pythoncom', 'win32com.client',
+                   'openpyxl.utils', 'openpyxl.styles.numbers', 'openpyxl.cell.cell', 'docx.shared', 'docx.enum.text',
+                   'win32process', 'tkinter', 'tkinter.ttk', 'tkinter.messagebox', 'tkinter.filedialog'],
     hookspath=[],
     runtime_hooks=[],
     excludes=[],
@@ -0,0 +1,159 @@
+"""
+Фоновое выполнение заданий GUI.
+
+Задания выполняются в рабочих потоках, разбитых на очереди (lanes): задания
+одной очереди выполняются строго по порядку, разные очереди — параллельно.
+Tkinter нельзя вызывать из рабочих потоков, поэтому события (прогресс,
+завершение, ошибка) складываются в queue.Queue и разбираются в главном потоке
+через root.after.
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Период опроса очереди событий, мс
+POLL_INTERVAL_MS = 100
+
+
+class JobCancelled(Exception):
+    """Задание отменено пользователем"""
+
+
+class Job:
+    """Задание в очереди исполнителя; передается первым аргументом в функцию задания"""
+
+    def __init__(self, executor, lane, name):
+        self.executor = executor
+        self.lane = lane
+        self.name = name
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """
+        Отменяет задание. Еще не начатое задание снимается с очереди, выполняющееся
+        останавливается в ближайшей точке check_cancelled().
+        """
+        self._cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled(self.name)
+
+    def progress(self, message):
+        """Сообщение о ходе выполнения (передается в главный поток)"""
+        self.executor._events.put(("progress", self, message))
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+
+class JobExecutor:
+    """
+    Исполнитель заданий для Tk-приложения.
+
+    Обработчики on_done(job, result), on_error(job, exc), on_cancel(job) и on_progress(job, message)
+    вызываются в главном потоке.
+    """
+
+    def __init__(self, root, lanes=("default",)):
+        self.root = root
+        self._lanes = {lane: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"job-{lane}") for lane in lanes}
+        self._events = queue.Queue()
+        self._handlers = {}
+        self._jobs = []
+        self._closed = False
+        self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def submit(self, lane, name, function, *args, on_done=None, on_error=None, on_cancel=None, on_progress=None,
+               **kwargs):
+        """Ставит function(job, *args, **kwargs) в очередь lane; возвращает Job"""
+        job = Job(self, lane, name)
+        self._handlers[job] = (on_done, on_error, on_cancel, on_progress)
+
+        def run():
+            job.check_cancelled()
+            logger.info(f"Задание '{name}' начато")
+            return function(job, *args, **kwargs)
+
+        job.future = self._lanes[lane].submit(run)
+        job.future.add_done_callback(lambda future: self._events.put(("finished", job, None)))
+        self._jobs.append(job)
+        return job
+
+    def pending(self, lane=None):
+        """Незавершенные задания (очереди lane или все)"""
+        return [job for job in self._jobs if not job.done() and (lane is None or job.lane == lane)]
+
+    def cancel_all(self, lane=None):
+        for job in self.pending(lane):
+            job.cancel()
+
+    def shutdown(self, wait=True, finalizer=None):
+        """
+        Отменяет ожидающие задания и останавливает потоки (выполняющиеся дорабатывают при wait).
+        finalizer() выполняется в каждом рабочем потоке после его последнего задания —
+        для ресурсов, привязанных к потоку (например, экземпляров Office).
+        """
+        self._closed = True
+        self.cancel_all()
+        for lane, executor in self._lanes.items():
+            if finalizer is not None:
+                executor.submit(self._finalize, lane, finalizer)
+            # Ожидающие задания уже отменены в cancel_all, в очереди остается только finalizer
+            executor.shutdown(wait=wait, cancel_futures=finalizer is None)
+
+    @staticmethod
+    def _finalize(lane, finalizer):
+        try:
+            finalizer()
+        except Exception as e:
+            logger.warning(f"Ошибка при завершении потока очереди '{lane}': {e}", exc_info=True)
+
+    def _poll(self):
+        while True:
+            try:
+                kind, job, message = self._events.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                if kind == "progress":
+                    on_progress = self._handlers.get(job, (None,) * 4)[3]
+                    if on_progress is not None:
+                        on_progress(job, message)
+                else:
+                    self._finish(job)
+            except Exception as e:
+                logger.error(f"Ошибка в обработчике задания '{job.name}': {e}", exc_info=True)
+
+        if not self._closed:
+            self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def _finish(self, job):
+        on_done, on_error, on_cancel, _ = self._handlers.pop(job)
+        self._jobs.remove(job)
+        try:
+            result = job.future.result()
+        except (CancelledError, JobCancelled):
+            logger.info(f"Задание '{job.name}' отменено")
+            if on_cancel is not None:
+                on_cancel(job)
+            return
+        except Exception as e:
+            logger.error(f"Задание '{job.name}' завершилось с ошибкой: {e}", exc_info=e)
+            if on_error is not None:
+                on_error(job, e)
+            return
+
+        logger.info(f"Задание '{job.name}' выполнено")
+        if on_done is not None:
+            on_done(job, result)
@@ -0,0 +1,193 @@
+"""
+Пакетное формирование заключений без GUI.
+
+Запуск:
+    python batch_reports.py manifest.json [--workers N] [--output-dir DIR] [--format docx|doc|pdf]
+                                          [--update-helper]
+
+Манифест (JSON):
+    {
+        "output_dir": "reports",
+        "jobs": [
+            {
+                "name": "321-14",
+                "template": "КВД_Заполярка",
+                "workbook": "wells/321-14.xlsx",
+                "pdf": "wells/321-14.pdf",
+                "output": "Закл_321-14.pdf",
+                "format": "pdf",
+                "cells": {"A23": 245.1}
+            }
+        ]
+    }
+
+workbook — заполненная книга Report.xlsx для скважины (по умолчанию чистый Report.xlsx),
+cells — значения, записываемые на лист 'current' перед формированием, format — формат
+отчета (по умолчанию из --format; .doc и .pdf получаются через LibreOffice). Каждое задание
+работает со своей копией книги во временной папке. Хранилище предыдущих исследований
+и индексы шаблонов обновляются один раз до запуска пула; ошибка чтения истории
+скважины — ошибка задания, а не отчет без истории. С --update-helper строки
+реестра Helper.xlsm копятся в журнале и записываются в книгу один раз в конце
+пакета (без него Helper.xlsm не обновляется). Задания выполняются в пуле
+процессов; трассы этапов каждого отчета (JSON Chrome trace-event) пишутся
+в папку traces внутри output_dir.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from report_output import OUTPUT_FORMATS
+from report_trace import tracing
+
+logger = logging.getLogger(__name__)
+
+
+def load_manifest(path):
+    """Читает манифест и приводит пути заданий к абсолютным (относительно манифеста)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+
+    def resolve(value):
+        return os.path.normpath(os.path.join(base_dir, value)) if value else value
+
+    jobs = manifest["jobs"] if isinstance(manifest, dict) else manifest
+    for number, job in enumerate(jobs, 1):
+        if "template" not in job:
+            raise ValueError(f"Задание {number}: не указан шаблон (template)")
+        job.setdefault("name", f"job_{number}")
+        if job.get("format") is not None and job["format"] not in OUTPUT_FORMATS:
+            raise ValueError(f"Задание {number}: неизвестный формат {job['format']}")
+        job["workbook"] = resolve(job.get("workbook"))
+        job["pdf"] = resolve(job.get("pdf"))
+
+    output_dir = manifest.get("output_dir", ".") if isinstance(manifest, dict) else "."
+    return jobs, resolve(output_dir)
+
+
+def _write_cells(workbook_path, cells):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(workbook_path)
+    ws = wb['current']
+    for address, value in cells.items():
+        ws[address] = value
+    wb.save(workbook_path)
+    wb.close()
+
+
+def _init_worker():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s',
+        stream=sys.stderr
+    )
+
+
+def run_job(job, output_dir, output_format="docx", update_helper=False):
+    """
+    Формирует один отчет в собственной временной папке.
+
+    :return: словарь с результатом (name, ok, output, error, seconds)
+    """
+    started = time.perf_counter()
+    output_format = job.get("format") or output_format
+    output_path = os.path.join(output_dir,
+                               job.get("output") or f"Закл_{job['name']}{OUTPUT_FORMATS[output_format]}")
+    result = {"name": job["name"], "ok": False, "output": output_path, "error": None}
+    try:
+        # Модуль GUI тяжелый — импортируем при запуске пакета, а не модуля.
+        # Окно, app.log и tkinter он поднимает только в init_app() (запуск программы)
+        import GUI_Claudi
+
+        with tempfile.TemporaryDirectory(prefix="report_job_") as work_dir:
+            workbook_path = os.path.join(work_dir, "Report.xlsx")
+            shutil.copyfile(job.get("workbook") or GUI_Claudi.resource_path("Report.xlsx"), workbook_path)
+            if job.get("cells"):
+                _write_cells(workbook_path, job["cells"])
+
+            trace_path = GUI_Claudi.report_trace_path(output_path, os.path.join(output_dir, "traces"))
+            with tracing(trace_path, job["name"]):
+                result["ok"] = GUI_Claudi.build_report(
+                    job["template"],
+                    output_path,
+                    workbook_path=workbook_path,
+                    pdf_path=job.get("pdf"),
+                    plots_dir=os.path.join(work_dir, "plots"),
+                    update_helper=update_helper,
+                    flush_helper=False,
+                    work_dir=work_dir,
+                    pdf_workers=1,
+                    output_format=output_format,
+                    strict_history=True,
+                )
+            result["trace"] = trace_path
+            if not result["ok"]:
+                result["error"] = "Не удалось сформировать отчет"
+    except Exception as e:
+        logger.error(f"Задание {job['name']}: {e}", exc_info=True)
+        result["error"] = str(e)
+    result["seconds"] = round(time.perf_counter() - started, 2)
+    return result
+
+
+def run_batch(jobs, output_dir, workers=None, output_format="docx", update_helper=False):
+    """Выполняет задания в пуле процессов; возвращает результаты в порядке манифеста"""
+    import GUI_Claudi
+
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or max(1, (os.cpu_count() or 1) - 1)
+    results = [None] * len(jobs)
+
+    # Хранилище истории и индексы шаблонов обновляются один раз здесь, а не наперегонки в каждом процессе
+    GUI_Claudi.warm_shared_caches(job["template"] for job in jobs)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = {executor.submit(run_job, job, output_dir, output_format, update_helper): idx for idx, job in enumerate(jobs)}
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results[futures[future]] = result
+            status = "OK" if result["ok"] else f"ОШИБКА: {result['error']}"
+            print(f"[{done}/{len(jobs)}] {result['name']}: {status} ({result['seconds']} с)", flush=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетное формирование заключений по манифесту")
+    parser.add_argument("manifest", help="JSON-файл со списком заданий")
+    parser.add_argument("--workers", type=int, default=None, help="число процессов (по умолчанию — ядра минус одно)")
+    parser.add_argument("--output-dir", default=None, help="папка для отчетов (перекрывает output_dir манифеста)")
+    parser.add_argument("--format", default="docx", choices=list(OUTPUT_FORMATS),
+                        help="формат отчетов, для которых он не задан в манифесте")
+    parser.add_argument("--update-helper", action="store_true",
+                        help="добавить строки отчетов в Helper.xlsm (одной записью в конце)")
+    args = parser.parse_args(argv)
+
+    _init_worker()
+    jobs, output_dir = load_manifest(args.manifest)
+    output_dir = os.path.abspath(args.output_dir) if args.output_dir else output_dir
+
+    results = run_batch(jobs, output_dir, args.workers, args.format, args.update_helper)
+    if args.update_helper:
+        import GUI_Claudi
+
+        GUI_Claudi.flush_helper_journal()
+
+    summary_path = os.path.join(output_dir, "batch_summary.json")
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    failed = [result for result in results if not result["ok"]]
+    print(f"Готово: {len(results) - len(failed)} из {len(results)}; итоги в {summary_path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
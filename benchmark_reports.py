@@ -0,0 +1,401 @@
+"""
+Замеры производительности формирования отчетов на синтетических данных.
+
+Запуск:
+    python benchmark_reports.py [--rows N] [--wells M] [--tags K] [--tables T] [--pages P]
+                                [--repeat R] [--output bench.json] [--compare previous.json]
+
+Входные данные генерируются с фиксированным seed: лист 'current' с N строками
+давления, итоговая таблица table_prev с M скважинами, шаблон docx с K метками
+и T таблицами, PDF из P страниц с графиками. Замеряются отдельные функции
+(replace_tags_only, fix_units, calculate_r_difference, PDFReader.process_pdf,
+вставка из буфера, очистка книги) и build_report целиком — без Word, Excel и
+Helper.xlsm, поэтому замеры работают и в Linux.
+
+Результаты пишутся в JSON (время каждого повтора, минимум и медиана), --compare
+выводит отношение медиан к прошлому прогону. Замеры выполняются в отдельном
+процессе: модуль GUI при импорте в главном процессе перенастраивает логирование.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARAMS = {
+    "rows": 20000,
+    "wells": 500,
+    "tags": 200,
+    "tables": 5,
+    "pages": 8,
+    "repeat": 3,
+    "workers": 1,
+    "template": "КВД_Заполярка",
+    "seed": 1,
+    "end_to_end": True,
+}
+
+# Типы графиков — первое слово страницы PDF (см. PDFReader.plot_type)
+PLOT_TITLES = ("Диагностический", "Граф", "Полулогарифмический", "График", "Карта", "Аса")
+
+# Строки с единицами измерения для fix_units
+UNIT_SAMPLES = ("кгс/см2", "м3/сут", "г/см3", "м2", "кгс см2")
+
+
+# Синтетические входные данные -----------------------------------------------------------------
+
+def make_pressure_rows(rows, seed):
+    """Ряд замеров раздела 3: (дата 'дд.мм.гггг чч:мм:сс', давление) с шагом в минуту"""
+    rng = random.Random(seed)
+    started = datetime(2024, 1, 10, 8, 0, 0)
+    pressure = 150.0
+    result = []
+    for idx in range(rows):
+        pressure += rng.uniform(-0.05, 0.08)
+        result.append(((started + timedelta(minutes=idx)).strftime("%d.%m.%Y %H:%M:%S"), round(pressure, 3)))
+    return result
+
+
+def pressure_clipboard(rows, seed):
+    """Текст буфера обмена для раздела 3 (как при копировании из Excel)"""
+    return '\n'.join(f"{moment}\t{str(value).replace('.', ',')}" for moment, value in make_pressure_rows(rows, seed))
+
+
+def input_clipboard(rows=16):
+    """Текст буфера обмена для раздела 1 (входные данные A1:B16)"""
+    values = ["ООО Синтетика", "Синтетическое", "1 куст 1", "ВНК", "10.01.2024", "Пласт Ю1", "Пласт Ю2"]
+    values += [str(100 + idx).replace('.', ',') for idx in range(rows - len(values))]
+    return '\n'.join(f"Параметр {idx}\t{value}" for idx, value in enumerate(values, 1))
+
+
+def make_pressure_workbook(path, rows, seed):
+    """Книга с листом 'current': B12 и столбцы Q/R (даты и давление)"""
+    from openpyxl import Workbook
+
+    from pressure_series import MIN_B12_VALUE
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'current'
+    ws['B12'] = MIN_B12_VALUE + 70
+    for row, (moment, value) in enumerate(make_pressure_rows(rows, seed), 1):
+        ws.cell(row=row, column=17, value=datetime.strptime(moment, "%d.%m.%Y %H:%M:%S"))
+        ws.cell(row=row, column=18, value=value)
+    wb.save(path)
+
+
+def make_history_workbook(path, wells, seed, columns, tests_per_well=3):
+    """Итоговая таблица: 11 строк шапки, затем по tests_per_well исследований на скважину"""
+    from openpyxl import Workbook
+
+    from well_history import DATE_COLUMN, HEADER_ROWS, WELL_COLUMN
+
+    rng = random.Random(seed)
+    wb = Workbook()
+    ws = wb.active
+    for row in range(1, HEADER_ROWS + 1):
+        ws.cell(row=row, column=1, value=f"Шапка {row}")
+    header = [WELL_COLUMN] + list(dict.fromkeys(columns))
+    ws.append(header)
+    for well in range(1, wells + 1):
+        for _ in range(tests_per_well):
+            record = {column: round(rng.uniform(1, 300), 2) for column in header}
+            record[WELL_COLUMN] = str(well)
+            record[DATE_COLUMN] = (datetime(2015, 1, 1) + timedelta(days=rng.randrange(3000))).strftime("%d.%m.%Y")
+            ws.append([record[column] for column in header])
+    wb.save(path)
+
+
+def make_template(path, tags, tables, seed):
+    """
+    Шаблон docx: tags меток (bench_tag_N) в тексте и таблицах, строки с единицами,
+    параграфы без меток. Возвращает словарь data для подстановки.
+    """
+    from docx import Document
+
+    rng = random.Random(seed)
+    names = [f"bench_tag_{idx}" for idx in range(tags)]
+    in_tables = names[:len(names) // 4] if tables else []
+    in_text = names[len(in_tables):]
+
+    doc = Document()
+    for idx, name in enumerate(in_text):
+        doc.add_paragraph(f"Параграф без меток {idx}: описание хода исследования скважины.")
+        doc.add_paragraph(f"Значение {name}, {UNIT_SAMPLES[idx % len(UNIT_SAMPLES)]}")
+
+    for t_idx in range(tables):
+        part = in_tables[t_idx::tables]
+        table = doc.add_table(rows=len(part) + 1, cols=2)
+        table.rows[0].cells[0].text = "Параметр"
+        table.rows[0].cells[1].text = "Значение"
+        for row, name in zip(table.rows[1:], part):
+            row.cells[0].text = f"Параметр, {UNIT_SAMPLES[rng.randrange(len(UNIT_SAMPLES))]}"
+            row.cells[1].text = name
+    doc.save(path)
+    return {name: round(rng.uniform(0, 1000), 2) for name in names}
+
+
+def make_pdf(path, pages, seed):
+    """PDF интерпретации: на каждой странице заголовок-тип графика и ломаная в области CROP_BOX"""
+    import fitz
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for page_number in range(pages):
+        page = doc.new_page(width=595, height=842)
+        # Встроенный шрифт china-s содержит кириллицу (helv — нет)
+        page.insert_text((60, 60), PLOT_TITLES[page_number % len(PLOT_TITLES)], fontname="china-s", fontsize=14)
+        points = [fitz.Point(60 + x * 4.5, 250 + rng.uniform(-120, 120)) for x in range(100)]
+        page.draw_polyline(points, color=(0, 0, 1), width=1)
+        page.draw_rect(fitz.Rect(54, 108, 540, 396), color=(0, 0, 0), width=0.5)
+    doc.save(path)
+    doc.close()
+
+
+# Замер --------------------------------------------------------------------------------------
+
+def measure(function, setup=None, repeat=3):
+    """
+    Время выполнения function(*setup()) в repeat повторах; setup в замер не входит.
+
+    :return: словарь runs (секунды каждого повтора), min, median
+    """
+    runs = []
+    for _ in range(repeat):
+        args = setup() if setup is not None else ()
+        started = time.perf_counter()
+        function(*args)
+        runs.append(time.perf_counter() - started)
+    return {"runs": [round(run, 4) for run in runs], "min": round(min(runs), 4),
+            "median": round(statistics.median(runs), 4)}
+
+
+def run_benchmarks(params, work_dir):
+    """Генерирует входные данные в work_dir и выполняет замеры (в отдельном процессе)"""
+    results = {}
+    repeat = params["repeat"]
+
+    started = time.perf_counter()
+    import GUI_Claudi
+    results["import GUI_Claudi"] = {"runs": [round(time.perf_counter() - started, 4)]}
+
+    # Тяжелые библиотеки загружаются отложенно — подгружаем до замеров
+    started = time.perf_counter()
+    import docx  # noqa: F401
+    import fitz  # noqa: F401
+    import numpy  # noqa: F401
+    import openpyxl  # noqa: F401
+    import pandas  # noqa: F401
+    results["import libraries"] = {"runs": [round(time.perf_counter() - started, 4)]}
+
+    from docx import Document
+
+    from background_jobs import Job
+    from template_index import TemplateIndexCache
+    from well_history import WellHistoryStore
+    from workbook_session import WorkbookSession
+
+    def path(name):
+        return os.path.join(work_dir, name)
+
+    # Кеши графиков и индексов шаблонов — во временной папке, а не в рабочем каталоге программы
+    GUI_Claudi.PLOT_CACHE = GUI_Claudi.RenderCache(path("render_cache"))
+    GUI_Claudi.TEMPLATE_INDEX = GUI_Claudi.TemplateIndexCache(path("template_cache"), GUI_Claudi.TEMPLATE_TAGS)
+
+    logger.info("Генерация входных данных")
+    make_pressure_workbook(path("pressure.xlsx"), params["rows"], params["seed"])
+    make_history_workbook(path("history.xlsx"), params["wells"], params["seed"], GUI_Claudi.PREVIOUS_TEST_COLUMNS)
+    data = make_template(path("template.docx"), params["tags"], params["tables"], params["seed"])
+    make_pdf(path("plots.pdf"), params["pages"], params["seed"])
+
+    # Шаблон: замена меток и единиц -------------------------------------------------------
+    index_cache = TemplateIndexCache(path("bench_index"), list(data))
+
+    def fresh_doc():
+        return (Document(path("template.docx")),)
+
+    def fresh_indexed_doc():
+        doc = Document(path("template.docx"))
+        return doc, index_cache.get(path("template.docx"), doc)
+
+    logger.info("Замена меток и единиц измерения")
+    results["replace_tags_only"] = measure(lambda doc: GUI_Claudi.replace_tags_only(doc, data), fresh_doc, repeat)
+    results["replace_tags_only[index]"] = measure(
+        lambda doc, index: GUI_Claudi.replace_tags_only(doc, data, index), fresh_indexed_doc, repeat)
+    results["fix_units"] = measure(GUI_Claudi.fix_units, fresh_doc, repeat)
+    results["fix_units[index]"] = measure(GUI_Claudi.fix_units, fresh_indexed_doc, repeat)
+
+    # Книга: давление, история скважин --------------------------------------------------------
+    logger.info("Расчеты по книге и история скважин")
+    results["calculate_r_difference"] = measure(
+        lambda: GUI_Claudi.calculate_r_difference(path("pressure.xlsx")), repeat=repeat)
+
+    def fresh_store():
+        db_path = path("history.sqlite")
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        return (WellHistoryStore(db_path),)
+
+    results["WellHistoryStore.refresh"] = measure(
+        lambda store: store.refresh(path("history.xlsx")), fresh_store, repeat)
+
+    store = WellHistoryStore(path("history.sqlite"))
+    wells = [str(random.Random(params["seed"]).randrange(1, params["wells"] + 1)) for _ in range(100)]
+    results["WellHistoryStore.latest_test x100"] = measure(
+        lambda: [store.latest_test(path("history.xlsx"), well) for well in wells], repeat=repeat)
+    store.close()
+
+    # PDF --------------------------------------------------------------------------------------
+    logger.info("Отрисовка PDF")
+
+    def fresh_reader():
+        return (GUI_Claudi.PDFReader(path("plots.pdf"), output_dir=path("plots"), workers=params["workers"]),)
+
+    results["PDFReader.process_pdf"] = measure(lambda reader: reader.process_pdf(), fresh_reader, repeat)
+
+    # Вставка из буфера обмена и очистка книги ----------------------------------------------------
+    logger.info("Вставка данных и очистка книги")
+    shutil.copyfile(GUI_Claudi.resource_path("Report.xlsx"), path("Report.xlsx"))
+    host = GUI_Claudi.ReportGUI.__new__(GUI_Claudi.ReportGUI)
+    host.section_params = GUI_Claudi.SECTION_PARAMS
+    host.workbook = WorkbookSession(path("Report.xlsx"))
+    host.workbook.sheet
+
+    # Функции вставки выполняются как задания очереди книги; здесь — без исполнителя
+    paste_job = Job(None, "workbook", "benchmark")
+    inputs = input_clipboard()
+    pressure = pressure_clipboard(params["rows"], params["seed"])
+    results["paste_data_to_excel[section 1]"] = measure(
+        lambda: host.paste_data_to_excel(paste_job, inputs, 1), repeat=repeat)
+    results["paste_data_to_excel[section 3]"] = measure(
+        lambda: host.paste_data_to_excel(paste_job, pressure, 3), repeat=repeat)
+    results["WorkbookSession.save"] = measure(lambda: host.workbook.save(force=True), repeat=repeat)
+    prepared_workbook = path("Report_prepared.xlsx")
+    shutil.copyfile(path("Report.xlsx"), prepared_workbook)
+
+    def pasted():
+        host.paste_data_to_excel(paste_job, pressure, 3)
+        return ()
+
+    # clear_excel_file ставит в очередь книги эту же очистку
+    results["clear_excel_file"] = measure(
+        lambda: host.workbook.clear_ranges(GUI_Claudi.REPORT_CLEAR_RANGES), pasted, repeat)
+    host.workbook.close()
+
+    # Отчет целиком ---------------------------------------------------------------------------
+    if params["end_to_end"]:
+        logger.info("Формирование отчета целиком")
+
+        def fresh_report():
+            report_dir = tempfile.mkdtemp(prefix="report_", dir=work_dir)
+            workbook_path = os.path.join(report_dir, "Report.xlsx")
+            shutil.copyfile(prepared_workbook, workbook_path)
+            return report_dir, workbook_path
+
+        def build(report_dir, workbook_path):
+            ok = GUI_Claudi.build_report(params["template"], os.path.join(report_dir, "report.docx"),
+                                         workbook_path=workbook_path, pdf_path=path("plots.pdf"),
+                                         plots_dir=os.path.join(report_dir, "plots"), update_helper=False,
+                                         work_dir=report_dir, pdf_workers=params["workers"])
+            if not ok:
+                raise RuntimeError("build_report не сформировал отчет")
+
+        results["build_report"] = measure(build, fresh_report, repeat)
+    return results
+
+
+def _run_in_worker(params):
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', stream=sys.stderr)
+    # Подробный лог программы искажает замеры; выводятся только этапы и предупреждения
+    logging.getLogger().setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+    # Вне сборки PyInstaller ресурсы (Report.xlsx, шаблоны) ищутся от рабочего каталога
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory(prefix="report_bench_") as work_dir:
+        return run_benchmarks(params, work_dir)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, previous):
+    """Строки сравнения медиан с прошлым прогоном"""
+    lines = []
+    for name, current in results.items():
+        old = previous.get(name)
+        if old is None:
+            lines.append(f"{name}: {_median(current):.3f} с (нет в прошлом прогоне)")
+            continue
+        ratio = _median(current) / _median(old) if _median(old) else float('inf')
+        lines.append(f"{name}: {_median(old):.3f} -> {_median(current):.3f} с (x{ratio:.2f})")
+    return lines
+
+
+def _median(result):
+    return result.get("median", statistics.median(result["runs"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры формирования отчетов на синтетических данных")
+    parser.add_argument("--rows", type=int, default=DEFAULT_PARAMS["rows"], help="строк давления на листе")
+    parser.add_argument("--wells", type=int, default=DEFAULT_PARAMS["wells"], help="скважин в итоговой таблице")
+    parser.add_argument("--tags", type=int, default=DEFAULT_PARAMS["tags"], help="меток в шаблоне")
+    parser.add_argument("--tables", type=int, default=DEFAULT_PARAMS["tables"], help="таблиц в шаблоне")
+    parser.add_argument("--pages", type=int, default=DEFAULT_PARAMS["pages"], help="страниц PDF")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_PARAMS["repeat"], help="повторов каждого замера")
+    parser.add_argument("--workers", type=int, default=DEFAULT_PARAMS["workers"], help="процессов отрисовки PDF")
+    parser.add_argument("--template", default=DEFAULT_PARAMS["template"], help="шаблон для build_report")
+    parser.add_argument("--seed", type=int, default=DEFAULT_PARAMS["seed"])
+    parser.add_argument("--skip-end-to-end", action="store_true", help="не замерять build_report")
+    parser.add_argument("--output", default="benchmark_results.json", help="файл результатов")
+    parser.add_argument("--compare", default=None, help="результаты прошлого прогона для сравнения")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', stream=sys.stderr)
+    params = {key: getattr(args, key) for key in DEFAULT_PARAMS if key != "end_to_end"}
+    params["end_to_end"] = not args.skip_end_to_end
+
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        results = executor.submit(_run_in_worker, params).result()
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": params,
+        "results": results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for name, result in results.items():
+        print(f"{name}: {_median(result):.3f} с")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)["results"]
+        print(f"\nСравнение с {args.compare}:")
+        print("\n".join(compare(results, previous)))
+    print(f"Результаты: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
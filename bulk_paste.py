@@ -0,0 +1,86 @@
+"""
+Вставка больших таблиц из буфера обмена (разделы 3 и 6: дата и давление).
+
+Текст разбирается за один проход, значения приводятся к типам по столбцам
+целиком так же, как при вставке по ячейкам: числа (с запятой или точкой) —
+через pandas.to_numeric, остальное остается текстом. Даты не преобразуются:
+формулы листа 'current' (C4, C5, C43) работают с текстом дат столбцов Q и Y.
+Результат записывается в книгу блоком (WorkbookSession.write_columns),
+а не вызовом ws.cell на каждое значение.
+"""
+import re
+
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Символы вне базовой плоскости Unicode, которые не поддерживает Excel
+SUPPLEMENTARY_CHARS = re.compile('[\U00010000-\U0010FFFF]')
+
+
+def find_unsupported_value(text):
+    """Первое значение (ячейка TSV), содержащее неподдерживаемый символ, или None"""
+    match = SUPPLEMENTARY_CHARS.search(text)
+    if match is None:
+        return None
+    start = max(text.rfind('\t', 0, match.start()), text.rfind('\n', 0, match.start())) + 1
+    end = min(pos for pos in (text.find('\t', match.end()), text.find('\n', match.end()), len(text)) if pos >= 0)
+    return text[start:end].strip()
+
+
+def parse_tsv_columns(text, expected_columns):
+    """
+    Разбирает TSV в столбцы строк (пустые строки текста пропускаются).
+
+    Значения получаются одним split по всему тексту, а не разбором каждой строки.
+    Короткие строки дополняются пустыми значениями.
+    :raises ValueError: если в строке больше expected_columns значений
+    """
+    lines = [line for line in text.split('\n') if line.strip()]
+    if not lines:
+        return []
+
+    width = expected_columns - 1
+    for idx, count in enumerate([line.count('\t') for line in lines]):
+        if count > width:
+            raise ValueError(f"Неверное количество столбцов. Ожидается {expected_columns}, получено {count + 1}.")
+        if count < width:
+            lines[idx] += '\t' * (width - count)
+
+    values = [value.strip() for value in '\t'.join(lines).split('\t')]
+    return [values[column::expected_columns] for column in range(expected_columns)]
+
+
+def convert_column(values):
+    """
+    Приводит столбец строк к значениям для Excel: числа -> float, пустые -> None,
+    остальное (в том числе даты) остается текстом.
+    """
+    text = np.array(values, dtype=object)
+    result = np.full(len(text), None, dtype=object)
+    pending = np.flatnonzero(text != '')
+    if not len(pending):
+        return result.tolist()
+
+    # Значения не содержат перевода строки, поэтому запятые заменяются во всем столбце сразу;
+    # как и при вставке по ячейкам, замена остается и в текстовых значениях
+    column = np.array('\n'.join(text[pending]).replace(',', '.').split('\n'), dtype=object)
+    numbers = pd.to_numeric(pd.Series(column, dtype=object), errors='coerce').to_numpy(dtype=float)
+    parsed = ~np.isnan(numbers)
+    result[pending[parsed]] = numbers[parsed]
+    # То, что не разобрал pandas ('nan', '1_000' и т.п.), проверяется через float, как при вставке по ячейкам
+    result[pending[~parsed]] = [_to_float(value) for value in column[~parsed]]
+    return result.tolist()
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def parse_clipboard_table(text, expected_columns):
+    """TSV из буфера обмена -> список столбцов со значениями для записи в книгу"""
+    return [convert_column(column) for column in parse_tsv_columns(text, expected_columns)]
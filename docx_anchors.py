@@ -0,0 +1,121 @@
+"""
+Индекс опорных мест документа Word (якорей).
+
+Заголовки таблиц, строки-метки и метки {{...}} находятся за один обход
+XML документа. Якорь хранит элемент XML (w:tbl, w:tr, w:p), а объект
+python-docx для него создается один раз и берется из карты «элемент — объект»,
+поэтому проходы заполнения получают таблицу результатов, строку
+'Проницаемость, (мД)' или абзац {{PictureN}} без повторного обхода
+doc.paragraphs и doc.tables.
+
+Элементы XML не меняются при замене текста и вставке соседних строк,
+так что индекс остается верным, пока не удален сам элемент якоря.
+"""
+import re
+
+from docx.oxml.ns import qn
+from docx.table import Table, _Row
+from docx.text.paragraph import Paragraph
+
+# Таблицы, следующие за абзацем с текстом: имя якоря -> текст заголовка
+TABLE_HEADINGS = {
+    "results_table": "Протокол результатов исследования",
+}
+
+# Строки таблиц по тексту первой ячейки: имя якоря -> текст
+ROW_MARKERS = {
+    "permeability_row": "Проницаемость, (мД)",
+}
+
+PLACEHOLDER_PATTERN = re.compile(r'\{\{[^{}]+\}\}')
+
+_P = qn('w:p')
+_T = qn('w:t')
+_TBL = qn('w:tbl')
+_TR = qn('w:tr')
+_TC = qn('w:tc')
+
+
+def _text(element):
+    return "".join(t.text or "" for t in element.iter(_T))
+
+
+class AnchorIndex:
+    """Якоря документа: таблицы по заголовкам, строки-метки и абзацы с метками {{...}}"""
+
+    def __init__(self, doc, headings=None, row_markers=None):
+        self._parent = doc._body
+        self._proxies = {}
+        # абзац в таблице -> его строка w:tr
+        self._row_of = {}
+        self._tables = {}
+        self._rows = {}
+        self._placeholders = {}
+        self._build(doc.element.body,
+                    TABLE_HEADINGS if headings is None else headings,
+                    ROW_MARKERS if row_markers is None else row_markers)
+
+    def _add_placeholders(self, p, text):
+        for placeholder in PLACEHOLDER_PATTERN.findall(text):
+            self._placeholders.setdefault(placeholder, []).append(p)
+
+    def _build(self, body, headings, row_markers):
+        pending = []
+        for element in body.iterchildren(_P, _TBL):
+            if element.tag == _P:
+                text = _text(element)
+                pending.extend(name for name, title in headings.items()
+                               if title in text and name not in self._tables and name not in pending)
+                self._add_placeholders(element, text)
+                continue
+
+            # Таблица после заголовка (как и раньше — первая следующая таблица тела документа)
+            for name in pending:
+                self._tables[name] = element
+            pending = []
+
+            for tr in element.iter(_TR):
+                cells = tr.findall(_TC)
+                if cells:
+                    first = _text(cells[0])
+                    for name, marker in row_markers.items():
+                        if name not in self._rows and marker in first:
+                            self._rows[name] = tr
+            for p in element.iter(_P):
+                # Абзац вложенной таблицы относится к ближайшей строке
+                self._row_of[p] = next(p.iterancestors(_TR))
+                self._add_placeholders(p, _text(p))
+
+    def proxy(self, element):
+        """Объект python-docx для элемента w:tbl, w:tr или w:p (один на элемент)"""
+        proxy = self._proxies.get(element)
+        if proxy is None:
+            if element.tag == _TBL:
+                proxy = Table(element, self._parent)
+            elif element.tag == _TR:
+                proxy = _Row(element, self.proxy(element.getparent()))
+            else:
+                proxy = Paragraph(element, self._parent)
+            self._proxies[element] = proxy
+        return proxy
+
+    def table(self, name):
+        """Таблица по имени якоря из TABLE_HEADINGS или None"""
+        element = self._tables.get(name)
+        return self.proxy(element) if element is not None else None
+
+    def row(self, name):
+        """Элемент w:tr строки-метки из ROW_MARKERS или None"""
+        return self._rows.get(name)
+
+    def row_of(self, p):
+        """Строка таблицы (w:tr), в которой находится абзац, или None для основного текста"""
+        return self._row_of.get(p)
+
+    def placeholders(self, placeholder):
+        """Абзацы с меткой в порядке документа: список (Paragraph, в таблице ли)"""
+        return [(self.proxy(p), p in self._row_of) for p in self._placeholders.get(placeholder, ())]
+
+    def discard(self, placeholder):
+        """Забывает метку, место которой занято (например, строка-образец заменена таблицей)"""
+        self._placeholders.pop(placeholder, None)
@@ -0,0 +1,296 @@
+"""
+Быстрое построение таблиц Word на уровне XML.
+
+table.add_row() и table.cell(r, c) в python-docx каждый раз заново строят
+сетку таблицы, поэтому заполнение по ячейкам растет квадратично с числом
+строк. Здесь строка-образец (w:tr) один раз сериализуется в XML с метками
+вместо текста ячеек, строки данных собираются подстановкой отформатированных
+значений в этот текст, и все строки разбираются одним вызовом парсера.
+Оформление образца (выравнивание, шрифт, границы) переходит в каждую строку.
+
+    insert_table(doc, "Prognoz_Ppl", rows, [
+        Column("Дата", 0, format_date()),
+        Column("Рпл, кгс/см2", 1, format_number(1)),
+    ])
+
+Метка в абзаце заменяется новой таблицей (заголовок — названия столбцов).
+Метка в строке таблицы шаблона означает, что эта таблица и есть образец:
+строки выше остаются заголовком, строка с меткой — образец строк данных.
+"""
+import copy
+import re
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import qn
+from docx.table import Table
+from lxml import etree
+
+from docx_anchors import PLACEHOLDER_PATTERN
+
+DATE_FORMATS = ("%d.%m.%Y %H:%M:%S", "%d.%m.%Y %H:%M", "%d.%m.%Y", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+
+# Метка значения i в тексте строки-образца (символы из области для частного использования)
+_MARK = "\ue000{}\ue001"
+_MARK_PATTERN = re.compile("\ue000(\\d+)\ue001")
+_XMLNS_PATTERN = re.compile(r'\sxmlns(?::[\w.-]+)?="[^"]*"')
+_INVALID_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_UNITS_PATTERN = re.compile(r'(кгс|г|м)([/ ]?[см]?)(2|3)')
+
+
+# Форматирование значений ------------------------------------------------------------------
+
+def _is_missing(value):
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return value != value
+    if isinstance(value, str):
+        return not value.strip()
+    # pandas.NA и pandas.NaT
+    return type(value).__name__ in ("NAType", "NaTType")
+
+
+def _to_datetime(value):
+    if getattr(value, "dtype", None) is not None and value.dtype.kind == 'M':
+        # numpy.datetime64 (NaT -> None)
+        return value.astype('datetime64[us]').item()
+    if isinstance(value, (datetime, date)):
+        return value
+    if isinstance(value, str):
+        for fmt in DATE_FORMATS:
+            try:
+                return datetime.strptime(value.strip(), fmt)
+            except ValueError:
+                continue
+    return None
+
+
+def format_text(value):
+    """Текст значения; пустые значения и NaN — пустая строка"""
+    return "" if _is_missing(value) else str(value)
+
+
+def format_date(fmt="%d.%m.%Y"):
+    """Форматтер дат: datetime, numpy.datetime64 и строки в форматах DATE_FORMATS"""
+    def formatter(value):
+        if _is_missing(value):
+            return ""
+        value = _to_datetime(value)
+        return value.strftime(fmt) if value is not None else ""
+    return formatter
+
+
+def format_number(digits=1):
+    """Форматтер чисел с округлением; нечисловые значения — пустая строка"""
+    def formatter(value):
+        if _is_missing(value) or isinstance(value, bool):
+            return ""
+        if isinstance(value, int):
+            return str(value)
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return ""
+        if value != value:
+            return ""
+        return str(round(value, digits))
+    return formatter
+
+
+def superscript_units(value):
+    """Текст с надстрочными степенями единиц: кгс/см2 -> кгс/см², м3 -> м³"""
+    return _UNITS_PATTERN.sub(lambda m: f"{m.group(1)}{m.group(2)}{'²' if m.group(3) == '2' else '³'}",
+                              format_text(value))
+
+
+class Column:
+    """Столбец таблицы: заголовок, ключ в данных (имя или номер) и форматтер значения"""
+
+    def __init__(self, title, key=None, formatter=format_text):
+        self.title = title
+        self.key = key
+        self.formatter = formatter
+
+
+def _column_values(data, key):
+    if hasattr(data, "iloc"):
+        # pandas.DataFrame: по имени столбца или по номеру
+        return data[key].to_numpy() if key in data.columns else data.iloc[:, key].to_numpy()
+    if getattr(data, "ndim", None) == 2:
+        return data[:, key]
+    if hasattr(data, "keys"):
+        return data[key]
+    return [row.get(key) if hasattr(row, "get") else row[key] for row in data]
+
+
+def table_rows(data, columns, skip_empty=True):
+    """
+    Строки таблицы (списки текстов ячеек) из DataFrame, словаря массивов,
+    двумерного массива NumPy или последовательности строк/словарей.
+    """
+    values = [_column_values(data, column.key if column.key is not None else index)
+              for index, column in enumerate(columns)]
+    formatters = [column.formatter for column in columns]
+    for row in zip(*values):
+        cells = [formatter(value) for formatter, value in zip(formatters, row)]
+        if skip_empty and not any(cells):
+            continue
+        yield cells
+
+
+# Построение XML ---------------------------------------------------------------------------
+
+def set_cell_text(tc, text):
+    """
+    Записывает текст в ячейку w:tc: первый абзац сохраняет свойства (w:pPr)
+    и оформление первого фрагмента (w:rPr), остальные абзацы удаляются.
+    """
+    paragraphs = tc.findall(qn('w:p'))
+    if paragraphs:
+        paragraph = paragraphs[0]
+        for extra in paragraphs[1:]:
+            tc.remove(extra)
+    else:
+        paragraph = OxmlElement('w:p')
+        tc.append(paragraph)
+
+    first_run = paragraph.find(qn('w:r'))
+    run_properties = first_run.find(qn('w:rPr')) if first_run is not None else None
+    for child in list(paragraph):
+        if child.tag != qn('w:pPr'):
+            paragraph.remove(child)
+
+    if text == "":
+        return
+    run = OxmlElement('w:r')
+    if run_properties is not None:
+        run.append(copy.deepcopy(run_properties))
+    lines = str(text).split("\n")
+    for number, line in enumerate(lines):
+        if number:
+            run.append(OxmlElement('w:br'))
+        t = OxmlElement('w:t')
+        t.set(qn('xml:space'), 'preserve')
+        t.text = line
+        run.append(t)
+    paragraph.append(run)
+
+
+def _escape_value(text):
+    text = escape(_INVALID_XML_CHARS.sub("", text))
+    return text.replace("\n", '</w:t><w:br/><w:t xml:space="preserve">')
+
+
+def _row_template(prototype, count):
+    """Текст строки-образца, разбитый метками: [текст, номер, текст, номер, ..., текст]"""
+    tr = copy.deepcopy(prototype)
+    for index, tc in enumerate(tr.findall(qn('w:tc'))):
+        set_cell_text(tc, _MARK.format(index) if index < count else "")
+    xml = etree.tostring(tr, encoding='unicode')
+    # Пространства имен объявляются один раз на общем элементе
+    head_end = xml.index(">")
+    xml = _XMLNS_PATTERN.sub("", xml[:head_end]) + xml[head_end:]
+    parts = _MARK_PATTERN.split(xml)
+    return parts[0::2], [int(index) for index in parts[1::2]]
+
+
+def emit_rows(prototype, rows):
+    """
+    Заменяет строку-образец w:tr строками данных за один разбор XML.
+
+    :param prototype: элемент w:tr с оформлением строк данных
+    :param rows: последовательность строк (тексты ячеек)
+    :return: число вставленных строк
+    """
+    rows = list(rows)
+    count = max((len(row) for row in rows), default=0)
+    texts, indexes = _row_template(prototype, count)
+    pieces = []
+    for row in rows:
+        pieces.append(texts[0])
+        for index, text in zip(indexes, texts[1:]):
+            pieces.append(_escape_value(row[index]) if index < len(row) else "")
+            pieces.append(text)
+
+    namespaces = " ".join(f'xmlns:{prefix}="{uri}"' for prefix, uri in prototype.nsmap.items() if prefix)
+    container = parse_xml(f"<w:tbl {namespaces}>{''.join(pieces)}</w:tbl>")
+
+    parent = prototype.getparent()
+    position = parent.index(prototype)
+    parent[position:position + 1] = list(container)
+    return len(rows)
+
+
+# Вставка по метке -------------------------------------------------------------------------
+
+def find_placeholder(doc, placeholder, anchors=None):
+    """
+    Место метки в документе: ('row', w:tr) — строка таблицы, ('paragraph', абзац) —
+    абзац основного текста, или None.
+
+    :param anchors: индекс якорей документа (docx_anchors) — метки {{...}} берутся из него
+    """
+    if anchors is not None and PLACEHOLDER_PATTERN.fullmatch(placeholder):
+        found = anchors.placeholders(placeholder)
+        if not found:
+            return None
+        paragraph, in_table = found[0]
+        return ("row", anchors.row_of(paragraph._p)) if in_table else ("paragraph", paragraph)
+
+    body = doc.element.body
+    for tr in body.iter(qn('w:tr')):
+        if placeholder in "".join(t.text or "" for t in tr.iter(qn('w:t'))):
+            return "row", tr
+    for paragraph in doc.paragraphs:
+        if placeholder in paragraph.text:
+            return "paragraph", paragraph
+    return None
+
+
+def _new_table(doc, columns, style):
+    table = doc.add_table(rows=2, cols=len(columns))
+    if style:
+        try:
+            table.style = style
+        except KeyError:
+            pass
+    for cell, column in zip(table.rows[0].cells, columns):
+        cell.text = str(column.title)
+        cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+        for run in cell.paragraphs[0].runs:
+            run.font.bold = True
+    for cell in table.rows[1].cells:
+        cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+    return table
+
+
+def insert_table(doc, placeholder, data, columns, style='Table Grid', skip_empty=True, anchors=None):
+    """
+    Вставляет таблицу data на место метки placeholder.
+
+    :param columns: список Column
+    :param style: стиль новой таблицы (для метки в абзаце)
+    :param anchors: индекс якорей документа (см. find_placeholder)
+    :return: таблица python-docx или None, если метка не найдена
+    """
+    location = find_placeholder(doc, placeholder, anchors)
+    if location is None:
+        return None
+    if anchors is not None:
+        anchors.discard(placeholder)
+    kind, anchor = location
+    rows = table_rows(data, columns, skip_empty)
+
+    if kind == "row":
+        tbl = anchor.getparent()
+        emit_rows(anchor, rows)
+        return Table(tbl, doc._body)
+
+    table = _new_table(doc, columns, style)
+    emit_rows(table.rows[1]._tr, rows)
+    anchor.text = anchor.text.replace(placeholder, "")
+    anchor._element.addnext(table._tbl)
+    return table
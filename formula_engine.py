@@ -0,0 +1,1441 @@
+"""
+Вычисление формул листа Report.xlsx без Excel.
+
+Модуль читает формулы листа через openpyxl, строит граф зависимостей ячеек
+и вычисляет только те ячейки, которые нужны для отчета. Поддерживаются
+функции, которые реально используются в Report.xlsx.
+"""
+import logging
+import math
+import os
+import re
+from bisect import bisect_right
+from datetime import date, datetime, time as dt_time, timedelta
+
+from lazy_imports import lazy_import
+
+load_workbook = lazy_import("openpyxl", "load_workbook")
+is_date_format = lazy_import("openpyxl.styles.numbers", "is_date_format")
+column_index_from_string = lazy_import("openpyxl.utils", "column_index_from_string")
+get_column_letter = lazy_import("openpyxl.utils", "get_column_letter")
+range_boundaries = lazy_import("openpyxl.utils", "range_boundaries")
+
+logger = logging.getLogger(__name__)
+
+# Начало отсчета дат Excel (система 1900 с учетом ошибки 29.02.1900)
+EXCEL_EPOCH = datetime(1899, 12, 30)
+
+# Разделитель дробной части при преобразовании числа в текст (русская локаль Excel)
+DECIMAL_SEPARATOR = ','
+
+# Блок листа 'current', который читает отчет (report_fields.json)
+REPORT_AREA = 'A1:AN150'
+
+
+class ExcelError(Exception):
+    """Значение ошибки Excel (#N/A, #VALUE! и т.д.)"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+    def __eq__(self, other):
+        return isinstance(other, ExcelError) and other.code == self.code
+
+    def __hash__(self):
+        return hash(self.code)
+
+    def __repr__(self):
+        return f"ExcelError({self.code!r})"
+
+    def __str__(self):
+        return self.code
+
+
+NA = ExcelError('#N/A')
+VALUE = ExcelError('#VALUE!')
+REF = ExcelError('#REF!')
+DIV0 = ExcelError('#DIV/0!')
+NUM = ExcelError('#NUM!')
+NAME = ExcelError('#NAME?')
+
+# Коды ошибок, которые возвращает COM при чтении ячейки с ошибкой
+COM_ERROR_CODES = {
+    '#NULL!': -2146826288,
+    '#DIV/0!': -2146826281,
+    '#VALUE!': -2146826273,
+    '#REF!': -2146826265,
+    '#NAME?': -2146826259,
+    '#NUM!': -2146826252,
+    '#N/A': -2146826246,
+}
+
+
+# Преобразования типов -----------------------------------------------------------------------
+
+_DATE_FORMATS = ("%d.%m.%Y %H:%M:%S", "%d.%m.%Y %H:%M", "%d.%m.%Y", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+_TIME_FORMATS = ("%H:%M:%S", "%H:%M")
+_NUMBER_RE = re.compile(r'^[+-]?(\d+([.,]\d*)?|[.,]\d+)([eE][+-]?\d+)?$')
+
+
+def to_serial(value):
+    """Переводит datetime/date/time в серийный номер даты Excel"""
+    if isinstance(value, datetime):
+        delta = value - EXCEL_EPOCH
+        return delta.days + delta.seconds / 86400 + delta.microseconds / 86400e6
+    if isinstance(value, date):
+        return float((value - EXCEL_EPOCH.date()).days)
+    if isinstance(value, dt_time):
+        return (value.hour * 3600 + value.minute * 60 + value.second) / 86400
+    raise VALUE
+
+
+def from_serial(serial):
+    """Переводит серийный номер даты Excel в datetime"""
+    return EXCEL_EPOCH + timedelta(days=serial)
+
+
+def to_number(value):
+    """Приводит значение к числу по правилам арифметики Excel"""
+    if isinstance(value, ExcelError):
+        raise value
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, (datetime, date, dt_time)):
+        return to_serial(value)
+    if isinstance(value, str):
+        text = value.strip()
+        if _NUMBER_RE.match(text):
+            return float(text.replace(',', '.'))
+        for fmt in _DATE_FORMATS:
+            try:
+                return to_serial(datetime.strptime(text, fmt))
+            except ValueError:
+                continue
+        for fmt in _TIME_FORMATS:
+            try:
+                return to_serial(datetime.strptime(text, fmt).time())
+            except ValueError:
+                continue
+    raise VALUE
+
+
+def to_text(value):
+    """Приводит значение к строке по правилам Excel"""
+    if isinstance(value, ExcelError):
+        raise value
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (datetime, date, dt_time)):
+        value = to_serial(value)
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        return f"{value:.15g}".replace('.', DECIMAL_SEPARATOR)
+    return str(value)
+
+
+def to_bool(value):
+    """Приводит значение к логическому по правилам Excel"""
+    if isinstance(value, ExcelError):
+        raise value
+    if value is None:
+        return False
+    if isinstance(value, str):
+        upper = value.strip().upper()
+        if upper == "TRUE":
+            return True
+        if upper == "FALSE":
+            return False
+        raise VALUE
+    return bool(to_number(value))
+
+
+def _type_rank(value):
+    """Порядок типов при сравнении: число < текст < логическое"""
+    if isinstance(value, bool):
+        return 2
+    if isinstance(value, str):
+        return 1
+    return 0
+
+
+def compare(left, right):
+    """Сравнивает два значения как Excel. Возвращает -1, 0 или 1"""
+    if isinstance(left, ExcelError):
+        raise left
+    if isinstance(right, ExcelError):
+        raise right
+    # Пустая ячейка равна 0, "" или FALSE в зависимости от второго операнда
+    if left is None:
+        left = "" if isinstance(right, str) else (False if isinstance(right, bool) else 0)
+    if right is None:
+        right = "" if isinstance(left, str) else (False if isinstance(left, bool) else 0)
+    if isinstance(left, (datetime, date, dt_time)):
+        left = to_serial(left)
+    if isinstance(right, (datetime, date, dt_time)):
+        right = to_serial(right)
+
+    left_rank, right_rank = _type_rank(left), _type_rank(right)
+    if left_rank != right_rank:
+        return -1 if left_rank < right_rank else 1
+    if left_rank == 1:
+        left, right = left.lower(), right.lower()
+    if left == right:
+        return 0
+    return -1 if left < right else 1
+
+
+# Диапазоны ----------------------------------------------------------------------------------
+
+class RangeValue:
+    """Прямоугольный диапазон листа, значения читаются из вычислителя"""
+
+    __slots__ = ('evaluator', 'min_row', 'min_col', 'max_row', 'max_col')
+
+    def __init__(self, evaluator, min_row, min_col, max_row, max_col):
+        self.evaluator = evaluator
+        self.min_row = min_row
+        self.min_col = min_col
+        self.max_row = max_row
+        self.max_col = max_col
+
+    @property
+    def height(self):
+        return self.max_row - self.min_row + 1
+
+    @property
+    def width(self):
+        return self.max_col - self.min_col + 1
+
+    def column(self, offset=0):
+        """Значения одного столбца диапазона"""
+        return self.evaluator.column_values(self.min_col + offset, self.min_row, self.max_row)
+
+    def cell(self, row_offset, col_offset):
+        return self.evaluator.value(self.min_row + row_offset, self.min_col + col_offset)
+
+    def flat(self):
+        """Все значения диапазона построчно"""
+        if self.width == 1:
+            return list(self.column())
+        columns = [self.column(i) for i in range(self.width)]
+        return [value for row in zip(*columns) for value in row]
+
+
+def _as_array(value):
+    if isinstance(value, RangeValue):
+        return value.flat()
+    return value
+
+
+# Встроенные функции -------------------------------------------------------------------------
+
+def _fn_abs(number):
+    return abs(to_number(number))
+
+
+def _fn_sqrt(number):
+    number = to_number(number)
+    if number < 0:
+        raise NUM
+    return math.sqrt(number)
+
+
+def _fn_len(text):
+    return len(to_text(text))
+
+
+def _fn_trim(text):
+    return re.sub(' +', ' ', to_text(text)).strip(' ')
+
+
+def _fn_left(text, count=1):
+    count = int(to_number(count))
+    if count < 0:
+        raise VALUE
+    return to_text(text)[:count]
+
+
+def _fn_right(text, count=1):
+    count = int(to_number(count))
+    if count < 0:
+        raise VALUE
+    text = to_text(text)
+    return text[len(text) - count:] if count else ""
+
+
+def _fn_mid(text, start, count):
+    start, count = int(to_number(start)), int(to_number(count))
+    if start < 1 or count < 0:
+        raise VALUE
+    return to_text(text)[start - 1:start - 1 + count]
+
+
+def _fn_find(needle, haystack, start=1):
+    start = int(to_number(start))
+    haystack = to_text(haystack)
+    if start < 1 or start > len(haystack) + 1:
+        raise VALUE
+    position = haystack.find(to_text(needle), start - 1)
+    if position < 0:
+        raise VALUE
+    return position + 1
+
+
+def _fn_substitute(text, old, new, instance=None):
+    text, old, new = to_text(text), to_text(old), to_text(new)
+    if not old:
+        return text
+    if instance is None:
+        return text.replace(old, new)
+    instance = int(to_number(instance))
+    if instance < 1:
+        raise VALUE
+    position = -1
+    for _ in range(instance):
+        position = text.find(old, position + 1)
+        if position < 0:
+            return text
+    return text[:position] + new + text[position + len(old):]
+
+
+def _fn_concatenate(*parts):
+    return ''.join(to_text(part) for part in parts)
+
+
+def _fn_today():
+    return float((date.today() - EXCEL_EPOCH.date()).days)
+
+
+def _fn_counta(*values):
+    total = 0
+    for value in values:
+        if isinstance(value, RangeValue):
+            total += sum(1 for item in value.flat() if item is not None)
+        elif isinstance(value, list):
+            total += sum(1 for item in value if item is not None)
+        elif value is not None:
+            total += 1
+    return total
+
+
+def _fn_index(reference, row_num, col_num=None):
+    row_num = int(to_number(row_num))
+    col_num = int(to_number(col_num)) if col_num is not None else 1
+    if isinstance(reference, RangeValue):
+        if reference.height == 1 and col_num == 1 and row_num > 1:
+            # INDEX по одномерной строке принимает номер столбца первым аргументом
+            row_num, col_num = 1, row_num
+        if not (0 <= row_num <= reference.height and 0 <= col_num <= reference.width):
+            raise REF
+        if row_num == 0 or col_num == 0:
+            # Номер 0 — весь столбец (строку) диапазона; в ячейке значение берется неявным пересечением
+            min_row, max_row = ((reference.min_row, reference.max_row) if row_num == 0
+                                else (reference.min_row + row_num - 1,) * 2)
+            min_col, max_col = ((reference.min_col, reference.max_col) if col_num == 0
+                                else (reference.min_col + col_num - 1,) * 2)
+            return RangeValue(reference.evaluator, min_row, min_col, max_row, max_col)
+        return reference.cell(row_num - 1, col_num - 1)
+    if isinstance(reference, list):
+        if not 1 <= row_num <= len(reference):
+            raise REF
+        return reference[row_num - 1]
+    if row_num in (0, 1) and col_num in (0, 1):
+        return reference
+    raise REF
+
+
+def _approximate_position(values, lookup):
+    """
+    Позиция значения <= lookup среди значений того же типа двоичным поиском, как в Excel.
+    Порядок данных не проверяется: для неотсортированного столбца (например, с текстовым
+    заголовком над отметками времени) результат совпадает с Excel, а не с линейным поиском.
+    """
+    rank = _type_rank(lookup)
+    keys, positions = [], []
+    for position, value in enumerate(values):
+        if value is None or isinstance(value, ExcelError):
+            continue
+        if isinstance(value, (datetime, date, dt_time)):
+            value = to_serial(value)
+        if _type_rank(value) != rank:
+            continue
+        keys.append(value.lower() if rank == 1 else value)
+        positions.append(position)
+    if isinstance(lookup, (datetime, date, dt_time)):
+        lookup = to_serial(lookup)
+    lookup_key = lookup.lower() if rank == 1 else lookup
+    index = bisect_right(keys, lookup_key) - 1
+    if index < 0:
+        raise NA
+    return positions[index]
+
+
+def _exact_position(values, lookup):
+    for position, value in enumerate(values):
+        if isinstance(value, ExcelError) or value is None:
+            continue
+        try:
+            if compare(value, lookup) == 0:
+                return position
+        except ExcelError:
+            continue
+    raise NA
+
+
+def _fn_vlookup(lookup, table, col_index, approximate=True):
+    if isinstance(lookup, ExcelError):
+        raise lookup
+    if not isinstance(table, RangeValue):
+        raise NA
+    col_index = int(to_number(col_index))
+    if col_index < 1:
+        raise VALUE
+    if col_index > table.width:
+        raise REF
+    keys = table.column(0)
+    if to_bool(approximate):
+        position = _approximate_position(keys, lookup)
+    else:
+        position = _exact_position(keys, lookup)
+    return table.cell(position, col_index - 1)
+
+
+def _fn_match(lookup, lookup_range, match_type=1):
+    values = lookup_range.flat() if isinstance(lookup_range, RangeValue) else list(lookup_range)
+    match_type = int(to_number(match_type))
+    if match_type == 0:
+        return _exact_position(values, lookup) + 1
+    if match_type > 0:
+        return _approximate_position(values, lookup) + 1
+    # match_type = -1: наименьшее значение >= lookup в убывающем списке
+    best = None
+    for position, value in enumerate(values):
+        if value is None or isinstance(value, ExcelError) or _type_rank(value) != _type_rank(lookup):
+            continue
+        if compare(value, lookup) >= 0:
+            best = position
+        else:
+            break
+    if best is None:
+        raise NA
+    return best + 1
+
+
+def _fn_row(reference=None, *, host_row=None):
+    if reference is None:
+        return host_row
+    if isinstance(reference, RangeValue):
+        if reference.height == 1:
+            return reference.min_row
+        return list(range(reference.min_row, reference.max_row + 1))
+    raise VALUE
+
+
+def _fn_aggregate(function_num, options, array, k=None):
+    function_num = int(to_number(function_num))
+    options = int(to_number(options))
+    values = _as_array(array)
+    if not isinstance(values, list):
+        values = [values]
+    ignore_errors = options in (2, 3, 6, 7)
+    numbers = []
+    for value in values:
+        if isinstance(value, ExcelError):
+            if ignore_errors:
+                continue
+            raise value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            numbers.append(value)
+    if function_num in (14, 15):
+        k = int(to_number(k))
+        if not 1 <= k <= len(numbers):
+            raise NUM
+        ordered = sorted(numbers, reverse=(function_num == 14))
+        return ordered[k - 1]
+    if not numbers and function_num in (1, 4, 5):
+        raise DIV0 if function_num == 1 else NUM
+    if function_num == 1:
+        return sum(numbers) / len(numbers)
+    if function_num == 2:
+        return len(numbers)
+    if function_num == 4:
+        return max(numbers)
+    if function_num == 5:
+        return min(numbers)
+    if function_num == 9:
+        return sum(numbers)
+    raise VALUE
+
+
+_DATE_TOKEN_RE = re.compile(r'гггг|yyyy|гг|yy|мм|mm|MM|дд|dd|чч|hh|HH|сс|ss|"[^"]*"|\\.', re.IGNORECASE)
+
+
+def _fn_text(value, format_text):
+    format_text = to_text(format_text)
+    number = to_number(value)
+    if not re.search(r'[гyдdчhсs]', format_text, re.IGNORECASE):
+        # Числовой формат: количество знаков после разделителя
+        match = re.search(r'[.,](0+)', format_text)
+        decimals = len(match.group(1)) if match else 0
+        text = f"{number:.{decimals}f}"
+        return text.replace('.', DECIMAL_SEPARATOR)
+
+    moment = from_serial(number)
+    tokens = list(_DATE_TOKEN_RE.finditer(format_text))
+    result, position = [], 0
+    for index, match in enumerate(tokens):
+        result.append(format_text[position:match.start()])
+        position = match.end()
+        token = match.group().lower()
+        if token in ('гггг', 'yyyy'):
+            result.append(f"{moment.year:04d}")
+        elif token in ('гг', 'yy'):
+            result.append(f"{moment.year % 100:02d}")
+        elif token in ('дд', 'dd'):
+            result.append(f"{moment.day:02d}")
+        elif token in ('чч', 'hh'):
+            result.append(f"{moment.hour:02d}")
+        elif token in ('сс', 'ss'):
+            result.append(f"{moment.second:02d}")
+        elif token in ('мм', 'mm'):
+            # мм после часов или перед секундами — минуты, иначе месяц
+            previous = tokens[index - 1].group().lower() if index > 0 else ''
+            following = tokens[index + 1].group().lower() if index + 1 < len(tokens) else ''
+            if previous in ('чч', 'hh') or following in ('сс', 'ss'):
+                result.append(f"{moment.minute:02d}")
+            else:
+                result.append(f"{moment.month:02d}")
+        elif token.startswith('"'):
+            result.append(token[1:-1])
+        else:
+            result.append(match.group()[1:])
+    result.append(format_text[position:])
+    return ''.join(result)
+
+
+# Функции с обычным (энергичным) вычислением аргументов
+FUNCTIONS = {
+    'ABS': _fn_abs,
+    'SQRT': _fn_sqrt,
+    'LEN': _fn_len,
+    'TRIM': _fn_trim,
+    'LEFT': _fn_left,
+    'LEFTB': _fn_left,
+    'RIGHT': _fn_right,
+    'RIGHTB': _fn_right,
+    'MID': _fn_mid,
+    'FIND': _fn_find,
+    'SUBSTITUTE': _fn_substitute,
+    'CONCATENATE': _fn_concatenate,
+    'TODAY': _fn_today,
+    'COUNTA': _fn_counta,
+    'INDEX': _fn_index,
+    'VLOOKUP': _fn_vlookup,
+    'MATCH': _fn_match,
+    'AGGREGATE': _fn_aggregate,
+    'TEXT': _fn_text,
+}
+
+# Функции, которые сами решают, какие аргументы вычислять
+LAZY_FUNCTIONS = {'IF', 'IFERROR', 'ISERROR', 'ROW'}
+
+# Функции, принимающие диапазон без преобразования в значения
+RANGE_FUNCTIONS = {'COUNTA', 'INDEX', 'VLOOKUP', 'MATCH', 'AGGREGATE', 'ROW'}
+
+
+# Разбор формул ------------------------------------------------------------------------------
+
+_TOKEN_RE = re.compile(r'''
+    (?P<ws>\s+)
+  | (?P<string>"(?:[^"]|"")*")
+  | (?P<error>\#(?:N/A|VALUE!|REF!|DIV/0!|NUM!|NAME\?|NULL!))
+  | (?P<area>\$?[A-Z]{1,3}\$?\d+:\$?[A-Z]{1,3}\$?\d+)
+  | (?P<columns>\$?[A-Z]{1,3}:\$?[A-Z]{1,3})
+  | (?P<func>(?:_xlfn\.)?[A-Z][A-Z0-9.]*(?=\())
+  | (?P<bool>TRUE|FALSE)
+  | (?P<cell>\$?[A-Z]{1,3}\$?\d+)
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<op><>|<=|>=|[-+*/^&=<>%])
+  | (?P<punct>[(),;])
+''', re.VERBOSE)
+
+_CELL_RE = re.compile(r'(\$?)([A-Z]{1,3})(\$?)(\d+)')
+_COL_RE = re.compile(r'(\$?)([A-Z]{1,3})')
+
+
+class FormulaSyntaxError(ValueError):
+    """Формула не может быть разобрана"""
+
+
+def _tokenize(formula):
+    tokens = []
+    position = 0
+    text = formula[1:] if formula.startswith('=') else formula
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if not match:
+            raise FormulaSyntaxError(f"Неизвестный символ в формуле {formula!r} (позиция {position})")
+        position = match.end()
+        kind = match.lastgroup
+        if kind != 'ws':
+            tokens.append((kind, match.group()))
+    return tokens
+
+
+def _relative_cell(text, host_row, host_col):
+    """Адрес ячейки в виде (строка, абс., столбец, абс.) относительно ячейки формулы"""
+    col_abs, col, row_abs, row = _CELL_RE.fullmatch(text).groups()
+    row, col = int(row), column_index_from_string(col)
+    return (
+        row if row_abs else row - host_row, bool(row_abs),
+        col if col_abs else col - host_col, bool(col_abs),
+    )
+
+
+def _relative_column(text, host_col):
+    col_abs, col = _COL_RE.fullmatch(text).groups()
+    col = column_index_from_string(col)
+    return col if col_abs else col - host_col, bool(col_abs)
+
+
+def _relative_tokens(tokens, host_row, host_col):
+    """Заменяет ссылки на относительные, чтобы одинаковые по смыслу формулы совпадали"""
+    result = []
+    for kind, text in tokens:
+        if kind == 'cell':
+            result.append((kind, _relative_cell(text, host_row, host_col)))
+        elif kind == 'area':
+            first, second = text.split(':')
+            result.append((kind, (_relative_cell(first, host_row, host_col),
+                                   _relative_cell(second, host_row, host_col))))
+        elif kind == 'columns':
+            first, second = text.split(':')
+            result.append((kind, ((None, False) + _relative_column(first, host_col),
+                                  (None, False) + _relative_column(second, host_col))))
+        else:
+            result.append((kind, text))
+    return result
+
+
+# Строковые литералы пропускаются, ссылки переводятся в относительную запись R1C1
+_KEY_RE = re.compile(
+    r'"(?:[^"]|"")*"'
+    r'|(?<![\w.$])(\$?)([A-Z]{1,3}):(\$?)([A-Z]{1,3})(?![\w(])'
+    r'|(?<![\w.$])(\$?)([A-Z]{1,3})(\$?)(\d+)(?![\w(])'
+)
+
+
+def _formula_key(formula, host_row, host_col):
+    """Относительная запись формулы: одинаковая для формул, скопированных протягиванием"""
+    def replace(match):
+        if match.group(2):
+            first = column_index_from_string(match.group(2))
+            second = column_index_from_string(match.group(4))
+            return (f"C{first}" if match.group(1) else f"C[{first - host_col}]") + ':' + \
+                   (f"C{second}" if match.group(3) else f"C[{second - host_col}]")
+        if match.group(6):
+            col = column_index_from_string(match.group(6))
+            row = int(match.group(8))
+            return (f"R{row}" if match.group(7) else f"R[{row - host_row}]") + \
+                   (f"C{col}" if match.group(5) else f"C[{col - host_col}]")
+        return match.group()
+    return _KEY_RE.sub(replace, formula)
+
+
+class _Parser:
+    """Рекурсивный разбор формулы в дерево кортежей"""
+
+    _COMPARISON = ('=', '<>', '<', '>', '<=', '>=')
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def expect(self, value):
+        kind, text = self.take()
+        if text != value:
+            raise FormulaSyntaxError(f"Ожидалось {value!r}, получено {text!r}")
+
+    def parse(self):
+        node = self.comparison()
+        if self.position != len(self.tokens):
+            raise FormulaSyntaxError(f"Лишние символы в формуле: {self.tokens[self.position:]}")
+        return node
+
+    def comparison(self):
+        node = self.concatenation()
+        while self.peek()[0] == 'op' and self.peek()[1] in self._COMPARISON:
+            op = self.take()[1]
+            node = ('binary', op, node, self.concatenation())
+        return node
+
+    def concatenation(self):
+        node = self.additive()
+        while self.peek() == ('op', '&'):
+            self.take()
+            node = ('binary', '&', node, self.additive())
+        return node
+
+    def additive(self):
+        node = self.multiplicative()
+        while self.peek()[0] == 'op' and self.peek()[1] in ('+', '-'):
+            op = self.take()[1]
+            node = ('binary', op, node, self.multiplicative())
+        return node
+
+    def multiplicative(self):
+        node = self.power()
+        while self.peek()[0] == 'op' and self.peek()[1] in ('*', '/'):
+            op = self.take()[1]
+            node = ('binary', op, node, self.power())
+        return node
+
+    def power(self):
+        node = self.unary()
+        while self.peek() == ('op', '^'):
+            self.take()
+            node = ('binary', '^', node, self.unary())
+        return node
+
+    def unary(self):
+        if self.peek()[0] == 'op' and self.peek()[1] in ('+', '-'):
+            op = self.take()[1]
+            operand = self.unary()
+            return ('negate', operand) if op == '-' else ('plus', operand)
+        node = self.primary()
+        while self.peek() == ('op', '%'):
+            self.take()
+            node = ('percent', node)
+        return node
+
+    def primary(self):
+        kind, value = self.take()
+        if kind == 'number':
+            return ('const', float(value))
+        if kind == 'string':
+            return ('const', value[1:-1].replace('""', '"'))
+        if kind == 'bool':
+            return ('const', value == 'TRUE')
+        if kind == 'error':
+            return ('const', ExcelError(value))
+        if kind == 'cell':
+            return ('cell', value)
+        if kind in ('area', 'columns'):
+            return ('range', value)
+        if kind == 'func':
+            return self.function(value)
+        if value == '(':
+            node = self.comparison()
+            self.expect(')')
+            return node
+        raise FormulaSyntaxError(f"Неожиданный элемент формулы: {value!r}")
+
+    def function(self, name):
+        name = name.upper()
+        if name.startswith('_XLFN.'):
+            name = name[len('_XLFN.'):]
+        self.expect('(')
+        args = []
+        if self.peek()[1] == ')':
+            self.take()
+            return ('call', name, args)
+        while True:
+            if self.peek()[1] in (',', ';', ')'):
+                args.append(('const', None))
+            else:
+                args.append(self.comparison())
+            kind, text = self.take()
+            if text == ')':
+                return ('call', name, args)
+            if text not in (',', ';'):
+                raise FormulaSyntaxError(f"Ожидалась ',' или ')' в вызове {name}, получено {text!r}")
+
+
+# Компиляция дерева в замыкания --------------------------------------------------------------
+
+def _resolve(reference, host_row, host_col):
+    row, row_abs, col, col_abs = reference
+    if row is not None and not row_abs:
+        row += host_row
+    if not col_abs:
+        col += host_col
+    return row, col
+
+
+def _arith(op, left, right):
+    left, right = to_number(left), to_number(right)
+    if op == '+':
+        return left + right
+    if op == '-':
+        return left - right
+    if op == '*':
+        return left * right
+    if op == '/':
+        if right == 0:
+            raise DIV0
+        return left / right
+    if op == '^':
+        try:
+            result = left ** right
+        except (OverflowError, ZeroDivisionError):
+            raise NUM
+        if isinstance(result, complex):
+            raise NUM
+        return result
+    raise NAME
+
+
+def _apply_binary(op, left, right):
+    if op == '&':
+        return to_text(left) + to_text(right)
+    if op in _Parser._COMPARISON:
+        result = compare(left, right)
+        return {
+            '=': result == 0, '<>': result != 0, '<': result < 0,
+            '>': result > 0, '<=': result <= 0, '>=': result >= 0,
+        }[op]
+    return _arith(op, left, right)
+
+
+def _elementwise(op, left, right):
+    """Поэлементная операция над массивами: ошибки сохраняются как элементы"""
+    left, right = _as_array(left), _as_array(right)
+    if isinstance(left, list) and isinstance(right, list):
+        pairs = zip(left, right)
+    elif isinstance(left, list):
+        pairs = ((item, right) for item in left)
+    else:
+        pairs = ((left, item) for item in right)
+    result = []
+    for a, b in pairs:
+        try:
+            result.append(_apply_binary(op, a, b))
+        except ExcelError as error:
+            result.append(error)
+    return result
+
+
+def _scalar(value):
+    """Значение в скалярном контексте"""
+    if isinstance(value, RangeValue):
+        if value.height == 1 and value.width == 1:
+            value = value.cell(0, 0)
+        else:
+            raise VALUE
+    if isinstance(value, ExcelError):
+        raise value
+    return value
+
+
+def _intersect(value, row, col):
+    """Неявное пересечение диапазона со строкой (столбцом) ячейки формулы"""
+    if value.width == 1 and value.height > 1 and value.min_row <= row <= value.max_row:
+        return RangeValue(value.evaluator, row, value.min_col, row, value.min_col)
+    if value.height == 1 and value.width > 1 and value.min_col <= col <= value.max_col:
+        return RangeValue(value.evaluator, value.min_row, col, value.min_row, col)
+    return value
+
+
+def _compile(node):
+    kind = node[0]
+
+    if kind == 'const':
+        constant = node[1]
+        if isinstance(constant, ExcelError):
+            def raise_error(ev, row, col):
+                raise constant
+            return raise_error
+        return lambda ev, row, col: constant
+
+    if kind == 'cell':
+        reference = node[1]
+
+        def read_cell(ev, row, col):
+            target_row, target_col = _resolve(reference, row, col)
+            value = ev.value(target_row, target_col)
+            if isinstance(value, ExcelError):
+                raise value
+            return value
+        return read_cell
+
+    if kind == 'range':
+        first, second = node[1]
+
+        def read_range(ev, row, col):
+            min_row, min_col = _resolve(first, row, col)
+            max_row, max_col = _resolve(second, row, col)
+            if min_row is None:
+                min_row, max_row = 1, ev.max_row
+            return RangeValue(ev, min(min_row, max_row), min(min_col, max_col),
+                              max(min_row, max_row), max(min_col, max_col))
+        return read_range
+
+    if kind == 'negate':
+        operand = _compile(node[1])
+
+        def negate(ev, row, col):
+            value = operand(ev, row, col)
+            if isinstance(value, (list, RangeValue)):
+                return _elementwise('*', value, -1)
+            return -to_number(value)
+        return negate
+
+    if kind == 'plus':
+        return _compile(node[1])
+
+    if kind == 'percent':
+        operand = _compile(node[1])
+        return lambda ev, row, col: to_number(_scalar(operand(ev, row, col))) / 100
+
+    if kind == 'binary':
+        op = node[1]
+        left, right = _compile(node[2]), _compile(node[3])
+
+        def binary(ev, row, col):
+            a, b = left(ev, row, col), right(ev, row, col)
+            if isinstance(a, (list, RangeValue)) or isinstance(b, (list, RangeValue)):
+                return _elementwise(op, a, b)
+            return _apply_binary(op, a, b)
+        return binary
+
+    if kind == 'call':
+        name, args = node[1], [_compile(arg) for arg in node[2]]
+        return _compile_call(name, args)
+
+    raise FormulaSyntaxError(f"Неизвестный узел: {kind}")
+
+
+def _compile_call(name, args):
+    if name == 'IF':
+        condition = args[0]
+        if_true = args[1] if len(args) > 1 else (lambda ev, row, col: True)
+        if_false = args[2] if len(args) > 2 else (lambda ev, row, col: False)
+
+        def fn_if(ev, row, col):
+            if to_bool(_scalar(condition(ev, row, col))):
+                return _scalar(if_true(ev, row, col))
+            return _scalar(if_false(ev, row, col))
+        return fn_if
+
+    if name == 'IFERROR':
+        value, fallback = args[0], args[1]
+
+        def fn_iferror(ev, row, col):
+            try:
+                return _scalar(value(ev, row, col))
+            except ExcelError:
+                return _scalar(fallback(ev, row, col))
+        return fn_iferror
+
+    if name == 'ISERROR':
+        value = args[0]
+
+        def fn_iserror(ev, row, col):
+            try:
+                _scalar(value(ev, row, col))
+            except ExcelError:
+                return True
+            return False
+        return fn_iserror
+
+    if name == 'ROW':
+        reference = args[0] if args else None
+
+        def fn_row(ev, row, col):
+            if reference is None:
+                return row
+            return _fn_row(reference(ev, row, col), host_row=row)
+        return fn_row
+
+    function = FUNCTIONS.get(name)
+    if function is None:
+        def unknown(ev, row, col):
+            raise NAME
+        logger.warning(f"Функция {name} не поддерживается вычислителем формул")
+        return unknown
+
+    keep_ranges = name in RANGE_FUNCTIONS
+
+    def call(ev, row, col):
+        values = []
+        for arg in args:
+            value = arg(ev, row, col)
+            if not keep_ranges and not isinstance(value, list):
+                value = _scalar(value)
+            values.append(value)
+        return function(*values)
+    return call
+
+
+def _collect_references(node, out):
+    """Собирает все ссылки (ячейки и диапазоны) из дерева формулы"""
+    kind = node[0]
+    if kind == 'cell':
+        out.append(('cell', node[1]))
+    elif kind == 'range':
+        out.append(('range', node[1]))
+    elif kind in ('negate', 'plus', 'percent'):
+        _collect_references(node[1], out)
+    elif kind == 'binary':
+        _collect_references(node[2], out)
+        _collect_references(node[3], out)
+    elif kind == 'call':
+        for arg in node[2]:
+            _collect_references(arg, out)
+    return out
+
+
+class CompiledFormula:
+    """Скомпилированная формула в относительной записи (R1C1)"""
+
+    __slots__ = ('key', 'function', 'references')
+
+    def __init__(self, key, function, references):
+        self.key = key
+        self.function = function
+        self.references = references
+
+    def dependencies(self, row, col, max_row):
+        """Ячейки и диапазоны, от которых зависит формула в ячейке (row, col)"""
+        for kind, reference in self.references:
+            if kind == 'cell':
+                yield ('cell',) + _resolve(reference, row, col)
+            else:
+                min_row, min_col = _resolve(reference[0], row, col)
+                max_row_, max_col = _resolve(reference[1], row, col)
+                if min_row is None:
+                    min_row, max_row_ = 1, max_row
+                yield ('range', min(min_row, max_row_), min(min_col, max_col),
+                       max(min_row, max_row_), max(min_col, max_col))
+
+
+# Кэш скомпилированных формул: формулы с одинаковой относительной записью
+# (например, весь столбец K) разбираются один раз за время работы программы
+_COMPILED_CACHE = {}
+
+
+def compile_formula(formula, row, col):
+    """Разбирает и компилирует формулу ячейки (row, col) с кэшированием"""
+    key = _formula_key(formula, row, col)
+    compiled = _COMPILED_CACHE.get(key)
+    if compiled is None:
+        tree = _Parser(_relative_tokens(_tokenize(formula), row, col)).parse()
+        compiled = CompiledFormula(key, _compile(tree), _collect_references(tree, []))
+        _COMPILED_CACHE[key] = compiled
+    return compiled
+
+
+_DIGITS_RE = re.compile(r'\d+')
+
+
+def _relative_row_mask(formula):
+    """Для каждой группы цифр формулы: является ли она относительным номером строки"""
+    relative_starts = {match.start(8) for match in _KEY_RE.finditer(formula)
+                       if match.group(6) and not match.group(7)}
+    return tuple(match.start() in relative_starts for match in _DIGITS_RE.finditer(formula))
+
+
+def _is_filled_down(previous, row, numbers):
+    """Совпадает ли формула с предыдущей, сдвинутой на (row - prev_row) строк"""
+    prev_row, prev_numbers, _, mask = previous
+    if len(numbers) != len(prev_numbers):
+        return False
+    delta = row - prev_row
+    for current, before, relative in zip(numbers, prev_numbers, mask):
+        if int(current) != int(before) + (delta if relative else 0):
+            return False
+    return True
+
+
+# Вычислитель листа --------------------------------------------------------------------------
+
+def split_address(address):
+    """'AF1' -> (1, 32)"""
+    match = _CELL_RE.fullmatch(address.replace('$', '').upper())
+    if not match:
+        raise ValueError(f"Некорректный адрес ячейки: {address}")
+    return int(match.group(4)), column_index_from_string(match.group(2))
+
+
+class FormulaEvaluator:
+    """
+    Вычисляет формулы листа Excel без запуска Excel.
+
+    Значения и формулы листа загружаются один раз. Ячейки вычисляются
+    по требованию: для запрошенных ячеек строится граф зависимостей,
+    затем ячейки вычисляются в топологическом порядке.
+    """
+
+    def __init__(self, workbook_path, sheet_name='current'):
+        self.workbook_path = workbook_path
+        self.sheet_name = sheet_name
+        self.constants = {}
+        self.formulas = {}
+        self.max_row = 0
+        self.max_col = 0
+        self._formula_rows = {}  # столбец -> отсортированные строки с формулами
+        self._results = {}
+        self._columns_cache = {}
+        self._compiled = {}
+        self._filled_down = {}
+        self._load()
+
+    def _load(self):
+        started = datetime.now()
+        wb = load_workbook(self.workbook_path, read_only=True)
+        try:
+            ws = wb[self.sheet_name]
+            for row_idx, row in enumerate(ws.iter_rows(values_only=True), start=1):
+                for col_idx, value in enumerate(row, start=1):
+                    if value is None:
+                        continue
+                    if isinstance(value, str) and value.startswith('=') and len(value) > 1:
+                        self.formulas[(row_idx, col_idx)] = value
+                        self._formula_rows.setdefault(col_idx, []).append(row_idx)
+                    else:
+                        self.constants[(row_idx, col_idx)] = value
+                    self.max_row = max(self.max_row, row_idx)
+                    self.max_col = max(self.max_col, col_idx)
+        finally:
+            wb.close()
+        logger.info(
+            f"Загружен лист '{self.sheet_name}': {len(self.formulas)} формул, "
+            f"{len(self.constants)} значений за {(datetime.now() - started).total_seconds():.2f} с"
+        )
+
+    # --- изменение входных данных ---
+
+    def formula_addresses(self, area):
+        """Адреса ячеек с формулами в блоке 'A1:AN150' построчно"""
+        min_col, min_row, max_col, max_row = range_boundaries(area)
+        return [f"{get_column_letter(col)}{row}" for row, col in sorted(self.formulas)
+                if min_row <= row <= max_row and min_col <= col <= max_col]
+
+    def set_value(self, address, value):
+        """Записывает значение во входную ячейку и сбрасывает вычисленные результаты"""
+        row, col = split_address(address)
+        self.formulas.pop((row, col), None)
+        if value is None:
+            self.constants.pop((row, col), None)
+        else:
+            self.constants[(row, col)] = value
+        self.max_row = max(self.max_row, row)
+        self.max_col = max(self.max_col, col)
+        self.invalidate()
+
+    def invalidate(self):
+        self._results.clear()
+        self._columns_cache.clear()
+
+    # --- чтение значений ---
+
+    def value(self, row, col):
+        """Текущее значение ячейки (вычисленное или исходное)"""
+        key = (row, col)
+        if key in self._results:
+            return self._results[key]
+        if key in self.formulas:
+            # Ячейка не попала в порядок вычисления (например, ссылка внутри функции)
+            return self._evaluate_cells([key])[key]
+        return self.constants.get(key)
+
+    def column_values(self, col, min_row, max_row):
+        """Значения столбца в диапазоне строк (кэшируется до следующего изменения)"""
+        key = (col, min_row, max_row)
+        cached = self._columns_cache.get(key)
+        if cached is None:
+            cached = [self.value(row, col) for row in range(min_row, max_row + 1)]
+            self._columns_cache[key] = cached
+        return cached
+
+    def evaluate(self, address):
+        """Значение ячейки по адресу вида 'B35'"""
+        row, col = split_address(address)
+        return self._evaluate_cells([(row, col)])[(row, col)]
+
+    def evaluate_many(self, addresses):
+        """Значения нескольких ячеек за один проход по графу зависимостей"""
+        keys = [split_address(address) for address in addresses]
+        results = self._evaluate_cells(keys)
+        return {address: results[key] for address, key in zip(addresses, keys)}
+
+    # --- граф зависимостей ---
+
+    def _formula(self, row, col):
+        compiled = self._compiled.get((row, col))
+        if compiled is not None:
+            return compiled
+
+        # Формулы, протянутые вниз по столбцу, отличаются только номерами строк:
+        # сверяем числа с предыдущей формулой того же вида без разбора текста
+        formula = self.formulas[(row, col)]
+        numbers = _DIGITS_RE.findall(formula)
+        skeleton = _DIGITS_RE.sub('#', formula)
+        previous = self._filled_down.get((col, skeleton))
+        if previous is not None and _is_filled_down(previous, row, numbers):
+            compiled, mask = previous[2], previous[3]
+        else:
+            compiled = compile_formula(formula, row, col)
+            mask = _relative_row_mask(formula)
+        self._filled_down[(col, skeleton)] = (row, numbers, compiled, mask)
+        self._compiled[(row, col)] = compiled
+        return compiled
+
+    def _formula_cells_in(self, min_row, min_col, max_row, max_col):
+        for col in range(min_col, max_col + 1):
+            rows = self._formula_rows.get(col)
+            if not rows:
+                continue
+            start = bisect_right(rows, min_row - 1)
+            for row in rows[start:]:
+                if row > max_row:
+                    break
+                if (row, col) in self.formulas:
+                    yield row, col
+
+    def _dependency_order(self, targets):
+        """Итеративный обход графа зависимостей: возвращает ячейки в порядке вычисления"""
+        order = []
+        state = {}  # 1 — в обработке, 2 — готово
+        visited_ranges = set()
+        stack = [(('cell', row, col), False) for row, col in reversed(targets)]
+        while stack:
+            node, expanded = stack.pop()
+            if node[0] == 'range':
+                if expanded or node in visited_ranges:
+                    continue
+                visited_ranges.add(node)
+                for cell in self._formula_cells_in(*node[1:]):
+                    stack.append((('cell',) + cell, False))
+                continue
+
+            cell = node[1:]
+            if cell in self._results or cell not in self.formulas:
+                continue
+            if expanded:
+                state[cell] = 2
+                order.append(cell)
+                continue
+            if state.get(cell):
+                # Уже обработана или циклическая ссылка (определяется при вычислении)
+                continue
+            state[cell] = 1
+            stack.append((node, True))
+            try:
+                dependencies = list(self._formula(*cell).dependencies(cell[0], cell[1], self.max_row))
+            except FormulaSyntaxError as e:
+                logger.warning(f"Не удалось разобрать формулу {get_column_letter(cell[1])}{cell[0]}: {e}")
+                continue
+            for dependency in reversed(dependencies):
+                if dependency[0] == 'cell':
+                    if not state.get(dependency[1:]):
+                        stack.append((dependency, False))
+                else:
+                    stack.append((dependency, False))
+        return order
+
+    def _evaluate_cells(self, targets):
+        for cell in self._dependency_order(targets):
+            if cell in self._results:
+                continue
+            # Защита от циклических ссылок
+            self._results[cell] = REF
+            try:
+                result = self._formula(*cell).function(self, cell[0], cell[1])
+                if isinstance(result, RangeValue):
+                    result = _scalar(_intersect(result, *cell))
+                elif isinstance(result, list):
+                    result = result[0] if result else VALUE
+                if result is None:
+                    # Формула, ссылающаяся на пустую ячейку, в Excel дает 0
+                    result = 0
+            except ExcelError as error:
+                result = error
+            except FormulaSyntaxError:
+                result = NAME
+            except (TypeError, ValueError, IndexError, ArithmeticError) as e:
+                logger.debug(f"Ошибка вычисления {get_column_letter(cell[1])}{cell[0]}: {e}")
+                result = VALUE
+            self._results[cell] = result
+        return {cell: self.value(*cell) for cell in targets}
+
+
+# Совместимость с COM-интерфейсом ------------------------------------------------------------
+
+class _CellProxy:
+    """Ячейка с атрибутом Value, как у Range в win32com"""
+
+    __slots__ = ('_sheet', '_address')
+
+    def __init__(self, sheet, address):
+        self._sheet = sheet
+        self._address = address
+
+    @property
+    def Value(self):
+        return self._sheet.get(self._address)
+
+    @Value.setter
+    def Value(self, value):
+        self._sheet.set(self._address, value)
+
+
+class EvaluatedSheet:
+    """
+    Лист Report.xlsx с вычисленными формулами и интерфейсом sheet.Range('B2').Value,
+    чтобы заменить лист Excel, открытый через COM.
+    """
+
+    # Строки, для которых учитывается формат даты (COM отдает такие ячейки как datetime)
+    DATE_FORMAT_ROWS = 150
+
+    def __init__(self, workbook_path, sheet_name='current'):
+        self.workbook_path = workbook_path
+        self.sheet_name = sheet_name
+        self.evaluator = FormulaEvaluator(workbook_path, sheet_name)
+        self._date_cells = self._load_date_cells()
+        self._pending = {}
+
+    def _load_date_cells(self):
+        """Адреса ячеек с форматом даты в верхней части листа"""
+        date_cells = set()
+        wb = load_workbook(self.workbook_path, read_only=True)
+        try:
+            ws = wb[self.sheet_name]
+            for row in ws.iter_rows(max_row=self.DATE_FORMAT_ROWS):
+                for cell in row:
+                    if getattr(cell, 'number_format', None) and is_date_format(cell.number_format):
+                        date_cells.add(cell.coordinate)
+        finally:
+            wb.close()
+        return date_cells
+
+    def Range(self, address):
+        return _CellProxy(self, address)
+
+    def _com_value(self, address, value):
+        if isinstance(value, ExcelError):
+            # COM возвращает ошибку ячейки числовым кодом, остальной код рассчитан на это
+            return COM_ERROR_CODES.get(value.code, COM_ERROR_CODES['#VALUE!'])
+        if address in self._date_cells and isinstance(value, (int, float)) and not isinstance(value, bool):
+            return from_serial(value)
+        return value
+
+    def get(self, address):
+        """Значение ячейки или блока ('A1:AN150' -> кортеж строк, как у COM)"""
+        if ':' not in address:
+            return self._com_value(address, self.evaluator.evaluate(address))
+
+        min_col, min_row, max_col, max_row = range_boundaries(address)
+        addresses = [f"{get_column_letter(col)}{row}"
+                     for row in range(min_row, max_row + 1)
+                     for col in range(min_col, max_col + 1)]
+        values = self.evaluator.evaluate_many(addresses)
+        width = max_col - min_col + 1
+        return tuple(
+            tuple(self._com_value(address, values[address]) for address in addresses[start:start + width])
+            for start in range(0, len(addresses), width)
+        )
+
+    def set(self, address, value):
+        """Значение входной ячейки; в файл попадает только после save()"""
+        self.evaluator.set_value(address, value)
+        self._pending[address] = value
+
+    def save(self):
+        """
+        Сохраняет измененные входные ячейки в файл книги.
+        Книга загружается и записывается целиком — для вычислений это не нужно.
+        """
+        if not self._pending:
+            return
+        wb = load_workbook(self.workbook_path)
+        try:
+            ws = wb[self.sheet_name]
+            for address, value in self._pending.items():
+                ws[address] = value
+            wb.save(self.workbook_path)
+        finally:
+            wb.close()
+        self._pending.clear()
+
+
+_VOLATILE_RE = re.compile(r'=\s*(TODAY|NOW)\(\s*\)\s*', re.IGNORECASE)
+
+
+def check_against_cached_values(workbook_path, sheet_name='current', addresses=None, tolerance=1e-6):
+    """
+    Сравнивает результат вычислителя со значениями, сохраненными Excel в файле.
+    По умолчанию проверяются все формулы блока отчета REPORT_AREA.
+
+    Ячейки без сохраненного значения пропускаются. Ячейки =TODAY()/=NOW()
+    получают значение на момент сохранения книги, чтобы зависящие от них
+    формулы сравнивались с тем же днем.
+    :return: список расхождений (адрес, значение Excel, вычисленное значение)
+    """
+    evaluator = FormulaEvaluator(workbook_path, sheet_name)
+    volatile = [f"{get_column_letter(col)}{row}" for (row, col), formula in evaluator.formulas.items()
+                if _VOLATILE_RE.fullmatch(formula)]
+    if addresses is None:
+        addresses = evaluator.formula_addresses(REPORT_AREA)
+
+    wb = load_workbook(workbook_path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name]
+        cached = {address: ws[address].value for address in addresses}
+        pinned = {address: ws[address].value for address in volatile}
+    finally:
+        wb.close()
+
+    for address, value in pinned.items():
+        if isinstance(value, (datetime, date)):
+            evaluator.set_value(address, to_serial(value))
+    computed = evaluator.evaluate_many(list(addresses))
+
+    mismatches = []
+    checked = 0
+    for address in addresses:
+        expected, actual = cached[address], computed[address]
+        if expected is None:
+            continue
+        checked += 1
+        if isinstance(expected, (datetime, date, dt_time)):
+            # Ячейки с форматом даты openpyxl читает как datetime, вычислитель дает порядковый номер
+            expected = to_serial(expected)
+        if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+            if math.isclose(expected, actual, rel_tol=tolerance, abs_tol=tolerance):
+                continue
+        elif isinstance(expected, str) and isinstance(actual, ExcelError) and expected == actual.code:
+            continue
+        elif expected == actual:
+            continue
+        mismatches.append((address, expected, actual))
+
+    logger.info(f"Проверено ячеек: {checked}, расхождений: {len(mismatches)}")
+    for address, expected, actual in mismatches:
+        logger.warning(f"{address}: Excel={expected!r}, вычислено={actual!r}")
+    return mismatches
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.abspath("."), "Report.xlsx")
+    sys.exit(1 if check_against_cached_values(path) else 0)
@@ -0,0 +1,184 @@
+"""
+Реестр исследований Helper.xlsm: строки отчетов через журнал.
+
+Строка отчета сначала дописывается в журнал — папку с файлами JSON Lines,
+по файлу на процесс (одновременные записи из пакетного режима не мешают
+друг другу). flush() забирает накопленные строки и добавляет их в Helper.xlsm
+за одно открытие книги: строка заголовков читается одним обращением к Excel
+(карта «заголовок — столбец» кешируется до изменения файла), значения
+записываются по столбцам сразу для всех строк. Если Helper.xlsm открыт
+пользователем или Excel недоступен, строки остаются в журнале до следующего flush().
+Excel берется из пула сеансов Office (office_pool).
+"""
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+from office_pool import default_pool
+
+logger = logging.getLogger(__name__)
+
+XL_UP = -4162
+XL_TO_LEFT = -4159
+
+# Лист реестра и столбец, по которому ищется последняя заполненная строка (D — «ДО»)
+HELPER_SHEET = 'Sheet1'
+LAST_ROW_COLUMN = 4
+
+# Карты заголовков: путь -> (mtime, {заголовок: номер столбца})
+_HEADER_CACHE = {}
+_cache_lock = threading.Lock()
+
+
+def helper_row(data):
+    """Строка реестра по данным отчета: {заголовок Helper.xlsm: значение}"""
+    well = data.get("well") or ""
+    device = data.get("device") or ""
+    return {
+        "Дата интерпретации": data.get("date_of_analiz"),
+        "Дата начала исследования": data.get("date_research"),
+        "Дата конца исследования": data.get("date_researcf"),
+        "ДО": data.get("company"),
+        "Месторождение": data.get("field"),
+        "Пласт": data.get("formation"),
+        "Куст": well.split()[2] if len(well.split()) > 1 else well,
+        "№скв.": well.split()[0] if len(well.split()) > 1 else well,
+        "Категория скважин": "доб",
+        "Вид исследования": data.get("type_of_research"),
+        "Исполнитель (организация)": "ИТС",
+        "Интерпретатор": data.get("interpreter"),
+        "Наличие в базе": "база",
+        "Оборудование": device.split()[1] if len(device.split()) > 1 else device,
+        "Назначение": "Запрос ДО",
+        "Класс исследования": data.get("klass"),
+        "Успешность": data.get("success"),
+        "Длительность факт": data.get("duration"),
+        "Qн": data.get("Qoil"),
+    }
+
+
+def header_map(sheet, path):
+    """Карта {заголовок: столбец} первой строки листа; кешируется по времени изменения файла"""
+    mtime = os.path.getmtime(path)
+    with _cache_lock:
+        cached = _HEADER_CACHE.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    last_column = sheet.Cells(1, sheet.Columns.Count).End(XL_TO_LEFT).Column
+    values = sheet.Range(sheet.Cells(1, 1), sheet.Cells(1, last_column)).Value
+    # Для одной ячейки Excel возвращает значение, для диапазона — кортеж строк
+    headers = values[0] if isinstance(values, tuple) else (values,)
+    columns = {}
+    for column, header in enumerate(headers, 1):
+        if header is not None:
+            columns.setdefault(str(header).strip(), column)
+
+    with _cache_lock:
+        _HEADER_CACHE[path] = (mtime, columns)
+    return columns
+
+
+def append_rows(helper_path, rows, pool=None):
+    """
+    Добавляет строки в конец реестра за одно открытие книги.
+
+    :param rows: список словарей {заголовок: значение}
+    :param pool: пул сеансов Office (по умолчанию общий пул процесса)
+    :return: число добавленных строк
+    """
+    if not rows:
+        return 0
+    pool = pool or default_pool()
+
+    with pool.workbook(helper_path, save=True) as workbook:
+        sheet = workbook.Sheets[HELPER_SHEET]
+
+        columns = header_map(sheet, helper_path)
+        missing = {key for row in rows for key in row} - columns.keys()
+        if missing:
+            logger.warning(f"В Helper.xlsm нет столбцов: {', '.join(sorted(missing))}")
+
+        first_row = sheet.Cells(sheet.Rows.Count, LAST_ROW_COLUMN).End(XL_UP).Row + 1
+        last_row = first_row + len(rows) - 1
+        for key, column in columns.items():
+            if not any(key in row for row in rows):
+                continue
+            sheet.Range(sheet.Cells(first_row, column), sheet.Cells(last_row, column)).Value = \
+                tuple((row.get(key),) for row in rows)
+
+    # Книгу изменили мы сами — заголовки прежние, обновляем время в кеше
+    with _cache_lock:
+        cached = _HEADER_CACHE.get(helper_path)
+        if cached is not None:
+            _HEADER_CACHE[helper_path] = (os.path.getmtime(helper_path), cached[1])
+    logger.info(f"В Helper.xlsm добавлено строк: {len(rows)} (строки {first_row}-{last_row})")
+    return len(rows)
+
+
+class HelperJournal:
+    """Журнал строк реестра, ожидающих записи в Helper.xlsm"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def append(self, row):
+        """Дописывает строку в файл журнала текущего процесса"""
+        os.makedirs(self.directory, exist_ok=True)
+        line = json.dumps({"created": time.time(), "row": row}, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(os.path.join(self.directory, f"{os.getpid()}.jsonl"), 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def pending(self):
+        """Число строк, ожидающих записи"""
+        count = 0
+        for path in glob.glob(os.path.join(self.directory, "*.jsonl")):
+            with open(path, 'r', encoding='utf-8') as f:
+                count += sum(1 for line in f if line.strip())
+        return count
+
+    def _claim(self):
+        """Переименовывает файлы журнала, чтобы их не забрал другой процесс; возвращает новые пути"""
+        claimed = []
+        for path in glob.glob(os.path.join(self.directory, "*.jsonl")):
+            target = f"{path}.flushing-{os.getpid()}"
+            try:
+                os.replace(path, target)
+            except OSError:
+                # Забран другим процессом или открыт на запись
+                continue
+            claimed.append(target)
+        return claimed
+
+    def flush(self, helper_path, pool=None):
+        """
+        Переносит накопленные строки в Helper.xlsm одной записью.
+
+        :return: число записанных строк
+        """
+        with self._lock:
+            claimed = self._claim()
+            entries = []
+            for path in claimed:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entries.extend(json.loads(line) for line in f if line.strip())
+            entries.sort(key=lambda entry: entry["created"])
+
+            try:
+                written = append_rows(helper_path, [entry["row"] for entry in entries], pool)
+            except Exception:
+                # Возвращаем строки в журнал
+                for path in claimed:
+                    original = path.rsplit(".flushing-", 1)[0]
+                    os.replace(path, f"{os.path.splitext(original)[0]}-{time.time_ns()}.jsonl")
+                raise
+            for path in claimed:
+                os.remove(path)
+            return written
@@ -0,0 +1,111 @@
+"""
+Отложенный импорт тяжелых библиотек и замер времени запуска GUI.
+
+lazy_import('fitz') возвращает заместитель модуля: сам модуль импортируется
+при первом обращении к атрибуту, поэтому окно программы появляется до загрузки
+fitz, docx, openpyxl, numpy, pandas и win32com. lazy_import('docx.shared', 'Pt')
+заменяет 'from docx.shared import Pt'. Время каждого отложенного импорта
+пишется в лог.
+
+Отложенно импортируемые модули не видны анализу PyInstaller — их нужно
+перечислить в hiddenimports (Main.spec).
+
+Подробная разбивка импорта по модулям: python -X importtime GUI_Claudi.py
+"""
+import importlib
+import logging
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Время первого (отложенного) импорта модулей, с
+IMPORT_TIMES = {}
+
+_lock = threading.Lock()
+
+
+def _import(name):
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed = time.perf_counter() - started
+    with _lock:
+        IMPORT_TIMES.setdefault(name, elapsed)
+    logger.info(f"Отложенный импорт {name}: {elapsed:.3f} с")
+    return module
+
+
+class LazyObject:
+    """Заместитель модуля (или объекта модуля), загружаемого при первом обращении"""
+
+    __slots__ = ('_module_name', '_attribute', '_target')
+
+    def __init__(self, module_name, attribute=None):
+        object.__setattr__(self, '_module_name', module_name)
+        object.__setattr__(self, '_attribute', attribute)
+        object.__setattr__(self, '_target', None)
+
+    def _resolve(self):
+        target = self._target
+        if target is None:
+            target = _import(self._module_name)
+            if self._attribute is not None:
+                target = getattr(target, self._attribute)
+            object.__setattr__(self, '_target', target)
+        return target
+
+    def __getattr__(self, name):
+        target = self._resolve()
+        try:
+            return getattr(target, name)
+        except AttributeError:
+            # Подмодуль пакета, еще не импортированный (win32com.client)
+            if self._attribute is None:
+                return _import(f"{self._module_name}.{name}")
+            raise
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        name = self._module_name if self._attribute is None else f"{self._module_name}.{self._attribute}"
+        state = "загружен" if self._target is not None else "не загружен"
+        return f"<lazy {name} ({state})>"
+
+
+def lazy_import(module_name, attribute=None):
+    """
+    Отложенный 'import module_name' (или 'from module_name import attribute').
+
+    Для 'import a.b' используйте lazy_import('a'): подмодуль b загрузится при обращении a.b.
+    """
+    return LazyObject(module_name, attribute)
+
+
+class StartupTimer:
+    """Отметки этапов запуска; report() пишет в лог, сколько занял каждый этап"""
+
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.marks = []
+
+    def mark(self, stage):
+        self.marks.append((stage, time.perf_counter()))
+
+    def report(self):
+        previous = self.started
+        lines = []
+        for stage, moment in self.marks:
+            lines.append(f"  {stage}: {moment - previous:.3f} с")
+            previous = moment
+        with _lock:
+            imports = dict(IMPORT_TIMES)
+        if imports:
+            lines.append("  отложенные импорты до показа окна: "
+                         + ", ".join(f"{name} {elapsed:.3f} с" for name, elapsed in imports.items()))
+        logger.info(f"Запуск занял {previous - self.started:.3f} с:\n" + "\n".join(lines))
+        return previous - self.started
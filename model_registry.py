@@ -0,0 +1,90 @@
+"""
+Реестр моделей интерпретации (model_registry.json): дополнительные параметры
+модели для таблицы 'Протокол результатов исследования'.
+
+Реестр загружается один раз при запуске. Имена моделей нормализуются при загрузке,
+поэтому модель по значению ячейки B66 находится поиском в словаре; поиск по
+вхождению имени выполняется только для незнакомых значений и запоминается.
+Строки параметров собираются сразу в окончательном виде: параметры с пустыми
+значениями (0, '-', коды ошибок Excel) в таблицу не попадают, и удалять
+их после вставки не нужно.
+"""
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Текстовые значения, при которых строка таблицы результатов не выводится
+EMPTY_RESULT_TEXTS = ("0", "0.0", "0,00", "-", "-2146826252")
+
+# Числа меньше этого — коды ошибок Excel (#Н/Д, #ЗНАЧ! и т.п.)
+MIN_RESULT_VALUE = -1000
+
+
+def is_empty_result(text):
+    """Пустое ли значение таблицы результатов: 0, '-' или код ошибки Excel"""
+    text = text.strip()
+    try:
+        value = float(text.replace(',', '.'))
+    except ValueError:
+        return text in EMPTY_RESULT_TEXTS
+    return value == 0 or value < MIN_RESULT_VALUE
+
+
+def _normalize(name):
+    return str(name).strip().lower()
+
+
+class ModelRegistry:
+    """Модели интерпретации и их параметры с индексом имен"""
+
+    def __init__(self, models, default):
+        self.models = {model["name"]: model["params"] for model in models}
+        if default not in self.models:
+            raise ValueError(f"Модель по умолчанию '{default}' не описана в реестре")
+        self.default = default
+        self._names = {_normalize(name): name for name in self.models}
+        # Нормализованные имена в порядке реестра — для поиска по вхождению
+        self._substrings = list(self._names.items())
+        self._matches = {}
+
+    def match(self, value):
+        """Имя модели по значению ячейки: точное совпадение, затем вхождение имени; None — не найдена"""
+        key = _normalize(value)
+        name = self._names.get(key)
+        if name is not None:
+            return name
+        if key not in self._matches:
+            self._matches[key] = next((name for normalized, name in self._substrings if normalized in key), None)
+        return self._matches[key]
+
+    def resolve(self, value):
+        """Имя модели по значению ячейки или модель по умолчанию"""
+        name = self.match(value)
+        if name is None:
+            logger.warning(f"Модель '{value}' не найдена в реестре. Используется модель по умолчанию: {self.default}")
+            return self.default
+        return name
+
+    def params(self, name, data):
+        """Параметры модели со значениями из data: список {'name', 'value', 'key'}"""
+        return [{"name": param["name"], "value": data.get(param["key"]), "key": param["key"]}
+                for param in self.models.get(name, ())]
+
+    def result_rows(self, name, data):
+        """Строки таблицы результатов (название, значение) для модели — только непустые значения"""
+        rows = []
+        for param in self.params(name, data):
+            value = str(param["value"])
+            if is_empty_result(value):
+                logger.info(f"Параметр '{param['name']}' не выводится: {value}")
+                continue
+            rows.append((param["name"], value))
+        return rows
+
+
+def load_model_registry(path):
+    """Загружает реестр моделей из JSON"""
+    with open(path, 'r', encoding='utf-8') as f:
+        registry = json.load(f)
+    return ModelRegistry(registry["models"], registry["default"])
@@ -0,0 +1,374 @@
+"""
+Пул сеансов автоматизации Office (Excel, Word).
+
+Вместо запуска Excel/Word на каждый вызов и taskkill всех excel.exe пул держит
+по одному «теплому» экземпляру каждого приложения на поток (объекты COM
+привязаны к потоку, в котором созданы) и выдает книги и документы в аренду:
+
+    with OFFICE_POOL.workbook(path, read_only=True) as workbook:
+        values = workbook.Sheets('current').Range("A1:B2").Value
+
+Экземпляр перезапускается после max_jobs аренд или после ошибки внутри аренды.
+Пул запоминает PID запущенных им процессов (и держит их дескрипторы) и при
+остановке завершает только их — открытые пользователем книги Excel не трогаются.
+
+Штатно (Quit) экземпляр закрывается только в потоке, который его запустил, поэтому
+рабочие потоки вызывают close_thread() перед завершением. close() из другого потока
+завершает оставшиеся экземпляры по PID сразу, без ожидания Quit.
+
+Работа с Office вынесена в backend: ComBackend — настоящий Excel/Word через
+pywin32, FakeBackend — объекты в памяти процесса для проверки логики пула без Office.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Перезапуск экземпляра после этого числа аренд
+DEFAULT_MAX_JOBS = 20
+
+# Ожидание завершения процесса после Quit, мс
+QUIT_TIMEOUT_MS = 5000
+
+
+class OfficeInstance:
+    """Запущенное приложение Office: объект приложения, PID и число выданных аренд"""
+
+    def __init__(self, kind, app, pid=None, handle=None):
+        self.kind = kind
+        self.app = app
+        self.pid = pid
+        self.handle = handle
+        self.jobs = 0
+        self.failed = False
+
+    def __repr__(self):
+        return f"<{self.kind} pid={self.pid} аренд={self.jobs}>"
+
+
+class OfficeBackend:
+    """Запуск, открытие файлов и остановка приложений Office"""
+
+    def init_thread(self):
+        """Подготовка потока к работе с приложениями (однократно для потока)"""
+
+    def start(self, kind):
+        """Запускает приложение kind ('excel' или 'word'); возвращает OfficeInstance"""
+        raise NotImplementedError
+
+    def alive(self, instance):
+        raise NotImplementedError
+
+    def open(self, instance, path, read_only):
+        """Открывает книгу (Excel) или документ (Word)"""
+        raise NotImplementedError
+
+    def close(self, instance, item, save):
+        raise NotImplementedError
+
+    def stop(self, instance, graceful=True):
+        """
+        Закрывает приложение; процесс, не завершившийся сам, завершается по PID.
+        При graceful=False (вызов не из потока экземпляра) процесс сразу завершается по PID.
+        """
+        raise NotImplementedError
+
+
+if sys.platform == 'win32':
+    import ctypes
+    from ctypes import wintypes
+
+    _kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    _kernel32.OpenProcess.restype = wintypes.HANDLE
+    _kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+    _kernel32.WaitForSingleObject.argtypes = [wintypes.HANDLE, wintypes.DWORD]
+    _kernel32.TerminateProcess.argtypes = [wintypes.HANDLE, wintypes.UINT]
+    _kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+
+    _PROCESS_TERMINATE = 0x0001
+    _SYNCHRONIZE = 0x00100000
+    _WAIT_OBJECT_0 = 0
+
+    def _open_process(pid):
+        # Открытый дескриптор не дает системе переиспользовать PID, пока пул его держит
+        return _kernel32.OpenProcess(_PROCESS_TERMINATE | _SYNCHRONIZE, False, pid) or None
+
+    def _terminate_process(handle, timeout_ms):
+        """Ждет завершения процесса и завершает его принудительно по истечении timeout_ms"""
+        try:
+            if _kernel32.WaitForSingleObject(handle, timeout_ms) != _WAIT_OBJECT_0:
+                _kernel32.TerminateProcess(handle, 1)
+                return True
+            return False
+        finally:
+            _kernel32.CloseHandle(handle)
+else:
+    def _open_process(pid):
+        return None
+
+    def _terminate_process(handle, timeout_ms):
+        return False
+
+
+def _process_ids(image_name):
+    """PID процессов с именем образа image_name (tasklist)"""
+    completed = subprocess.run(["tasklist", "/fi", f"imagename eq {image_name}", "/fo", "csv", "/nh"],
+                               capture_output=True, text=True, creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+    pids = set()
+    for line in completed.stdout.splitlines():
+        fields = [field.strip('"') for field in line.split('","')]
+        if len(fields) > 1 and fields[1].isdigit():
+            pids.add(int(fields[1]))
+    return pids
+
+
+class ComBackend(OfficeBackend):
+    """Excel и Word через pywin32 (DispatchEx — отдельный процесс на экземпляр)"""
+
+    PROG_IDS = {"excel": "Excel.Application", "word": "Word.Application"}
+    IMAGE_NAMES = {"excel": "EXCEL.EXE", "word": "WINWORD.EXE"}
+
+    def __init__(self):
+        self._local = threading.local()
+        # Запуски сериализуются: PID Word определяется по появившемуся процессу
+        self._start_lock = threading.Lock()
+
+    def init_thread(self):
+        if not getattr(self._local, "initialized", False):
+            import pythoncom
+
+            # Не снимается до конца потока: экземпляры пула живут дольше одной аренды
+            pythoncom.CoInitialize()
+            self._local.initialized = True
+
+    def _pid(self, kind, app, before):
+        if kind == "excel":
+            import win32process
+
+            return win32process.GetWindowThreadProcessId(app.Hwnd)[1]
+        started = _process_ids(self.IMAGE_NAMES[kind]) - before
+        if len(started) == 1:
+            return started.pop()
+        # Одновременно запускался Word другого процесса — PID неизвестен, принудительно не завершаем
+        logger.warning(f"Не удалось определить PID запущенного {kind}")
+        return None
+
+    def start(self, kind):
+        import win32com.client
+
+        with self._start_lock:
+            before = _process_ids(self.IMAGE_NAMES[kind]) if kind != "excel" else set()
+            app = win32com.client.DispatchEx(self.PROG_IDS[kind])
+            pid = self._pid(kind, app, before)
+        app.Visible = False
+        app.DisplayAlerts = False
+        return OfficeInstance(kind, app, pid, _open_process(pid) if pid else None)
+
+    def alive(self, instance):
+        try:
+            instance.app.Visible
+            return True
+        except Exception:
+            return False
+
+    def open(self, instance, path, read_only):
+        files = instance.app.Workbooks if instance.kind == "excel" else instance.app.Documents
+        return files.Open(os.path.abspath(path), ReadOnly=read_only)
+
+    def close(self, instance, item, save):
+        item.Close(SaveChanges=save)
+
+    def stop(self, instance, graceful=True):
+        if graceful:
+            try:
+                instance.app.Quit()
+            except Exception as e:
+                logger.warning(f"Не удалось закрыть {instance.kind} (PID {instance.pid}): {e}")
+        instance.app = None
+        if instance.handle is None:
+            if not graceful:
+                logger.warning(f"Процесс {instance.kind} без известного PID не может быть завершен")
+            return
+        if _terminate_process(instance.handle, QUIT_TIMEOUT_MS if graceful else 0):
+            logger.warning(f"Процесс {instance.kind} (PID {instance.pid}) завершен принудительно")
+
+
+class FakeApp:
+    def __init__(self, kind):
+        self.kind = kind
+        self.open_items = []
+        self.crashed = False
+
+
+class FakeItem:
+    def __init__(self, path, read_only):
+        self.path = path
+        self.read_only = read_only
+        self.saved = False
+        self.closed = False
+
+
+class FakeBackend(OfficeBackend):
+    """Приложения Office в памяти процесса: запуски, открытия и остановки записываются в журнал"""
+
+    def __init__(self, first_pid=10000):
+        self._next_pid = first_pid
+        self._lock = threading.Lock()
+        self.started = []
+        self.stopped = []
+        self.killed = []
+        self.fail_paths = set()
+
+    def start(self, kind):
+        with self._lock:
+            pid = self._next_pid
+            self._next_pid += 1
+        instance = OfficeInstance(kind, FakeApp(kind), pid)
+        self.started.append(instance)
+        return instance
+
+    def alive(self, instance):
+        return instance.app is not None and not instance.app.crashed
+
+    def open(self, instance, path, read_only):
+        if path in self.fail_paths:
+            raise OSError(f"Не удалось открыть {path}")
+        item = FakeItem(path, read_only)
+        instance.app.open_items.append(item)
+        return item
+
+    def close(self, instance, item, save):
+        item.saved = item.saved or save
+        item.closed = True
+        instance.app.open_items.remove(item)
+
+    def stop(self, instance, graceful=True):
+        instance.app = None
+        (self.stopped if graceful else self.killed).append(instance)
+
+
+class OfficePool:
+    """Теплые экземпляры Excel и Word по потокам с арендой книг и документов"""
+
+    def __init__(self, backend, max_jobs=DEFAULT_MAX_JOBS):
+        self.backend = backend
+        self.max_jobs = max_jobs
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def _instance(self, kind):
+        key = (threading.get_ident(), kind)
+        with self._lock:
+            instance = self._instances.get(key)
+        if instance is not None and not self.backend.alive(instance):
+            logger.warning(f"Экземпляр {instance!r} не отвечает, запускается новый")
+            self._stop(key, instance)
+            instance = None
+        if instance is None:
+            self.backend.init_thread()
+            instance = self.backend.start(kind)
+            logger.info(f"Запущен {kind} (PID {instance.pid})")
+            with self._lock:
+                self._instances[key] = instance
+        return key, instance
+
+    def _stop(self, key, instance, graceful=True):
+        with self._lock:
+            if self._instances.get(key) is instance:
+                del self._instances[key]
+        try:
+            self.backend.stop(instance, graceful)
+        except Exception as e:
+            logger.warning(f"Ошибка при остановке {instance!r}: {e}")
+
+    @contextmanager
+    def _leased(self, kind):
+        key, instance = self._instance(kind)
+        instance.jobs += 1
+        try:
+            yield instance
+        except BaseException:
+            instance.failed = True
+            raise
+        finally:
+            if instance.failed or instance.jobs >= self.max_jobs:
+                reason = "ошибки" if instance.failed else f"{instance.jobs} аренд"
+                logger.info(f"Перезапуск {kind} (PID {instance.pid}) после {reason}")
+                self._stop(key, instance)
+
+    @contextmanager
+    def lease(self, kind):
+        """Приложение kind ('excel' или 'word') текущего потока на время блока"""
+        with self._leased(kind) as instance:
+            yield instance.app
+
+    @contextmanager
+    def _open(self, kind, path, read_only, save):
+        with self._leased(kind) as instance:
+            item = self.backend.open(instance, path, read_only)
+            saved = False
+            try:
+                yield item
+                saved = save and not read_only
+            finally:
+                self.backend.close(instance, item, saved)
+
+    def workbook(self, path, read_only=False, save=False):
+        """Книга Excel в аренду; при save=True сохраняется при успешном выходе из блока"""
+        return self._open("excel", path, read_only, save)
+
+    def document(self, path, read_only=True, save=False):
+        """Документ Word в аренду"""
+        return self._open("word", path, read_only, save)
+
+    def instances(self):
+        with self._lock:
+            return list(self._instances.values())
+
+    def pids(self):
+        """PID процессов, запущенных пулом и еще не остановленных"""
+        return [instance.pid for instance in self.instances() if instance.pid is not None]
+
+    def close_thread(self):
+        """Останавливает экземпляры текущего потока (вызывается в потоке, который с ними работал)"""
+        ident = threading.get_ident()
+        with self._lock:
+            instances = [(key, instance) for key, instance in self._instances.items() if key[0] == ident]
+        for key, instance in instances:
+            self._stop(key, instance)
+
+    def close(self):
+        """
+        Останавливает все экземпляры пула: экземпляры текущего потока — через Quit,
+        экземпляры других потоков (их объекты COM здесь недоступны) — завершением процесса.
+        """
+        ident = threading.get_ident()
+        with self._lock:
+            instances = list(self._instances.items())
+        for key, instance in instances:
+            self._stop(key, instance, graceful=key[0] == ident)
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def default_pool():
+    """Общий пул процесса с настоящим Office; экземпляры останавливаются при выходе"""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = OfficePool(ComBackend())
+            if multiprocessing.parent_process() is not None:
+                # Рабочие процессы пула завершаются без atexit
+                from multiprocessing import util
+
+                util.Finalize(_default_pool, _default_pool.close, exitpriority=10)
+            atexit.register(_default_pool.close)
+        return _default_pool
@@ -0,0 +1,138 @@
+"""
+Растеризация графиков из PDF интерпретации (Saphir/Kappa).
+
+Модуль не зависит от GUI, поэтому его функции можно выполнять в дочерних
+процессах: каждый процесс сам открывает PDF и рисует свою часть страниц.
+"""
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from lazy_imports import lazy_import
+
+# PyMuPDF загружается при первой отрисовке, а не при запуске GUI
+fitz = lazy_import("fitz")
+
+logger = logging.getLogger(__name__)
+
+# Меньше страниц рисуем в текущем процессе: запуск пула дороже самой отрисовки
+PARALLEL_MIN_PAGES = 8
+
+# Предельный размер кеша отрисованных графиков
+DEFAULT_CACHE_BYTES = 200 * 1024 * 1024
+
+# Открытый документ дочернего процесса (путь, fitz.Document)
+_worker_doc = (None, None)
+
+
+def default_workers():
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def clip_rect(dpi, crop_box):
+    """Переводит область crop_box (пиксели при dpi) в координаты страницы (пункты)"""
+    scale = 72 / dpi
+    x0, y0, x1, y1 = crop_box
+    return fitz.Rect(x0 * scale, y0 * scale, x1 * scale, y1 * scale)
+
+
+def render_clip(doc, page_number, dpi, crop_box):
+    """Рисует только область crop_box страницы, возвращает fitz.Pixmap"""
+    page = doc.load_page(page_number)
+    return page.get_pixmap(dpi=dpi, clip=clip_rect(dpi, crop_box))
+
+
+def save_png(pixmap, output_path):
+    """Сохраняет PNG через временный файл, чтобы не оставить недописанное изображение"""
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    pixmap.save(tmp_path, output="png")
+    os.replace(tmp_path, output_path)
+
+
+def _render_job(job):
+    global _worker_doc
+    pdf_path, page_number, output_path, dpi, crop_box = job
+    if _worker_doc[0] != pdf_path:
+        if _worker_doc[1] is not None:
+            _worker_doc[1].close()
+        _worker_doc = (pdf_path, fitz.open(pdf_path))
+    save_png(render_clip(_worker_doc[1], page_number, dpi, crop_box), output_path)
+    return output_path
+
+
+def render_pages(pdf_path, jobs, dpi, crop_box, workers=None):
+    """
+    Рисует страницы в пуле процессов.
+
+    :param jobs: список (номер страницы, путь PNG); имена файлов задает вызывающий код,
+        поэтому результат не зависит от порядка завершения процессов
+    :param workers: число процессов (по умолчанию — число ядер минус одно)
+    :return: пути сохраненных изображений в порядке jobs
+    """
+    workers = workers or default_workers()
+    tasks = [(pdf_path, page_number, output_path, dpi, crop_box) for page_number, output_path in jobs]
+    chunksize = max(1, len(tasks) // (workers * 4))
+    logger.info(f"Параллельная отрисовка {len(tasks)} страниц, процессов: {workers}")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_render_job, tasks, chunksize=chunksize))
+
+
+def file_hash(path):
+    """SHA-256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """
+    Кеш отрисованных графиков по содержимому PDF.
+
+    Ключ — хеш PDF, номер страницы, dpi и область отрисовки, поэтому повторная
+    обработка того же PDF (в том числе переименованного) не рисует страницы заново.
+    Размер каталога ограничен max_bytes; вытесняются давно не использованные файлы.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(pdf_hash, page_number, dpi, crop_box):
+        raw = f"{pdf_hash}:{page_number}:{dpi}:{','.join(str(v) for v in crop_box)}"
+        return hashlib.sha256(raw.encode('ascii')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def get(self, key):
+        """Путь к изображению в кеше или None; попадание обновляет время использования"""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def evict(self):
+        """Удаляет самые старые по использованию файлы, пока кеш больше max_bytes"""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith('.png'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError as e:
+                logger.warning(f"Не удалось удалить {path} из кеша графиков: {e}")
@@ -0,0 +1,173 @@
+"""
+Изменение давления за заданные интервалы по данным раздела 3 (столбцы Q/R листа 'current').
+
+Столбец дат разбирается один раз в массив datetime64, поиск значения
+"за интервал до последнего замера" выполняется через searchsorted,
+поэтому несколько интервалов считаются за один проход чтения листа.
+"""
+import logging
+from datetime import timedelta
+
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+DATE_FORMATS = ("%d.%m.%Y %H:%M:%S", "%d.%m.%Y")
+
+# Интервалы для показателей стабилизации давления
+DEFAULT_WINDOWS = {
+    "1h": timedelta(hours=1),
+    "6h": timedelta(hours=6),
+    "24h": timedelta(days=1),
+    "72h": timedelta(days=3),
+}
+
+# Допустимая погрешность во времени при поиске замера
+DEFAULT_TOLERANCE = timedelta(minutes=60)
+
+# Минимальное значение B12, при котором считается изменение давления
+MIN_B12_VALUE = 30
+
+
+def parse_dates(values):
+    """
+    Преобразует значения столбца дат в массив datetime64[ns] (NaT для нераспознанных).
+    Строки разбираются по форматам DATE_FORMATS, даты Excel принимаются как есть.
+    """
+    import pandas as pd
+
+    series = pd.Series(values, dtype=object)
+    result = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+
+    if pd.api.types.infer_dtype(series, skipna=False) == 'string':
+        # Только строки (вставка из буфера обмена) — без проверки типа каждого значения
+        is_text = pd.Series(True, index=series.index)
+        is_date = ~is_text
+    else:
+        is_text = series.map(lambda value: isinstance(value, str))
+        is_date = series.map(lambda value: hasattr(value, 'year') and not isinstance(value, str))
+    if is_text.any():
+        text = series[is_text].str.strip()
+        parsed = pd.to_datetime(text, format=DATE_FORMATS[0], errors='coerce')
+        for date_format in DATE_FORMATS[1:]:
+            missing = parsed.isna()
+            if not missing.any():
+                break
+            parsed[missing] = pd.to_datetime(text[missing], format=date_format, errors='coerce')
+        result[is_text] = parsed
+
+    if is_date.any():
+        result[is_date] = pd.to_datetime(series[is_date], errors='coerce')
+    return result.to_numpy()
+
+
+class PressureSeries:
+    """Ряд замеров: моменты времени (datetime64) и значения давления"""
+
+    def __init__(self, times, values):
+        self.times = np.asarray(times, dtype='datetime64[ns]')
+        self.values = np.asarray(values, dtype=float)
+        self._valid = ~np.isnat(self.times)
+        valid_times = self.times[self._valid]
+        self._sorted = bool(np.all(valid_times[1:] >= valid_times[:-1]))
+
+    @classmethod
+    def from_columns(cls, dates, values):
+        values = np.array([value if isinstance(value, (int, float)) else np.nan for value in values], dtype=float)
+        return cls(parse_dates(dates), values)
+
+    def _first_in_range(self, low, high):
+        """Индекс первого (в порядке строк) замера с моментом в [low, high] или None"""
+        if self._sorted:
+            valid_idx = np.flatnonzero(self._valid)
+            pos = np.searchsorted(self.times[valid_idx], low, side='left')
+            if pos < len(valid_idx) and self.times[valid_idx[pos]] <= high:
+                return int(valid_idx[pos])
+            return None
+        mask = self._valid & (self.times >= low) & (self.times <= high)
+        return int(np.argmax(mask)) if mask.any() else None
+
+    def deltas(self, windows, last_time, last_value, tolerance=DEFAULT_TOLERANCE):
+        """
+        Разница между последним значением и значением за каждый интервал до last_time.
+
+        :param windows: словарь имя -> timedelta
+        :return: словарь имя -> разница или None, если замер не найден
+        """
+        last_time = np.datetime64(last_time, 'ns')
+        tolerance = np.timedelta64(tolerance)
+        result = {}
+        for name, window in windows.items():
+            target = last_time - np.timedelta64(window)
+            idx = self._first_in_range(target - tolerance, target + tolerance)
+            result[name] = None if idx is None else last_value - self.values[idx]
+        return result
+
+
+def read_pressure_columns(workbook_path, sheet_name='current', date_column=17, value_column=18, evaluator=None):
+    """
+    Читает лист один раз и возвращает значение B12, столбец дат и столбец давлений.
+    Номера столбцов — с единицы (Q=17, R=18).
+
+    :param evaluator: FormulaEvaluator уже загруженного листа — значения берутся из него,
+        книга с диска не читается
+    """
+    if evaluator is not None:
+        max_row = evaluator.max_row
+        return (evaluator.value(12, 2),
+                list(evaluator.column_values(date_column, 1, max_row)),
+                list(evaluator.column_values(value_column, 1, max_row)))
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(workbook_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name]
+        b12_value = None
+        dates, values = [], []
+        for row_idx, row in enumerate(sheet.iter_rows(min_col=2, max_col=value_column, values_only=True), 1):
+            if row_idx == 12:
+                b12_value = row[0]
+            row = row + (None,) * (value_column - 1 - len(row))
+            dates.append(row[date_column - 2])
+            values.append(row[value_column - 2])
+    finally:
+        workbook.close()
+    return b12_value, dates, values
+
+
+def calculate_pressure_deltas(workbook_path, sheet_name='current', windows=None, tolerance=DEFAULT_TOLERANCE,
+                              evaluator=None):
+    """
+    Изменение давления (столбец R) за интервалы windows до последней даты столбца Q.
+    Лист берется из evaluator, если он передан (см. read_pressure_columns).
+
+    :return: словарь имя интервала -> разница (None, если не найдено), либо None,
+        если B12 меньше MIN_B12_VALUE или последнюю дату не удалось распознать
+    """
+    windows = windows or DEFAULT_WINDOWS
+    b12_value, dates, values = read_pressure_columns(workbook_path, sheet_name, evaluator=evaluator)
+
+    if isinstance(b12_value, (int, float)) and b12_value < MIN_B12_VALUE:
+        logger.info(f"Значение в ячейке B12 меньше {MIN_B12_VALUE}. Возвращаем None.")
+        return None
+
+    series = PressureSeries.from_columns(dates, values)
+
+    # Последнее значение в R и последняя заполненная дата в Q
+    filled_values = np.flatnonzero(~np.isnan(series.values))
+    filled_dates = [idx for idx, value in enumerate(dates) if value is not None and value != '']
+    if not len(filled_values) or not filled_dates:
+        logger.warning("Нет данных в столбцах Q/R")
+        return None
+    last_value = series.values[filled_values[-1]]
+    last_time = series.times[filled_dates[-1]]
+    if np.isnat(last_time):
+        logger.error(f"Невозможно преобразовать дату: {dates[filled_dates[-1]]}")
+        return None
+
+    deltas = series.deltas(windows, last_time, last_value, tolerance)
+    logger.info(f"Изменение давления по интервалам: {deltas}")
+    return deltas
@@ -0,0 +1,244 @@
+"""
+Запись готового отчета: .docx, .doc или .pdf.
+
+Все проходы заполнения работают с одним документом в памяти, и пакет .docx
+собирается (zip со всеми изображениями) один раз — в write_report. Результат
+пишется потоком в файл назначения (через временный файл и переименование),
+в переданный открытый файл или возвращается байтами. Для .doc и .pdf
+документ сохраняется во временную папку и
+конвертируется локальным LibreOffice без окна (soffice --headless). Если
+LibreOffice не установлен, используется Word из пула сеансов Office
+(office_pool, только Windows с Office).
+
+Каждый запуск LibreOffice занимает свой профиль пользователя: профили лежат
+в profile_dir (slot-0, slot-1, ...) и переиспользуются, поэтому после первой
+конвертации профиль не создается заново. Профиль блокируется файлом
+на время конвертации, так что параллельные процессы (пакетный режим) берут
+разные профили.
+"""
+import io
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+from office_pool import default_pool
+
+logger = logging.getLogger(__name__)
+
+# Форматы отчета: расширение файла
+OUTPUT_FORMATS = {"docx": ".docx", "doc": ".doc", "pdf": ".pdf"}
+
+# Фильтры LibreOffice для --convert-to
+SOFFICE_FILTERS = {"doc": "doc:MS Word 97", "pdf": "pdf:writer_pdf_Export"}
+
+# Форматы Word для SaveAs (wdFormatDocument97, wdFormatPDF)
+WORD_FILE_FORMATS = {"doc": 0, "pdf": 17}
+
+SOFFICE_CANDIDATES = (
+    r"C:\Program Files\LibreOffice\program\soffice.exe",
+    r"C:\Program Files (x86)\LibreOffice\program\soffice.exe",
+    "/usr/bin/soffice",
+    "/usr/lib/libreoffice/program/soffice",
+    "/Applications/LibreOffice.app/Contents/MacOS/soffice",
+)
+
+if sys.platform == 'win32':
+    import msvcrt
+
+    def _try_lock(f):
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+else:
+    import fcntl
+
+    def _try_lock(f):
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+
+class ConversionError(RuntimeError):
+    """Не удалось получить .doc или .pdf из .docx"""
+
+
+def find_soffice():
+    """Путь к soffice или None"""
+    for name in ("soffice", "libreoffice"):
+        path = shutil.which(name)
+        if path:
+            return path
+    for path in SOFFICE_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _replace_atomic(source, target):
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, target)
+
+
+def _file_uri(path):
+    path = os.path.abspath(path).replace('\\', '/')
+    return f"file:///{path.lstrip('/')}"
+
+
+class OfficeConverter:
+    """Конвертация .docx в .doc/.pdf через LibreOffice с пулом профилей (Word — запасной вариант)"""
+
+    def __init__(self, profile_dir, slots=2, soffice=None, timeout=180, office_pool=None):
+        self.profile_dir = profile_dir
+        self.office_pool = office_pool
+        self.slots = slots
+        self.soffice = soffice or find_soffice()
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return self.soffice is not None
+
+    def _acquire_slot(self):
+        """Свободный профиль: (путь профиля, открытый файл блокировки)"""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        with self._lock:
+            for slot in range(self.slots):
+                lock_file = open(os.path.join(self.profile_dir, f"slot-{slot}.lock"), 'a+')
+                if _try_lock(lock_file):
+                    return os.path.join(self.profile_dir, f"slot-{slot}"), lock_file
+                lock_file.close()
+        # Все профили заняты другими процессами — одноразовый профиль
+        return tempfile.mkdtemp(prefix="soffice_profile_"), None
+
+    def _convert_soffice(self, docx_path, output_path, output_format):
+        profile, lock_file = self._acquire_slot()
+        out_dir = tempfile.mkdtemp(prefix="soffice_out_")
+        try:
+            command = [
+                self.soffice,
+                f"-env:UserInstallation={_file_uri(profile)}",
+                "--headless", "--norestore", "--nologo", "--nodefault",
+                "--convert-to", SOFFICE_FILTERS[output_format],
+                "--outdir", out_dir,
+                docx_path,
+            ]
+            completed = subprocess.run(command, capture_output=True, text=True, timeout=self.timeout)
+            converted = os.path.join(out_dir, os.path.splitext(os.path.basename(docx_path))[0]
+                                     + OUTPUT_FORMATS[output_format])
+            if completed.returncode != 0 or not os.path.exists(converted):
+                raise ConversionError(f"LibreOffice не сконвертировал файл (код {completed.returncode}): "
+                                      f"{completed.stderr.strip() or completed.stdout.strip()}")
+            _replace_atomic(converted, output_path)
+        except subprocess.TimeoutExpired:
+            raise ConversionError(f"LibreOffice не ответил за {self.timeout} с")
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+            if lock_file is None:
+                shutil.rmtree(profile, ignore_errors=True)
+            else:
+                lock_file.close()
+
+    def _convert_word(self, docx_path, output_path, output_format):
+        pool = self.office_pool or default_pool()
+        tmp_path = f"{output_path}.{os.getpid()}.tmp{OUTPUT_FORMATS[output_format]}"
+        try:
+            with pool.document(docx_path, read_only=True) as document:
+                document.SaveAs(os.path.abspath(tmp_path), FileFormat=WORD_FILE_FORMATS[output_format])
+            os.replace(tmp_path, output_path)
+        except Exception as e:
+            raise ConversionError(f"Word не сконвертировал файл: {e}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def convert(self, docx_path, output_path, output_format):
+        """Конвертирует docx_path в output_path (формат 'doc' или 'pdf')"""
+        if self.available:
+            logger.info(f"Конвертация в .{output_format} через LibreOffice")
+            self._convert_soffice(docx_path, output_path, output_format)
+        elif sys.platform == 'win32':
+            logger.info(f"LibreOffice не найден, конвертация в .{output_format} через Word")
+            self._convert_word(docx_path, output_path, output_format)
+        else:
+            raise ConversionError(f"Для формата .{output_format} нужен LibreOffice (soffice не найден)")
+        logger.info(f"Отчет сохранен: {output_path}")
+
+
+def output_path_for(base_path, output_format):
+    """Путь отчета с расширением формата"""
+    return os.path.splitext(base_path)[0] + OUTPUT_FORMATS[output_format]
+
+
+def _is_path(output):
+    return isinstance(output, (str, os.PathLike))
+
+
+def serialize_report(doc):
+    """Документ в байтах .docx"""
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def write_report(doc, output, output_format="docx", converter=None, work_dir=None):
+    """
+    Записывает документ один раз.
+
+    :param output: путь, открытый двоичный файл или None (вернуть байты)
+    :param output_format: 'docx', 'doc' или 'pdf'
+    :param converter: OfficeConverter для .doc/.pdf
+    :param work_dir: папка для промежуточного .docx (по умолчанию временная)
+    :return: output или байты отчета
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Неизвестный формат отчета: {output_format}")
+
+    if output_format == "docx":
+        if output is None:
+            return serialize_report(doc)
+        if not _is_path(output):
+            doc.save(output)
+            return output
+        tmp_path = f"{output}.{os.getpid()}.tmp"
+        try:
+            doc.save(tmp_path)
+            os.replace(tmp_path, output)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return output
+
+    if converter is None:
+        raise ConversionError(f"Для формата .{output_format} не задан конвертер")
+    own_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="report_output_")
+    name = os.path.splitext(os.path.basename(output))[0] if _is_path(output) else "report"
+    docx_path = os.path.join(work_dir, f"{name}.docx")
+    converted = output if _is_path(output) else os.path.join(work_dir, name + OUTPUT_FORMATS[output_format])
+    try:
+        doc.save(docx_path)
+        converter.convert(docx_path, converted, output_format)
+        if output is None:
+            with open(converted, 'rb') as f:
+                return f.read()
+        if not _is_path(output):
+            with open(converted, 'rb') as f:
+                shutil.copyfileobj(f, output)
+        return output
+    finally:
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        else:
+            for path in {docx_path, converted} - {output}:
+                if os.path.exists(path):
+                    os.remove(path)
@@ -0,0 +1,172 @@
+"""
+Декларативное описание полей отчета (report_fields.json) и сборка словаря data.
+
+Каждое поле связывает метку шаблона с ячейкой листа 'current', типом,
+правилом округления и значением по умолчанию. Лист читается одним блоком
+(sheet.Range('A1:AN150').Value), после чего все поля берутся из матрицы в памяти.
+"""
+import json
+import logging
+from datetime import datetime
+
+from formula_engine import COM_ERROR_CODES
+from lazy_imports import lazy_import
+
+column_index_from_string = lazy_import("openpyxl.utils", "column_index_from_string")
+range_boundaries = lazy_import("openpyxl.utils", "range_boundaries")
+
+logger = logging.getLogger(__name__)
+
+
+def convert_to_datetime(value):
+    if not value or value == '-':
+        return None
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value, "%d.%m.%Y")
+        except ValueError:
+            return None
+    elif isinstance(value, datetime):
+        return value
+    return None
+
+
+def load_field_schema(path):
+    """Загружает описание полей отчета из JSON"""
+    with open(path, 'r', encoding='utf-8') as f:
+        schema = json.load(f)
+
+    for field in schema["fields"]:
+        if field["type"] not in FIELD_CONVERTERS:
+            raise ValueError(f"Неизвестный тип поля '{field['type']}' для метки {field['tag']}")
+        if field["type"] != "context" and "cell" not in field:
+            raise ValueError(f"Для метки {field['tag']} не указана ячейка")
+    return schema
+
+
+class SheetBlock:
+    """Прямоугольный блок значений листа, прочитанный за одно обращение"""
+
+    def __init__(self, values, area):
+        min_col, min_row, max_col, max_row = range_boundaries(area)
+        self.min_row = min_row
+        self.min_col = min_col
+        self.values = values
+
+    def __getitem__(self, address):
+        col = column_index_from_string(address.rstrip('0123456789'))
+        row = int(address[len(address.rstrip('0123456789')):])
+        row_idx, col_idx = row - self.min_row, col - self.min_col
+        if row_idx < 0 or col_idx < 0 or row_idx >= len(self.values):
+            logger.warning(f"Ячейка {address} вне прочитанного блока")
+            return None
+        row_values = self.values[row_idx]
+        if col_idx >= len(row_values):
+            logger.warning(f"Ячейка {address} вне прочитанного блока")
+            return None
+        return row_values[col_idx]
+
+
+def read_sheet_block(sheet, area):
+    """
+    Читает блок листа одним вызовом Range(area).Value.
+    Работает и с листом Excel (COM), и с EvaluatedSheet.
+    """
+    values = sheet.Range(area).Value
+    if not isinstance(values, (tuple, list)):
+        # Блок из одной ячейки COM возвращает скаляром
+        values = ((values,),)
+    return SheetBlock(values, area)
+
+
+# Преобразование значений ячеек --------------------------------------------------------------
+
+def _round(value, field):
+    digits = field.get("round")
+    # round без знаков возвращает int, как в исходном коде отчета
+    value = round(value) if not digits else round(value, digits)
+    return abs(value) if field.get("abs") else value
+
+
+def _convert_raw(value, field):
+    return value
+
+
+def _convert_text(value, field):
+    return str(value) if value is not None else field.get("default", "")
+
+
+def _convert_date(value, field):
+    date_value = convert_to_datetime(value)
+    return date_value.strftime("%d.%m.%Y") if date_value else field.get("default", "")
+
+
+def _convert_number(value, field):
+    if field.get("strict"):
+        return _round(value, field)
+    return _round(value, field) if value else field.get("default", 0)
+
+
+def _convert_numeric(value, field):
+    """Число или строка с числом (скин-факторы); все остальное — значение по умолчанию"""
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.replace('.', '', 1).isdigit()):
+        return _round(float(value), field)
+    return field.get("default", 0)
+
+
+def _convert_format(value, field):
+    return f"{float(value):{field['format']}}" if value else field.get("default", "")
+
+
+def _default(field):
+    """Значение по умолчанию поля: явное из описания или пустое для его типа"""
+    if "default" in field:
+        return field["default"]
+    return 0 if field["type"] in ("number", "numeric", "context") else ""
+
+
+FIELD_CONVERTERS = {
+    "raw": _convert_raw,
+    "text": _convert_text,
+    "date": _convert_date,
+    "number": _convert_number,
+    "numeric": _convert_numeric,
+    "format": _convert_format,
+    "context": None,
+}
+
+
+def is_error_value(value):
+    """Код ошибки Excel (#ССЫЛКА!, #Н/Д и т.п.), как его отдает COM"""
+    return isinstance(value, int) and not isinstance(value, bool) and value in _ERROR_CODES
+
+
+_ERROR_CODES = frozenset(COM_ERROR_CODES.values())
+
+
+def extract_report_data(block, schema, context=None):
+    """
+    Собирает словарь data для шаблона по описанию полей.
+
+    :param block: SheetBlock с прочитанными значениями листа
+    :param schema: описание полей (load_field_schema)
+    :param context: значения полей типа "context", вычисленные вне листа
+    :return: словарь метка -> значение в порядке описания
+    """
+    context = context or {}
+    data = {}
+    for field in schema["fields"]:
+        tag = field["tag"]
+        if field["type"] == "context":
+            value = context.get(tag, field.get("default"))
+        else:
+            value = block[field["cell"]]
+        if is_error_value(value):
+            # Ошибка формулы не должна попасть в документ числом — берется значение по умолчанию
+            logger.warning(f"Поле {tag} содержит ошибку Excel: {value}")
+            data[tag] = _default(field)
+        elif field["type"] == "context":
+            data[tag] = value
+        else:
+            data[tag] = FIELD_CONVERTERS[field["type"]](value, field)
+    return data
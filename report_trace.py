@@ -0,0 +1,172 @@
+"""
+Замер этапов формирования отчета и запись трассы в формате Chrome trace-event.
+
+    with report_trace.tracing(trace_path, "Закл_321-14"):
+        with report_trace.span("загрузка книги"):
+            ...
+
+Для каждого этапа записываются время выполнения, процессорное время потока
+и память процесса: текущая и пиковая (Working Set / max RSS) в конце этапа
+и на сколько этап поднял пик. Функции конвейера вызывают
+span() без передачи трассировщика: активная трасса хранится в потоке,
+а вне tracing() span() ничего не делает. Файл трассы открывается
+в chrome://tracing или https://ui.perfetto.dev.
+
+Процессорное время считается только для текущего потока (отрисовка PDF
+в дочерних процессах и работа Word/Excel через COM в него не входят).
+tracemalloc не используется: он замедляет формирование отчета в разы.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+if sys.platform == 'win32':
+    import ctypes
+    from ctypes import wintypes
+
+    class _ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    _get_process_memory_info = ctypes.WinDLL('psapi').GetProcessMemoryInfo
+    _get_process_memory_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(_ProcessMemoryCounters), wintypes.DWORD]
+    _get_current_process = ctypes.WinDLL('kernel32').GetCurrentProcess
+    _get_current_process.restype = wintypes.HANDLE
+
+    def process_memory():
+        """(текущий, пиковый) объем памяти процесса, байт"""
+        counters = _ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        if not _get_process_memory_info(_get_current_process(), ctypes.byref(counters), counters.cb):
+            return None
+        return counters.WorkingSetSize, counters.PeakWorkingSetSize
+else:
+    import resource
+
+    def process_memory():
+        """(текущий, пиковый) объем памяти процесса, байт"""
+        # ru_maxrss: Linux — килобайты, macOS — байты
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak *= 1 if sys.platform == 'darwin' else 1024
+        try:
+            with open('/proc/self/statm') as f:
+                current = int(f.read().split()[1]) * resource.getpagesize()
+        except OSError:
+            current = peak
+        return current, peak
+
+
+def _megabytes(value):
+    return round(value / 2 ** 20, 1)
+
+
+class Tracer:
+    """Трасса одного отчета: вложенные этапы потока, в котором она создана"""
+
+    def __init__(self, name):
+        self.name = name
+        self.events = []
+        self.stages = []
+        self._depth = 0
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, **args):
+        memory_started = process_memory()
+        self._depth += 1
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        try:
+            yield args
+        finally:
+            wall = time.perf_counter() - started
+            args["cpu_ms"] = round((time.thread_time() - cpu_started) * 1000, 1)
+            memory = process_memory()
+            if memory is not None and memory_started is not None:
+                args["rss_mb"] = _megabytes(memory[0])
+                args["peak_rss_mb"] = _megabytes(memory[1])
+                args["peak_growth_mb"] = _megabytes(memory[1] - memory_started[1])
+            self._depth -= 1
+            if self._depth == 1:
+                self.stages.append((name, wall))
+            self.events.append({
+                "name": name,
+                "cat": "report",
+                "ph": "X",
+                "ts": round((started - self._origin) * 1e6),
+                "dur": round(wall * 1e6),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            })
+
+    def summary(self):
+        """Этапы первого уровня для лога: 'имя время, ...'"""
+        return ", ".join(f"{name} {wall:.2f} с" for name, wall in self.stages)
+
+    def write(self, path):
+        """Записывает трассу (JSON Chrome trace-event) через временный файл"""
+        trace = {
+            "traceEvents": [
+                {"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": self.name}},
+                *sorted(self.events, key=lambda event: event["ts"]),
+            ],
+            "displayTimeUnit": "ms",
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(trace, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+def current_tracer():
+    return getattr(_local, "tracer", None)
+
+
+def span(name, **args):
+    """Этап активной трассы потока; без трассы — пустой контекст"""
+    tracer = current_tracer()
+    if tracer is None:
+        return nullcontext()
+    return tracer.span(name, **args)
+
+
+@contextmanager
+def tracing(path, name):
+    """
+    Включает трассу в текущем потоке и записывает ее в path по выходу
+    (в том числе при ошибке — трасса показывает, на каком этапе она произошла).
+    """
+    tracer = Tracer(name)
+    previous = current_tracer()
+    _local.tracer = tracer
+    try:
+        with tracer.span(name):
+            yield tracer
+    finally:
+        _local.tracer = previous
+        try:
+            tracer.write(path)
+            logger.info(f"Трасса отчета: {tracer.summary()}; файл {path}")
+        except OSError as e:
+            logger.warning(f"Не удалось записать трассу отчета {path}: {e}")
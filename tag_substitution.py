@@ -0,0 +1,92 @@
+"""
+Подстановка значений меток за один проход по тексту.
+
+Все метки словаря data объединяются в одно регулярное выражение, отсортированное
+по убыванию длины: при сканировании слева направо в каждой позиции выбирается
+самая длинная метка, поэтому 'P_pl_vnk' не срабатывает внутри 'P_pl_vnk2',
+а подставленные значения повторно не просматриваются.
+"""
+import re
+from bisect import bisect_right
+from functools import lru_cache
+
+
+@lru_cache(maxsize=32)
+def _compile_tags(tags):
+    if not tags:
+        return None
+    return re.compile('|'.join(re.escape(tag) for tag in sorted(tags, key=len, reverse=True)))
+
+
+class TagSubstituter:
+    """Замена меток data в строках и в наборе Runs параграфа"""
+
+    def __init__(self, data, convert=str):
+        self.data = data
+        self.values = {key: convert(value) for key, value in data.items() if key}
+        self.pattern = _compile_tags(tuple(sorted(self.values)))
+
+    def find(self, text):
+        """Все вхождения меток в text (объекты re.Match, m.group() — метка)"""
+        if self.pattern is None or not text:
+            return []
+        return list(self.pattern.finditer(text))
+
+    def sub(self, text):
+        """Текст с подставленными значениями"""
+        if self.pattern is None or not text:
+            return text
+        return self.pattern.sub(lambda m: self.values[m.group()], text)
+
+    def split_runs(self, texts):
+        """
+        Разбивает тексты Runs на куски с учетом меток, разорванных между Runs.
+
+        :param texts: тексты Runs параграфа
+        :return: для каждого Run список (текст, метка или None); метка относится
+            к тому Run, в котором она начинается. None, если меток нет.
+        """
+        full_text = ''.join(texts)
+        matches = self.find(full_text)
+        if not matches:
+            return None
+
+        ends = []
+        position = 0
+        for text in texts:
+            position += len(text)
+            ends.append(position)
+        pieces = [[] for _ in texts]
+
+        def add_plain(start, end):
+            run_idx = bisect_right(ends, start)
+            while start < end:
+                chunk_end = min(end, ends[run_idx])
+                pieces[run_idx].append((full_text[start:chunk_end], None))
+                start = chunk_end
+                run_idx += 1
+
+        consumed = 0
+        for match in matches:
+            add_plain(consumed, match.start())
+            pieces[bisect_right(ends, match.start())].append((match.group(), match.group()))
+            consumed = match.end()
+        add_plain(consumed, len(full_text))
+        return pieces
+
+    def sub_runs(self, runs):
+        """
+        Заменяет метки в Runs, не меняя их форматирование.
+        Значение записывается в Run, где начинается метка.
+
+        :return: True, если была хотя бы одна замена
+        """
+        runs = list(runs)
+        pieces = self.split_runs([run.text for run in runs])
+        if pieces is None:
+            return False
+        for run, run_pieces in zip(runs, pieces):
+            new_text = ''.join(self.values[tag] if tag else text for text, tag in run_pieces)
+            if new_text != run.text:
+                run.text = new_text
+        return True
@@ -0,0 +1,194 @@
+"""
+Индекс шаблонов Word: где в документе находятся метки.
+
+Шаблон разбирается один раз. Для каждого параграфа, в котором есть метки
+(обычные и {{...}}) или единицы измерения, запоминается
+его положение. Индекс хранится на диске под именем шаблона вместе с хешем
+содержимого файла и словаря меток, поэтому при заполнении отчета обходятся
+только нужные параграфы.
+Таблица результатов, строки-метки и места изображений {{PictureN}} берутся
+из индекса якорей (docx_anchors), который строится при привязке к документу.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 3
+
+# То же выражение, что и в fix_units
+UNITS_PATTERN = re.compile(r'(кгс|г|м)([/ ]?[см]?)(2|3)')
+
+
+def _file_hash(path, vocabulary):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    digest.update(json.dumps([INDEX_VERSION, sorted(vocabulary)], ensure_ascii=False).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _iter_locations(doc):
+    """Параграфы документа в том же порядке, в каком их обходят функции замены меток"""
+    for p_idx, paragraph in enumerate(doc.paragraphs):
+        yield ["body", p_idx], paragraph
+    for t_idx, table in enumerate(doc.tables):
+        for r_idx, row in enumerate(table.rows):
+            for c_idx, cell in enumerate(row.cells):
+                for p_idx, paragraph in enumerate(cell.paragraphs):
+                    yield ["table", t_idx, r_idx, c_idx, p_idx], paragraph
+
+
+def compile_template(doc, vocabulary):
+    """
+    Строит индекс разобранного документа.
+
+    :param doc: docx.Document до заполнения
+    :param vocabulary: все метки, которые могут встретиться в шаблоне
+    :return: словарь, пригодный для сохранения в JSON
+    """
+    locations = []
+    for location, paragraph in _iter_locations(doc):
+        text = paragraph.text
+        tags = [tag for tag in vocabulary if tag in text]
+        units = bool(UNITS_PATTERN.search(text))
+        if tags or units:
+            locations.append({"loc": location, "tags": tags, "units": units})
+
+    return {
+        "version": INDEX_VERSION,
+        "vocabulary": sorted(vocabulary),
+        "locations": locations,
+    }
+
+
+class TemplateLocation:
+    """Параграф шаблона с найденными в нем метками"""
+
+    __slots__ = ("paragraph", "in_table", "col_idx", "tags", "units")
+
+    def __init__(self, paragraph, in_table, col_idx, tags, units):
+        self.paragraph = paragraph
+        self.in_table = in_table
+        self.col_idx = col_idx
+        self.tags = tags
+        self.units = units
+
+
+class BoundTemplateIndex:
+    """
+    Индекс, привязанный к конкретному объекту Document.
+
+    Параграфы запоминаются как объекты, а не номера, поэтому вставка строк
+    в таблицы и замена текста не сбивают индекс.
+    """
+
+    def __init__(self, doc, index):
+        from docx_anchors import AnchorIndex
+
+        self.vocabulary = frozenset(index["vocabulary"])
+        self.locations = []
+
+        paragraphs = doc.paragraphs
+        tables = doc.tables
+        rows_cache = {}
+        seen = set()
+        for entry in index["locations"]:
+            loc = entry["loc"]
+            if loc[0] == "body":
+                paragraph = paragraphs[loc[1]]
+                in_table, col_idx = False, None
+            else:
+                _, t_idx, r_idx, c_idx, p_idx = loc
+                if (t_idx, r_idx) not in rows_cache:
+                    rows_cache[(t_idx, r_idx)] = tables[t_idx].rows[r_idx].cells
+                paragraph = rows_cache[(t_idx, r_idx)][c_idx].paragraphs[p_idx]
+                in_table, col_idx = True, c_idx
+            # Объединенные ячейки python-docx возвращает несколько раз
+            if paragraph._p in seen:
+                continue
+            seen.add(paragraph._p)
+            self.locations.append(TemplateLocation(paragraph, in_table, col_idx, frozenset(entry["tags"]),
+                                                   entry["units"]))
+
+        self.anchors = AnchorIndex(doc)
+        self.results_table = self.anchors.table("results_table")
+
+    def covers(self, keys):
+        """Все ли метки известны индексу (иначе нужен полный обход документа)"""
+        return all(key in self.vocabulary for key in keys)
+
+    def tag_locations(self, keys=None):
+        """Параграфы, содержащие хотя бы одну из меток keys (по умолчанию — любую)"""
+        if keys is None:
+            return [location for location in self.locations if location.tags]
+        keys = set(keys)
+        return [location for location in self.locations if not location.tags.isdisjoint(keys)]
+
+    def unit_locations(self):
+        # После подстановки значений единицы измерения могут появиться в любом параграфе с метками
+        return [location for location in self.locations if location.units or location.tags]
+
+
+class TemplateIndexCache:
+    """
+    Кеш индексов шаблонов: в памяти и в JSON-файлах каталога cache_dir.
+
+    Запись хранится под именем файла шаблона вместе с хешем содержимого: измененный
+    шаблон (например, KVD_For_Killing.docx, который собирается для каждого задания)
+    заменяет свою запись, а не добавляет новую, поэтому кеш не растет.
+    """
+
+    def __init__(self, cache_dir, vocabulary):
+        self.cache_dir = cache_dir
+        self.vocabulary = list(dict.fromkeys(vocabulary))
+        self._memory = {}
+
+    def _cache_file(self, name):
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def _load(self, name, digest):
+        index = self._memory.get(name)
+        if index is not None and index.get("hash") == digest:
+            return index
+        try:
+            with open(self._cache_file(name), 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if index.get("version") != INDEX_VERSION or index.get("hash") != digest:
+            return None
+        self._memory[name] = index
+        return index
+
+    def _store(self, name, index):
+        self._memory[name] = index
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self._cache_file(name)}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f, ensure_ascii=False)
+            os.replace(tmp_path, self._cache_file(name))
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить индекс шаблона: {e}")
+
+    def get(self, template_path, doc):
+        """
+        Индекс шаблона, привязанный к doc.
+
+        :param template_path: файл, из которого загружен doc (по нему считается хеш)
+        :param doc: только что открытый docx.Document
+        """
+        name = os.path.basename(template_path)
+        digest = _file_hash(template_path, self.vocabulary)
+        index = self._load(name, digest)
+        if index is None:
+            logger.info(f"Построение индекса шаблона {name}")
+            index = compile_template(doc, self.vocabulary)
+            index["hash"] = digest
+            self._store(name, index)
+        return BoundTemplateIndex(doc, index)
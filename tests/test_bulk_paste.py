@@ -0,0 +1,69 @@
+import math
+
+import pytest
+
+from bulk_paste import convert_column, find_unsupported_value, parse_clipboard_table, parse_tsv_columns
+
+
+def per_cell_value(value):
+    """Преобразование значения при вставке по ячейкам (paste_data_to_excel)"""
+    value = value.strip()
+    try:
+        value = value.replace(',', '.') if ',' in value else value
+        return float(value) if value else None
+    except ValueError:
+        return value
+
+
+def same_value(expected, actual):
+    if isinstance(expected, float) and math.isnan(expected):
+        return isinstance(actual, float) and math.isnan(actual)
+    return expected == actual and type(expected) is type(actual)
+
+
+def test_timestamps_stay_text():
+    text = "01.10.2024   18:00:00\t101,5\n01.10.2024   19:00:00\t102\n"
+
+    dates, values = parse_clipboard_table(text, 2)
+    assert dates == ["01.10.2024   18:00:00", "01.10.2024   19:00:00"]
+    assert values == [101.5, 102.0]
+
+
+def test_commas_become_dots():
+    assert convert_column(["12,5", "-0,25", "1,5e3"]) == [12.5, -0.25, 1500.0]
+    # Как и при вставке по ячейкам, запятая заменяется и в текстовых значениях
+    assert convert_column(["1,234,5", "а,б"]) == ["1.234.5", "а.б"]
+
+
+def test_short_rows_are_padded_and_blank_lines_skipped():
+    text = "a\tb\tc\n\nd\n  \ne\tf\n"
+
+    assert parse_tsv_columns(text, 3) == [["a", "d", "e"], ["b", "", "f"], ["c", "", ""]]
+    assert parse_clipboard_table(text, 3)[2] == ["c", None, None]
+    assert parse_tsv_columns("\n \n", 2) == []
+
+
+def test_too_many_columns_raises():
+    with pytest.raises(ValueError, match="Ожидается 2, получено 3"):
+        parse_tsv_columns("1\t2\n3\t4\t5\n", 2)
+
+
+def test_unsupported_value_is_reported_whole():
+    assert find_unsupported_value("1\t2\n3\tзнач\U0001F600ение\n") == "знач\U0001F600ение"
+    assert find_unsupported_value("1\t2\n") is None
+
+
+def test_bulk_conversion_matches_per_cell_paste():
+    samples = [
+        "1", "12,5", " 3.25 ", "-4", "1e3", "1E-2", "+7", ".5", "5.", "nan", "inf", "-inf",
+        "1_000", "0x10", "", "  ", "01.10.2024   18:00:00", "18:00", "abc", "1,234,5", "1 000", "٣",
+    ]
+    rows = [[samples[(row + column) % len(samples)] for column in range(3)] for row in range(len(samples))]
+    text = '\n'.join('\t'.join(row) for row in rows)
+
+    columns = parse_clipboard_table(text, 3)
+
+    for row_idx, row in enumerate(rows):
+        for column, value in enumerate(row):
+            expected = per_cell_value(value)
+            assert same_value(expected, columns[column][row_idx]), (value, expected, columns[column][row_idx])
@@ -0,0 +1,56 @@
+from docx import Document
+
+from docx_anchors import AnchorIndex
+from docx_tables import Column, insert_table
+
+
+def build_document():
+    doc = Document()
+    doc.add_paragraph("Рисунок {{Picture1}}")
+    doc.add_paragraph("Протокол результатов исследования")
+    results = doc.add_table(rows=3, cols=2)
+    results.cell(0, 0).text = "Параметр"
+    results.cell(1, 0).text = "Проницаемость, (мД)"
+    results.cell(2, 0).text = "{{Table1}}"
+    doc.add_paragraph("Прогноз {{Prognoz_Ppl}}")
+    return doc, results
+
+
+def test_tables_rows_and_placeholders_are_found():
+    doc, results = build_document()
+    anchors = AnchorIndex(doc)
+
+    assert anchors.table("results_table")._tbl is results._tbl
+    assert anchors.table("results_table") is anchors.table("results_table")
+    assert anchors.table("missing") is None
+    assert anchors.row("permeability_row") is results.rows[1]._tr
+
+    (picture, in_table), = anchors.placeholders("{{Picture1}}")
+    assert picture.text == "Рисунок {{Picture1}}" and not in_table
+    assert anchors.row_of(picture._p) is None
+
+    (cell_paragraph, in_table), = anchors.placeholders("{{Table1}}")
+    assert in_table
+    assert anchors.row_of(cell_paragraph._p) is results.rows[2]._tr
+    assert anchors.placeholders("{{Picture2}}") == []
+
+
+def test_insert_table_through_anchors():
+    doc, results = build_document()
+    anchors = AnchorIndex(doc)
+    columns = [Column("Параметр", 0), Column("Значение", 1)]
+
+    table = insert_table(doc, "{{Table1}}", [["Скин-фактор", "1.5"], ["Рпл", "250"]], columns, anchors=anchors)
+
+    assert table._tbl is results._tbl
+    assert len(table.rows) == 4
+    assert [row.cells[0].text for row in table.rows] == ["Параметр", "Проницаемость, (мД)", "Скин-фактор", "Рпл"]
+    # Использованная метка забыта индексом, повторная вставка ничего не делает
+    assert anchors.placeholders("{{Table1}}") == []
+    assert insert_table(doc, "{{Table1}}", [], columns, anchors=anchors) is None
+
+    table = insert_table(doc, "{{Prognoz_Ppl}}", [["01.10.2024", "100"]], columns, anchors=anchors)
+    assert len(table.rows) == 2
+    assert doc.paragraphs[-1].text == "Прогноз "
+    # Якоря, не затронутые вставкой, остаются верными
+    assert anchors.row("permeability_row") is results.rows[1]._tr
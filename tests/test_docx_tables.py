@@ -0,0 +1,69 @@
+from datetime import datetime
+
+from docx import Document
+
+from docx_tables import Column, format_date, format_number, insert_table
+
+COLUMNS = [
+    Column("Дата", 0, format_date()),
+    Column("Рпл, кгс/см2", 1, format_number(1)),
+]
+
+ROWS = [
+    (datetime(2024, 10, 1, 18, 0), 101.24),
+    ("02.10.2024 06:30:00", 99.96),
+    (None, None),
+    ("03.10.2024", "<нет & данных>"),
+]
+
+
+def table_texts(table):
+    return [[cell.text for cell in row.cells] for row in table.rows]
+
+
+def test_placeholder_in_paragraph_becomes_new_table():
+    doc = Document()
+    doc.add_paragraph("Прогноз давления {{Prognoz_Ppl}}")
+
+    table = insert_table(doc, "{{Prognoz_Ppl}}", ROWS, COLUMNS)
+
+    # Заголовок + строки данных, полностью пустая строка пропущена
+    assert len(table.rows) == 4
+    assert table_texts(table) == [
+        ["Дата", "Рпл, кгс/см2"],
+        ["01.10.2024", "101.2"],
+        ["02.10.2024", "100.0"],
+        ["03.10.2024", ""],
+    ]
+    assert "{{Prognoz_Ppl}}" not in "".join(p.text for p in doc.paragraphs)
+    assert doc.paragraphs[0].text == "Прогноз давления "
+    # Таблица вставлена сразу после абзаца метки
+    assert doc.paragraphs[0]._p.getnext() is table._tbl
+
+
+def test_placeholder_in_template_row_is_replaced_by_rows():
+    doc = Document()
+    template = doc.add_table(rows=2, cols=2)
+    template.cell(0, 0).text = "Дата"
+    template.cell(0, 1).text = "Давление"
+    template.cell(1, 0).paragraphs[0].add_run("{{Table1}}").bold = True
+
+    rows = [["01.10.2024", "1 < 2 & 3"], ["02.10.2024", "строка\nвторая"]]
+    table = insert_table(doc, "{{Table1}}", rows, [Column("Дата", 0), Column("Давление", 1)])
+
+    assert table._tbl is template._tbl
+    assert len(table.rows) == 3
+    assert table_texts(table) == [["Дата", "Давление"], ["01.10.2024", "1 < 2 & 3"], ["02.10.2024", "строка\nвторая"]]
+    # Оформление образца переходит в строки данных
+    assert table.cell(1, 0).paragraphs[0].runs[0].bold
+    assert table.cell(2, 0).paragraphs[0].runs[0].bold
+    assert not table.cell(2, 1).paragraphs[0].runs[0].bold
+    assert "{{Table1}}" not in "".join(cell.text for row in table.rows for cell in row.cells)
+
+
+def test_missing_placeholder():
+    doc = Document()
+    doc.add_paragraph("Без меток")
+
+    assert insert_table(doc, "{{Prognoz_Ppl}}", ROWS, COLUMNS) is None
+    assert len(doc.tables) == 0
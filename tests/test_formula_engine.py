@@ -0,0 +1,72 @@
+import os
+
+import pytest
+from openpyxl import Workbook
+
+from formula_engine import NA, FormulaEvaluator, check_against_cached_values
+from report_schema import extract_report_data
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPORT_WITH_CACHE = os.path.join(ROOT, "Report1.xlsx")
+
+
+def make_workbook(tmp_path, cells):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "current"
+    for address, value in cells.items():
+        ws[address] = value
+    path = tmp_path / "book.xlsx"
+    wb.save(path)
+    return str(path)
+
+
+def test_index_row_zero_uses_implicit_intersection(tmp_path):
+    # Как C39: =INDEX(Z:Z,COUNTA(Z:Z)) при пустом столбце Z
+    path = make_workbook(tmp_path, {"C39": "=INDEX(Z:Z,COUNTA(Z:Z))", "C40": "=INDEX(D:D,0)", "D40": 5})
+    evaluator = FormulaEvaluator(path)
+    assert evaluator.evaluate("C39") == 0
+    assert evaluator.evaluate("C40") == 5
+
+
+def test_reference_to_blank_cell_gives_zero(tmp_path):
+    path = make_workbook(tmp_path, {"B64": "=VLOOKUP(A64,$D$1:$F$10,2,FALSE)", "B65": "=E1", "A64": "x",
+                                    "D2": "x"})
+    evaluator = FormulaEvaluator(path)
+    assert evaluator.evaluate("B64") == 0
+    assert evaluator.evaluate("B65") == 0
+
+
+def test_approximate_vlookup_with_text_header(tmp_path):
+    # Как C43: столбец Q — заголовок и отметки времени текстом
+    cells = {"Q1": "Абсолютное время", "R1": "Давление"}
+    for row, (stamp, value) in enumerate([("01.10.2024   18:42:05", 1.5),
+                                          ("02.10.2024   18:42:05", 2.5),
+                                          ("03.10.2024   18:42:05", 3.5)], start=2):
+        cells[f"Q{row}"] = stamp
+        cells[f"R{row}"] = value
+    cells["C1"] = "02.10.2024   20:00:00"
+    cells["C2"] = "00.00.0000"
+    cells["C43"] = "=VLOOKUP(C1,Q:R,2,TRUE)"
+    cells["C44"] = "=VLOOKUP(C2,Q:R,2,TRUE)"
+    evaluator = FormulaEvaluator(make_workbook(tmp_path, cells))
+    assert evaluator.evaluate("C43") == 2.5
+    assert evaluator.evaluate("C44") == NA
+
+
+def test_error_value_falls_back_to_default():
+    schema = {"fields": [
+        {"tag": "P22_zab_vnk", "cell": "A1", "type": "number", "round": 2, "default": 0},
+        {"tag": "well", "cell": "B1", "type": "raw"},
+        {"tag": "Phi", "cell": "C1", "type": "number", "round": 2, "strict": True},
+        {"tag": "Leff1", "type": "context", "default": 0},
+    ]}
+    ref_error = -2146826265
+    data = extract_report_data({"A1": ref_error, "B1": -2146826246, "C1": 0.123}, schema,
+                               context={"Leff1": -2146826246})
+    assert data == {"P22_zab_vnk": 0, "well": "", "Phi": 0.12, "Leff1": 0}
+
+
+@pytest.mark.skipif(not os.path.exists(REPORT_WITH_CACHE), reason="нет книги с сохраненными значениями")
+def test_report_block_matches_cached_values():
+    assert check_against_cached_values(REPORT_WITH_CACHE) == []
@@ -0,0 +1,98 @@
+import json
+import os
+
+import pytest
+
+from model_registry import is_empty_result, load_model_registry
+
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_registry.json")
+REGISTRY = load_model_registry(REGISTRY_PATH)
+with open(REGISTRY_PATH, 'r', encoding='utf-8') as f:
+    MODEL_NAMES = [model["name"] for model in json.load(f)["models"]]
+
+
+def baseline_params(data):
+    """Дополнительные параметры моделей в том виде, как они были записаны в generate_report_logic"""
+    return {
+        "Вертикальная": [],
+        "Наклонн.": [],
+        "Вертикальная - частичное вскрытие": [
+            {"name": "Скин-фактор механический", "value": data.get("S_мех1"), "key": "S_мех1"},
+            {"name": "Скин-фактор геометрический", "value": data.get("S_геом1"), "key": "S_геом1"},
+            {"name": "Эффективная часть интервала перфорации (hw), (м)", "value": data.get("Leff1"), "key": "Leff1"},
+        ],
+        "Горизонтальн.": [
+            {"name": "Скин-фактор механический", "value": data.get("S_мех1"), "key": "S_мех1"},
+            {"name": "Эффективная длина скважины, (м)", "value": data.get("Leff1"), "key": "Leff1"},
+        ],
+        "Горизонтальная с ГРП": [
+            {"name": "Скин-фактор механический", "value": data.get("S_мех1"), "key": "S_мех1"},
+            {"name": "Количество трещин", "value": data.get("num_frac1"), "key": "num_frac1"},
+            {"name": "Полудлина трещины, (м)", "value": data.get("Xf1"), "key": "Xf1"},
+        ],
+        "Трещина - бесконечная проводимость": [
+            {"name": "Скин кольматации стенок трещины", "value": data.get("S_мех1"), "key": "S_мех1"},
+            {"name": "Полудлина трещины, (м)", "value": data.get("Xf1"), "key": "Xf1"},
+        ],
+        "Трещина - конечная проводимость": [
+            {"name": "Скин кольматации стенок трещины", "value": data.get("S_мех1"), "key": "S_мех1"},
+            {"name": "Полудлина трещины, (м)", "value": data.get("Xf1"), "key": "Xf1"},
+            {"name": "Проводимость трещины, (Fc)", "value": data.get("Fc1"), "key": "Fc1"},
+        ],
+        "Трещина - равномерный поток": [
+            {"name": "Скин кольматации стенок трещины", "value": data.get("S_мех1"), "key": "S_мех1"},
+            {"name": "Полудлина трещины, (м)", "value": data.get("Xf1"), "key": "Xf1"},
+        ],
+    }
+
+
+def baseline_row_removed(cell_value):
+    """Проверка строки таблицы результатов из исходного remove_zero_rows"""
+    try:
+        num_value = float(cell_value.replace(',', '.'))
+        return num_value == 0 or num_value < -1000
+    except ValueError:
+        return cell_value in ("0", "0.0", "0,00", "-", "-2146826252")
+
+
+def baseline_model_name(cell_value, names):
+    for key in names:
+        if cell_value.strip().lower() == key.strip().lower():
+            return key
+    for key in names:
+        if key.strip().lower() in cell_value.strip().lower():
+            return key
+    return "Вертикальная"
+
+
+FILLED = {"S_мех1": 1.25, "S_геом1": -3.5, "Leff1": 250, "num_frac1": 4, "Xf1": 85, "Fc1": 12.3456}
+EMPTY = {"S_мех1": 0, "S_геом1": "-", "Leff1": -2146826246, "num_frac1": 0.0, "Xf1": "0,00", "Fc1": -2146826252}
+MIXED = {"S_мех1": "-0.5", "S_геом1": 0, "Leff1": "", "Xf1": -999.5, "Fc1": "нет данных"}
+
+
+def test_registry_describes_all_baseline_models():
+    assert MODEL_NAMES == list(baseline_params({}))
+    assert REGISTRY.default == "Вертикальная"
+
+
+@pytest.mark.parametrize("name", MODEL_NAMES)
+@pytest.mark.parametrize("data", [FILLED, EMPTY, MIXED], ids=["filled", "empty", "mixed"])
+def test_result_rows_match_baseline(name, data):
+    expected = [(param["name"], str(param["value"])) for param in baseline_params(data)[name]
+                if not baseline_row_removed(str(param["value"]).strip())]
+
+    assert REGISTRY.result_rows(name, data) == expected
+
+
+@pytest.mark.parametrize("text", ["0", "0.0", "0,00", "-", "-2146826252", "-2146826246", " 0 ", "-1000.5",
+                                  "1.25", "-999", "None", "", "нет данных", "1,5"])
+def test_is_empty_result_matches_baseline(text):
+    assert is_empty_result(text) == baseline_row_removed(text.strip())
+
+
+@pytest.mark.parametrize("value", MODEL_NAMES + [
+    "  вертикальная  ", "ГОРИЗОНТАЛЬНАЯ С ГРП", "Наклонн. скважина", "Трещина - конечная проводимость (2)",
+    "Горизонтальная", "Неизвестная модель", "None",
+])
+def test_resolve_matches_baseline(value):
+    assert REGISTRY.resolve(value) == baseline_model_name(value, MODEL_NAMES)
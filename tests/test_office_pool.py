@@ -0,0 +1,123 @@
+import threading
+
+import pytest
+
+from background_jobs import JobExecutor
+from office_pool import FakeBackend, OfficePool
+
+
+class FakeRoot:
+    """Заменяет Tk: опрос очереди событий исполнителю в тестах не нужен"""
+
+    def after(self, delay, callback):
+        pass
+
+
+def run_in_thread(function):
+    thread = threading.Thread(target=function)
+    thread.start()
+    thread.join()
+
+
+def lease_once(pool, *kinds):
+    for kind in kinds:
+        with pool.lease(kind):
+            pass
+
+
+def test_instance_is_reused_and_recycled_after_max_jobs():
+    backend = FakeBackend()
+    pool = OfficePool(backend, max_jobs=2)
+    apps = []
+    for _ in range(3):
+        with pool.lease("excel") as app:
+            apps.append(app)
+
+    assert apps[0] is apps[1]
+    assert apps[2] is not apps[0]
+    assert [instance.pid for instance in backend.started] == [10000, 10001]
+    assert backend.stopped == [backend.started[0]]
+    assert pool.pids() == [10001]
+
+
+def test_instance_is_recycled_after_error():
+    backend = FakeBackend()
+    backend.fail_paths.add("broken.xlsx")
+    pool = OfficePool(backend)
+
+    with pytest.raises(OSError):
+        with pool.workbook("broken.xlsx"):
+            pass
+    assert backend.stopped == [backend.started[0]]
+    assert pool.pids() == []
+
+    with pytest.raises(ValueError):
+        with pool.workbook("book.xlsx", save=True) as workbook:
+            raise ValueError("ошибка в аренде")
+    # Книга закрыта без сохранения, экземпляр остановлен
+    assert workbook.closed and not workbook.saved
+    assert len(backend.stopped) == 2
+
+    with pool.workbook("book.xlsx", save=True) as workbook:
+        pass
+    assert workbook.saved
+    assert pool.pids() == [backend.started[2].pid]
+
+
+def test_dead_instance_is_replaced():
+    backend = FakeBackend()
+    pool = OfficePool(backend)
+    with pool.lease("word") as app:
+        pass
+    app.crashed = True
+
+    with pool.lease("word") as new_app:
+        assert new_app is not app
+    assert backend.stopped == [backend.started[0]]
+    assert pool.pids() == [backend.started[1].pid]
+
+
+def test_pids_are_tracked_per_thread_and_kind():
+    backend = FakeBackend()
+    pool = OfficePool(backend)
+
+    lease_once(pool, "excel", "word")
+    run_in_thread(lambda: lease_once(pool, "excel", "word"))
+
+    assert sorted(pool.pids()) == [10000, 10001, 10002, 10003]
+    pool.close()
+    assert pool.pids() == []
+
+
+def test_close_thread_stops_only_own_instances():
+    backend = FakeBackend()
+    pool = OfficePool(backend)
+    lease_once(pool, "excel")
+    run_in_thread(lambda: lease_once(pool, "excel"))
+    main_instance, worker_instance = backend.started
+
+    pool.close_thread()
+    assert backend.stopped == [main_instance]
+    assert pool.pids() == [worker_instance.pid]
+
+    # Экземпляр чужого потока не закрывается через Quit, а завершается по PID
+    pool.close()
+    assert backend.killed == [worker_instance]
+    assert pool.pids() == []
+
+
+def test_executor_shutdown_closes_instances_in_their_threads():
+    backend = FakeBackend()
+    pool = OfficePool(backend)
+    jobs = JobExecutor(FakeRoot(), lanes=("workbook", "report"))
+
+    def convert(job):
+        with pool.document("report.docx"):
+            pass
+
+    jobs.submit("report", "Отчет", convert).future.result()
+    jobs.shutdown(wait=True, finalizer=pool.close_thread)
+
+    assert backend.stopped == backend.started
+    assert backend.killed == []
+    assert pool.pids() == []
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+import pytest
+from openpyxl import Workbook
+
+from formula_engine import FormulaEvaluator
+from pressure_series import calculate_pressure_deltas, read_pressure_columns
+
+
+@pytest.fixture
+def pressure_workbook(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "current"
+    ws["B12"] = 40
+    ws["Q1"] = "Абсолютное время"
+    ws["R1"] = "Давление"
+    start = datetime(2024, 10, 1, 18, 0, 0)
+    for row in range(2, 60):
+        moment = start + timedelta(hours=row - 2)
+        ws.cell(row=row, column=17, value=moment.strftime("%d.%m.%Y   %H:%M:%S"))
+        ws.cell(row=row, column=18, value=100 + row * 0.5)
+    path = tmp_path / "Report.xlsx"
+    wb.save(path)
+    return str(path)
+
+
+def test_loaded_sheet_gives_same_columns_as_file(pressure_workbook):
+    from_file = read_pressure_columns(pressure_workbook)
+    from_sheet = read_pressure_columns(pressure_workbook, evaluator=FormulaEvaluator(pressure_workbook))
+
+    assert from_sheet[0] == from_file[0] == 40
+    # В файле строки могут идти дальше последнего значения — сравниваем заполненную часть
+    assert from_sheet[1] == from_file[1][:len(from_sheet[1])]
+    assert from_sheet[2] == from_file[2][:len(from_sheet[2])]
+
+
+def test_deltas_from_loaded_sheet(pressure_workbook):
+    windows = {"1h": timedelta(hours=1), "24h": timedelta(days=1)}
+    expected = calculate_pressure_deltas(pressure_workbook, windows=windows)
+    actual = calculate_pressure_deltas(pressure_workbook, windows=windows,
+                                       evaluator=FormulaEvaluator(pressure_workbook))
+    assert actual == expected
+    assert None not in expected.values()
@@ -0,0 +1,175 @@
+import os
+
+import pytest
+
+from formula_engine import EvaluatedSheet
+from report_schema import (
+    _default, convert_to_datetime, extract_report_data, is_error_value, load_field_schema, read_sheet_block,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPORT_PATH = os.path.join(ROOT, "Report1.xlsx")
+SCHEMA = load_field_schema(os.path.join(ROOT, "report_fields.json"))
+
+
+def baseline_data(v, result_day):
+    """Словарь data в том виде, как он был записан литералом в generate_report_logic"""
+    if v('B66') == "Горизонтальная с ГРП":
+        Leff1 = round(v('B118')) if v('B118') else 0
+    else:
+        Leff1 = round(v('B84')) if v('B84') else 0
+
+    KVD_density = round(v('A20'), 3) if v('A20') else 0
+    work_density = round(v('A19'), 3) if v('A19') else 0
+    if v('A19') is None:
+        density = f'{KVD_density} г/см3'
+    else:
+        density = f'{KVD_density} г/см3 для пересчета участка КВД и {work_density} г/см3 - для пересчета цикла отработки скважины'
+
+    return {
+        "company": v('B1'),
+        "field": v('B2'),
+        "well": v('B3'),
+        "VNK": str(v('B4')) if v('B4') is not None else "",
+        "date_research": convert_to_datetime(v('B5')).strftime("%d.%m.%Y") if v('B5') else "",
+        "date_researcf": convert_to_datetime(v('C5')).strftime("%d.%m.%Y") if v('C5') else "",
+        "formation": v('B6'),
+        "Plast1_H": v('C6'),
+        "Plast2_H": v('C7'),
+        "Plast3_H": v('C8'),
+        "Plast4_H": v('C9'),
+        "perforation_interval": str(v('B7')) if v('B7') is not None else "",
+        "device": v('B8'),
+        "depth": v('B9'),
+        "interpreter": v('B10'),
+        "date_of_interpretation": convert_to_datetime(v('C11')).strftime(
+            "%d.%m.%Y") if v('C11') else "",
+        "date_of_analiz": convert_to_datetime(v('B11')).strftime("%d.%m.%Y") if v('B11') else "",
+        "time": v('B12'),
+        "water": v('B13'),
+        "packer": v('B14'),
+        "date_GRP": convert_to_datetime(v('B15')).strftime(
+            "%d.%m.%Y") if convert_to_datetime(
+            v('B15')) else "",
+        "type_of_research": v('B16'),
+        "H_eff": v('B46'),
+        "P_pl_zam": round(v('B35'), 1) if v('B35') else 0,
+        "P_pl_vdp": round(v('B36'), 1) if v('B36') else 0,
+        "P_pl_вдп2": round(v('C36'), 1) if v('C36') else 0,
+        "P_pl_gnk": round(v('B37'), 1) if v('B37') else 0,
+        "P_pl_vnk": round(v('B38'), 1) if v('B38') else 0,
+        "P_pl_внк2": round(v('C38'), 1) if v('C38') else 0,
+        "P_pl_внк3": round(v('C30'), 1) if v('C30') else 0,
+        "P_pl_внк4": round(v('C35'), 1) if v('C35') else 0,
+        "Durat": round(v('J4')) if v('J4') else 0,
+        "duration": round(v('B12')) if v('B12') else 0,
+        "density": density,
+        "Qoil": round(v('B20'), 1) if v('B20') else 0,
+        "klass": round(v('C14')) if v('C14') else 0,
+        "success": round(v('C16')) if v('C16') else 0,
+        "P_zab_zam": round(v('B39'), 1) if v('B39') else 0,
+        "P_zab_vdp": round(v('B40'), 1) if v('B40') else 0,
+        "P_zab_gnk": round(v('B41'), 1) if v('B41') else 0,
+        "P1_zab_vnk": round(v('B42'), 1) if v('B42') else 0,
+        "P1_zab_vn2": round(v('C42'), 1) if v('C42') else 0,
+        "P2_zab_vnk": round(v('B43'), 1) if v('B43') else 0,
+        "productivity": round(v('C19'), 2) if v('C19') else 0,
+        "Kh/Mu": round(v('B49'), 2) if v('B49') else 0,
+        "delta": abs(round(v('B23'), 1)) if v('B23') else 0,
+        "Phi": round(v('B62'), 2),
+        "model": v('B66'),
+        "plast": v('B67'),
+        "layer": v('B68'),
+        "Cs": round(v('B73'), 4) if v('B73') else 0,
+        "integ_skin1": round(v('B74'), 2) if v('B74') else 0,
+        "integ_skin2": round(v('C74'), 2) if v('C74') else 0,
+        "permeability1": round(v('B90'), 2) if v('B90') else 0,
+        "Delta Q": round(v('B100'), 1) if v('B100') else 0,
+        "B_oil": round(v('B113'), 2) if v('B113') else 0,
+        "viscosity": round(v('B114'), 3) if v('B114') else 0,
+        "Compressibility": f"{float(v('B115')):.1E}" if v('B115') else "0",
+        "num_frac1": round(v('B120')) if v('B120') else 0,
+        "num_frac2": round(v('C120')) if v('C120') else 0,
+        "Xf1": round(v('B121')) if v('B121') else 0,
+        "Xf2": round(v('C121')) if v('C121') else 0,
+        "permeability2": round(v('C90'), 2) if v('C90') else 0,
+        "S_мех1": round(float(v('B81')), 2) if isinstance(v('B81'), (int, float)) or (
+            isinstance(v('B81'), str) and v('B81').replace('.', '', 1).isdigit()) else 0,
+        "S_мех2": round(float(v('C81')), 2) if isinstance(v('C81'), (int, float)) or (
+            isinstance(v('C81'), str) and v('C81').replace('.', '', 1).isdigit()) else 0,
+        "S_геом1": round(float(v('B82')), 2) if isinstance(v('B82'), (int, float)) or (
+            isinstance(v('B82'), str) and v('B82').replace('.', '', 1).isdigit()) else 0,
+        "S_геом2": round(float(v('C82')), 2) if isinstance(v('C82'), (int, float)) or (
+            isinstance(v('C82'), str) and v('C82').replace('.', '', 1).isdigit()) else 0,
+        "P1_2500": round(v('AF1'), 1) if v('AF1') else 0,
+        "P1_8760": round(v('AF2'), 1) if v('AF2') else 0,
+        "P1_17500": round(v('AF3'), 1) if v('AF3') else 0,
+        "P1_26280": round(v('AF4'), 1) if v('AF4') else 0,
+        "P2_2500": round(v('AF5'), 1) if v('AF5') else 0,
+        "P2_8760": round(v('AF6'), 1) if v('AF6') else 0,
+        "P2_17500": round(v('AF7'), 1) if v('AF7') else 0,
+        "P2_26280": round(v('AF8'), 1) if v('AF8') else 0,
+        "Pday": round(result_day, 2) if result_day is not None else 0.0,
+        "Leff1": Leff1,
+        "Leff2": round(v('C84')) if v('C84') else 0,
+        "Pzb_dlta": round(v('C44'), 2) if v('C44') else 0,
+        "R_inv1": round(v('B106'), 2) if v('B106') else 0,
+        "R_inv2": round(v('C106'), 2) if v('C106') else 0,
+        "dens1": work_density,
+        "dens2": KVD_density,
+        "P_asa": round(v('B137'), 1) if v('B137') else 0,
+        "Tzakr": round(v('B127'), 2) if v('B127') else 0,
+        "Pzakr": round(v('B128'), 1) if v('B128') else 0,
+        "ISIIP": round(v('B129'), 1) if v('B129') else 0,
+        "Frac_eff": round(v('B131'), 2) if v('B131') else 0,
+        "Mobil": round(v('B139'), 1) if v('B139') else 0,
+        "Pi_1": round(v('B77'), 2) if v('B77') else 0,
+        "Pi_2": round(v('C77'), 2) if v('C77') else 0,
+        "Pi_12": round(v('C25'), 2) if v('C25') else 0,
+        "P22_zab_vnk": round(v('C39'), 2) if v('C39') else 0,
+        "P2_asa": round(v('C137'), 2) if v('C137') else 0,
+        "Rinv_Ppl1": round(v('B140')) if v('B140') else 0,
+        "µгаза1": round(v('B141'), 4) if v('B141') else 0,
+        "Bg1": round(v('B142'), 4) if v('B142') else 0,
+        "µгаза2": round(v('C141'), 4) if v('C141') else 0,
+        "Bg2": round(v('C142'), 4) if v('C142') else 0,
+        "fluid": v('B58'),
+        "Fc1": round(v('B144'), 4) if v('B144') else 0,
+    }
+
+
+@pytest.fixture(scope="module")
+def report_block():
+    if not os.path.exists(REPORT_PATH):
+        pytest.skip("нет Report1.xlsx")
+    sheet = EvaluatedSheet(REPORT_PATH, "current")
+    return read_sheet_block(sheet, SCHEMA["block"])
+
+
+def test_schema_matches_baseline_field_dict(report_block):
+    result_day = 1.234
+    expected = baseline_data(lambda address: report_block[address], result_day)
+
+    if report_block['B66'] == "Горизонтальная с ГРП":
+        Leff1 = round(report_block['B118']) if report_block['B118'] else 0
+    else:
+        Leff1 = round(report_block['B84']) if report_block['B84'] else 0
+    context = {
+        "density": expected["density"],
+        "Pday": round(result_day, 2),
+        "Leff1": Leff1,
+        "dens1": expected["dens1"],
+        "dens2": expected["dens2"],
+    }
+    data = extract_report_data(report_block, SCHEMA, context)
+
+    assert list(data) == list(expected)
+    fields = {field["tag"]: field for field in SCHEMA["fields"]}
+    errors = [tag for tag, field in fields.items() if "cell" in field and is_error_value(report_block[field["cell"]])]
+    # В Report1.xlsx есть ячейки с ошибками — для них вместо кода ошибки ставится значение по умолчанию
+    assert errors
+    for tag, value in expected.items():
+        if tag in errors:
+            assert data[tag] == _default(fields[tag]), tag
+        else:
+            assert data[tag] == value, tag
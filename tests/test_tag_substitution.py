@@ -0,0 +1,51 @@
+from docx import Document
+
+from tag_substitution import TagSubstituter
+
+
+def paragraph_with_runs(*texts):
+    paragraph = Document().add_paragraph()
+    for text in texts:
+        paragraph.add_run(text)
+    return paragraph
+
+
+def test_longest_tag_wins_over_its_prefix():
+    substituter = TagSubstituter({"P_pl_vnk": 1, "P_pl_vnk2": 2, "P_pl": 3})
+
+    assert substituter.sub("P_pl_vnk2; P_pl_vnk; P_pl") == "2; 1; 3"
+    assert [m.group() for m in substituter.find("P_pl_vnk2 P_pl_vnkX")] == ["P_pl_vnk2", "P_pl_vnk"]
+
+
+def test_values_are_not_rescanned():
+    substituter = TagSubstituter({"well": "field", "field": "Заполярное"})
+
+    assert substituter.sub("well / field") == "field / Заполярное"
+
+
+def test_unknown_tags_are_left_intact():
+    substituter = TagSubstituter({"well": 101})
+
+    assert substituter.sub("скважина well, пласт formation") == "скважина 101, пласт formation"
+    assert substituter.split_runs(["пласт ", "formation"]) is None
+    assert TagSubstituter({}).sub("well") == "well"
+
+
+def test_tag_split_across_runs():
+    substituter = TagSubstituter({"P_pl_vnk2": 250.5, "well": 101})
+    paragraph = paragraph_with_runs("Давление P_pl", "_vn", "k2 МПа, скв. ", "well")
+    paragraph.runs[1].bold = True
+
+    assert substituter.sub_runs(paragraph.runs)
+    # Значение записано в Run, где метка начинается, остальные части метки удалены
+    assert [run.text for run in paragraph.runs] == ["Давление 250.5", "", " МПа, скв. ", "101"]
+    assert paragraph.text == "Давление 250.5 МПа, скв. 101"
+    assert paragraph.runs[1].bold
+
+
+def test_runs_without_tags_are_untouched():
+    substituter = TagSubstituter({"well": 101})
+    paragraph = paragraph_with_runs("без ", "меток")
+
+    assert not substituter.sub_runs(paragraph.runs)
+    assert [run.text for run in paragraph.runs] == ["без ", "меток"]
@@ -0,0 +1,75 @@
+import os
+
+import pytest
+from docx import Document
+
+import template_index
+from template_index import TemplateIndexCache
+
+VOCABULARY = ["well", "field", "Pday"]
+
+
+@pytest.fixture
+def compiled(monkeypatch):
+    """Имена шаблонов, для которых индекс строился заново (промахи кеша)"""
+    calls = []
+    compile_template = template_index.compile_template
+
+    def counting(doc, vocabulary):
+        calls.append(doc.paragraphs[0].text)
+        return compile_template(doc, vocabulary)
+
+    monkeypatch.setattr(template_index, "compile_template", counting)
+    return calls
+
+
+def make_template(path, text):
+    doc = Document()
+    doc.add_paragraph(text)
+    doc.add_paragraph("Давление Pday кгс/см2")
+    doc.save(path)
+    return str(path)
+
+
+def cached(cache, path):
+    return cache.get(path, Document(path))
+
+
+def test_hit_after_miss_in_memory_and_on_disk(tmp_path, compiled):
+    template = make_template(tmp_path / "KSD.docx", "Скважина well")
+    cache = TemplateIndexCache(str(tmp_path / "cache"), VOCABULARY)
+
+    index = cached(cache, template)
+    assert compiled == ["Скважина well"]
+    assert [sorted(location.tags) for location in index.tag_locations()] == [["well"], ["Pday"]]
+
+    cached(cache, template)
+    # Новый экземпляр кеша (другой процесс) читает индекс с диска
+    cached(TemplateIndexCache(str(tmp_path / "cache"), VOCABULARY), template)
+    assert compiled == ["Скважина well"]
+
+    # Другой словарь меток — другой индекс
+    cached(TemplateIndexCache(str(tmp_path / "cache"), VOCABULARY + ["VNK"]), template)
+    assert len(compiled) == 2
+
+
+def test_regenerated_template_replaces_its_entry(tmp_path, compiled):
+    cache_dir = tmp_path / "cache"
+    cache = TemplateIndexCache(str(cache_dir), VOCABULARY)
+    other = make_template(tmp_path / "KSD.docx", "Скважина well")
+    cached(cache, other)
+
+    for job in range(3):
+        work_dir = tmp_path / f"job{job}"
+        os.makedirs(work_dir)
+        template = make_template(work_dir / "KVD_For_Killing.docx", f"Задание {job}: field")
+        assert cached(cache, template).tag_locations(["field"])
+
+    assert compiled == ["Скважина well", "Задание 0: field", "Задание 1: field", "Задание 2: field"]
+    # На каждое имя шаблона — одна запись в памяти и один файл
+    assert sorted(cache._memory) == ["KSD.docx", "KVD_For_Killing.docx"]
+    assert sorted(os.listdir(cache_dir)) == ["KSD.docx.json", "KVD_For_Killing.docx.json"]
+
+    cached(cache, other)
+    cached(cache, template)
+    assert len(compiled) == 4
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+from openpyxl import Workbook
+
+from well_history import DATE_COLUMN, HEADER_ROWS, WELL_COLUMN, WellHistoryStore
+
+
+def make_history(path, rows):
+    wb = Workbook()
+    ws = wb.active
+    for row in range(1, HEADER_ROWS + 1):
+        ws.cell(row=row, column=1, value=f"шапка {row}")
+    ws.append([WELL_COLUMN, DATE_COLUMN, "Рпл  на ВНК, кгс/см2"])
+    for row in rows:
+        ws.append(list(row))
+    wb.save(path)
+    return str(path)
+
+
+def test_blank_test_date_is_not_the_latest(tmp_path):
+    # Пустая ячейка в столбце дат pandas читает как NaT
+    table = make_history(tmp_path / "Итоговая таблица_Тест.xlsx", [
+        ("101", datetime(2023, 5, 1), 210.5),
+        ("101", None, 199.0),
+        ("101", datetime(2024, 2, 10), 205.0),
+        ("102", datetime(2022, 1, 1), 180.0),
+    ])
+    store = WellHistoryStore(str(tmp_path / "history.sqlite"))
+    try:
+        latest = store.latest_test(table, "101")
+        assert latest[DATE_COLUMN] == datetime(2024, 2, 10)
+        assert latest["Рпл  на ВНК, кгс/см2"] == 205.0
+
+        dates = [record[DATE_COLUMN] for record in store.tests(table, "101")]
+        assert dates == [datetime(2023, 5, 1), datetime(2024, 2, 10), None]
+    finally:
+        store.close()
+
+
+def test_table_is_reimported_only_when_changed(tmp_path):
+    table = make_history(tmp_path / "table.xlsx", [("101", "01.03.2024", 200.0)])
+    store = WellHistoryStore(str(tmp_path / "history.sqlite"))
+    try:
+        assert store.refresh(table)
+        assert not store.refresh(table)
+        assert store.latest_test(table, "101")[DATE_COLUMN] == datetime(2024, 3, 1)
+    finally:
+        store.close()
@@ -0,0 +1,109 @@
+import logging
+
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell.cell import MergedCell
+from openpyxl.styles import Font
+
+from workbook_session import WorkbookSession
+
+
+@pytest.fixture
+def report_path(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "current"
+    for row in range(1, 6):
+        ws.cell(row=row, column=1, value=row)
+        ws.cell(row=row, column=2, value=f"текст {row}")
+    ws["C1"] = "объединение"
+    ws.merge_cells("C1:D2")
+    ws["A3"].font = Font(bold=True)
+    ws["F1"] = "вне диапазона"
+    path = tmp_path / "Report.xlsx"
+    wb.save(path)
+    return str(path)
+
+
+def read_cell(path, address):
+    wb = load_workbook(path)
+    try:
+        return wb["current"][address].value
+    finally:
+        wb.close()
+
+
+def test_write_columns(report_path):
+    session = WorkbookSession(report_path)
+    session.write_columns(10, 17, [["01.10.2024   18:00:00", "01.10.2024   19:00:00"], [1.5, 2.0]])
+
+    assert session["Q10"] == "01.10.2024   18:00:00"
+    assert session["R11"] == 2.0
+    assert session.sheet["R10"].data_type == 'n'
+    assert session.dirty == {"Q10:R11"}
+
+    assert session.save()
+    assert read_cell(report_path, "R10") == 1.5
+    assert read_cell(report_path, "Q11") == "01.10.2024   19:00:00"
+
+
+def test_clear_ranges(report_path):
+    session = WorkbookSession(report_path)
+    session.clear_ranges(["A2:A4", "B:B", "C1:D2"])
+    cells = session.sheet._cells
+
+    # Ячейка без оформления удалена из листа, оформленная осталась с пустым значением
+    # (проверяется до чтения через session[...], которое создает недостающие ячейки)
+    assert (2, 1) not in cells and (4, 1) not in cells
+    assert cells[(3, 1)].font.bold and cells[(3, 1)].value is None
+    assert all((row, 2) not in cells for row in range(1, 6))
+    assert [session[f"A{row}"] for row in range(1, 6)] == [1, None, None, None, 5]
+    # В объединении очищается только левая верхняя ячейка
+    assert session["C1"] is None
+    assert isinstance(cells[(2, 3)], MergedCell)
+    assert session["F1"] == "вне диапазона"
+    assert "A3" in session.dirty and "C1" in session.dirty and "C2" not in session.dirty
+
+
+def test_reset_paths(report_path, tmp_path, caplog):
+    caplog.set_level(logging.INFO, logger="workbook_session")
+    snapshot_dir = str(tmp_path / "snapshots")
+    ranges = ["A1:A5"]
+
+    # Первый запуск: снимка нет — очистка и новый снимок
+    session = WorkbookSession(report_path, snapshot_dir=snapshot_dir)
+    session.reset(ranges)
+    assert read_cell(report_path, "A1") is None
+    assert "Очищено ячеек" in caplog.text
+
+    # Книга не менялась — уже очищена
+    caplog.clear()
+    session.reset(ranges)
+    assert "Книга уже очищена" in caplog.text
+    assert "Очищено ячеек" not in caplog.text
+
+    # Книгу изменила сама сессия — восстанавливается из снимка без очистки
+    session["A1"] = 42
+    session["F1"] = "изменено сессией"
+    session.save()
+    caplog.clear()
+    session.reset(ranges)
+    assert "Восстановление книги из очищенного снимка" in caplog.text
+    assert session["A1"] is None
+    assert session["F1"] == "вне диапазона"
+
+    # Книгу изменили вне программы — снова очистка, внешние правки вне диапазонов сохраняются
+    session.close()
+    wb = load_workbook(report_path)
+    wb["current"]["A2"] = 7
+    wb["current"]["F1"] = "изменено вручную"
+    wb.save(report_path)
+    caplog.clear()
+    session.reset(ranges)
+    assert "Очищено ячеек: 1" in caplog.text
+    assert session["A2"] is None
+    assert session["F1"] == "изменено вручную"
+
+    caplog.clear()
+    session.reset(ranges)
+    assert "Книга уже очищена" in caplog.text
@@ -0,0 +1,182 @@
+"""
+Локальное хранилище предыдущих исследований скважин.
+
+Итоговые таблицы из папки table_prev ('Итоговая таблица_<месторождение>.xlsx')
+разбираются один раз и складываются в SQLite с индексом (файл, скважина, дата).
+Поиск последнего исследования скважины — запрос по индексу, без чтения Excel.
+Файл переимпортируется только при изменении его mtime или размера.
+"""
+import json
+import logging
+import os
+import sqlite3
+from datetime import date, datetime
+
+logger = logging.getLogger(__name__)
+
+# Шапка итоговой таблицы занимает 11 строк
+HEADER_ROWS = 11
+WELL_COLUMN = 'Скважина'
+DATE_COLUMN = 'Дата испытания'
+
+# 2: пустые даты испытаний хранятся как NULL, а не как текст NaT
+SCHEMA_VERSION = 2
+
+# Ожидание блокировки базы, с: при пакетном формировании базу читают несколько процессов
+SQLITE_TIMEOUT = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tests (
+    source TEXT NOT NULL,
+    well TEXT NOT NULL,
+    test_date TEXT,
+    row_no INTEGER NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tests_lookup ON tests (source, well, test_date DESC, row_no);
+"""
+
+
+def _parse_test_date(value):
+    """Дата испытания: строка 'дд.мм.гггг' или дата Excel; остальное не учитывается"""
+    import pandas as pd
+
+    # Пустая ячейка столбца дат читается как NaT, а NaT — тоже datetime
+    if pd.isna(value):
+        return None
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value, "%d.%m.%Y")
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        return value
+    return None
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        # Скаляры numpy
+        return value.item()
+    return str(value)
+
+
+class WellHistoryStore:
+    """Индексированное хранилище итоговых таблиц предыдущих исследований"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self.db_path, timeout=SQLITE_TIMEOUT, check_same_thread=False)
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                connection.executescript("DROP TABLE IF EXISTS sources; DROP TABLE IF EXISTS tests;")
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def refresh(self, workbook_path):
+        """
+        Импортирует итоговую таблицу, если она изменилась с прошлого импорта.
+
+        :return: True, если файл был (пере)импортирован
+        """
+        import pandas as pd
+
+        connection = self._connect()
+        source = os.path.abspath(workbook_path)
+        stat = os.stat(source)
+        row = connection.execute("SELECT mtime, size FROM sources WHERE path = ?", (source,)).fetchone()
+        if row is not None and row[0] == stat.st_mtime and row[1] == stat.st_size:
+            return False
+
+        logger.info(f"Импорт итоговой таблицы в хранилище: {os.path.basename(source)}")
+        df = pd.read_excel(source, skiprows=HEADER_ROWS)
+        columns = [str(column) for column in df.columns]
+
+        rows = []
+        for row_no, values in enumerate(df.itertuples(index=False, name=None)):
+            record = dict(zip(columns, values))
+            if pd.isna(record.get(WELL_COLUMN)):
+                continue
+            test_date = _parse_test_date(record.get(DATE_COLUMN))
+            rows.append((
+                source,
+                str(record[WELL_COLUMN]).strip(),
+                test_date.isoformat() if test_date else None,
+                row_no,
+                json.dumps(record, ensure_ascii=False, default=_json_default),
+            ))
+
+        with connection:
+            connection.execute("DELETE FROM tests WHERE source = ?", (source,))
+            connection.executemany("INSERT INTO tests VALUES (?, ?, ?, ?, ?)", rows)
+            connection.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)",
+                               (source, stat.st_mtime, stat.st_size))
+        logger.info(f"Импортировано записей: {len(rows)}")
+        return True
+
+    def refresh_all(self, directory):
+        """Обновляет хранилище по всем итоговым таблицам каталога"""
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.xlsx') and not name.startswith('~$'):
+                self.refresh(os.path.join(directory, name))
+
+    def latest_test(self, workbook_path, well):
+        """
+        Последнее по дате исследование скважины.
+
+        :param workbook_path: итоговая таблица месторождения
+        :param well: номер скважины (как в столбце 'Скважина')
+        :return: словарь столбец -> значение ('Дата испытания' — datetime) или None
+        """
+        self.refresh(workbook_path)
+        row = self._connect().execute(
+            "SELECT test_date, record FROM tests "
+            "WHERE source = ? AND well = ? AND test_date IS NOT NULL "
+            "ORDER BY test_date DESC, row_no LIMIT 1",
+            (os.path.abspath(workbook_path), str(well).strip()),
+        ).fetchone()
+        if row is None:
+            return None
+
+        record = json.loads(row[1])
+        record[DATE_COLUMN] = datetime.fromisoformat(row[0])
+        return record
+
+    def tests(self, workbook_path, well):
+        """
+        Все исследования скважины в порядке дат (исследования без даты — в конце).
+
+        :return: список словарей столбец -> значение ('Дата испытания' — datetime или None)
+        """
+        self.refresh(workbook_path)
+        rows = self._connect().execute(
+            "SELECT test_date, record FROM tests WHERE source = ? AND well = ? "
+            "ORDER BY test_date IS NULL, test_date, row_no",
+            (os.path.abspath(workbook_path), str(well).strip()),
+        ).fetchall()
+
+        records = []
+        for test_date, record in rows:
+            record = json.loads(record)
+            record[DATE_COLUMN] = datetime.fromisoformat(test_date) if test_date else None
+            records.append(record)
+        return records
@@ -0,0 +1,265 @@
+"""
+Сессия работы с книгой Report.xlsx из GUI.
+
+Книга загружается один раз; вставки из буфера обмена и поля формы
+записываются в память, а измененные ячейки запоминаются. На диск книга
+записывается только по запросу (перед формированием отчета, при закрытии),
+целиком через временный файл и переименование, чтобы прерванное сохранение
+не испортило Report.xlsx.
+
+Очищенная книга хранится в каталоге снимков: при следующем запуске она
+копируется поверх Report.xlsx вместо повторной очистки и сохранения.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+from lazy_imports import lazy_import
+
+load_workbook = lazy_import("openpyxl", "load_workbook")
+Cell = lazy_import("openpyxl.cell.cell", "Cell")
+get_column_letter = lazy_import("openpyxl.utils", "get_column_letter")
+range_boundaries = lazy_import("openpyxl.utils", "range_boundaries")
+
+logger = logging.getLogger(__name__)
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class WorkbookSession:
+    """
+    Книга, открытая на все время работы GUI, с учетом измененных ячеек.
+
+    dirty — адреса измененных ячеек (для блочной записи — адрес диапазона).
+    """
+
+    def __init__(self, path, sheet_name='current', snapshot_dir=None):
+        self.path = path
+        self.sheet_name = sheet_name
+        self.snapshot_dir = snapshot_dir
+        self.dirty = set()
+        self._workbook = None
+        self._disk_state = None
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        logger.info(f"Загрузка книги {os.path.basename(self.path)}")
+        self._workbook = load_workbook(self.path)
+        self._disk_state = self._stat()
+        self.dirty.clear()
+        self._remember_seen()
+
+    @property
+    def workbook(self):
+        """
+        Загруженная книга. Если файл на диске изменился (например, отчет записал
+        в книгу вычисленные значения), а несохраненных изменений нет — книга перечитывается.
+        """
+        if self._workbook is None:
+            self._load()
+        elif self._stat() != self._disk_state:
+            if self.dirty:
+                logger.warning(f"Книга {os.path.basename(self.path)} изменена на диске, "
+                               f"несохраненные изменения сессии имеют приоритет")
+            else:
+                self._workbook.close()
+                self._load()
+        return self._workbook
+
+    @property
+    def sheet(self):
+        return self.workbook[self.sheet_name]
+
+    def __getitem__(self, address):
+        return self.sheet[address].value
+
+    def __setitem__(self, address, value):
+        cell = self.sheet[address]
+        cell.value = value
+        self.dirty.add(cell.coordinate)
+
+    def write(self, row, column, value, number_format=None):
+        """Записывает значение в ячейку (номера строки и столбца — с единицы)"""
+        cell = self.sheet.cell(row=row, column=column, value=value)
+        if number_format is not None:
+            cell.number_format = number_format
+        self.dirty.add(cell.coordinate)
+
+    def write_columns(self, start_row, start_col, columns):
+        """
+        Записывает блок значений, заданный столбцами одинаковой длины.
+
+        Числа записываются напрямую в ячейку, без определения типа openpyxl
+        для каждого значения; остальное — обычным присваиванием.
+        В dirty блок попадает одним диапазоном.
+        """
+        if not columns or not columns[0]:
+            return
+        ws = self.sheet
+        cells = ws._cells
+
+        for offset, values in enumerate(columns):
+            column = start_col + offset
+            for row, value in enumerate(values, start_row):
+                cell = cells.get((row, column))
+                if cell is None:
+                    cell = Cell(ws, row=row, column=column)
+                    cells[(row, column)] = cell
+                kind = type(value)
+                if kind is float:
+                    cell._value = value
+                    cell.data_type = 'n'
+                    continue
+                cell.value = value
+
+        end_row = start_row + len(columns[0]) - 1
+        self.dirty.add(f"{get_column_letter(start_col)}{start_row}:"
+                       f"{get_column_letter(start_col + len(columns) - 1)}{end_row}")
+
+    def clear_ranges(self, ranges):
+        """
+        Очищает значения в диапазонах ('A1:B16', 'C14', 'D:F').
+
+        Обходятся только существующие ячейки листа, а не все строки до max_row.
+        Ячейки без оформления удаляются из листа, у оформленных сбрасывается значение.
+        Ячейки внутри объединений (кроме левой верхней) не трогаются.
+        """
+        ws = self.sheet
+        boxes_by_column = {}
+        for reference in ranges:
+            min_col, min_row, max_col, max_row = range_boundaries(reference)
+            for column in range(min_col, max_col + 1):
+                boxes_by_column.setdefault(column, []).append((min_row or 1, max_row or float('inf')))
+
+        merged = set()
+        for merged_range in ws.merged_cells.ranges:
+            merged.update(merged_range.cells)
+            merged.discard((merged_range.min_row, merged_range.min_col))
+
+        cells = ws._cells
+        cleared = removed = 0
+        for key in [key for key in cells if key[1] in boxes_by_column]:
+            row, column = key
+            if key in merged or not any(low <= row <= high for low, high in boxes_by_column[column]):
+                continue
+            cell = cells[key]
+            if cell.value is not None:
+                self.dirty.add(cell.coordinate)
+                cleared += 1
+            if cell.has_style:
+                cell.value = None
+            else:
+                del cells[key]
+                removed += 1
+        logger.info(f"Очищено ячеек: {cleared}, удалено пустых: {removed}")
+
+    def save(self, force=False):
+        """
+        Записывает книгу на диск, если есть несохраненные изменения (или force).
+
+        :return: True, если файл был записан
+        """
+        if self._workbook is None or not (self.dirty or force):
+            return False
+
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            self._workbook.save(tmp_path)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info(f"Книга {os.path.basename(self.path)} сохранена, изменений: {len(self.dirty)}")
+        self._disk_state = self._stat()
+        self.dirty.clear()
+        self._remember_seen()
+        return True
+
+    def close(self):
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+            self._disk_state = None
+        self.dirty.clear()
+
+    # Снимок очищенной книги ------------------------------------------------------
+
+    def _snapshot_path(self):
+        return os.path.join(self.snapshot_dir, f"{os.path.basename(self.path)}.clean")
+
+    def _state_path(self):
+        return os.path.join(self.snapshot_dir, f"{os.path.basename(self.path)}.json")
+
+    def _read_state(self):
+        try:
+            with open(self._state_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_state(self, **changes):
+        state = self._read_state()
+        state.update(changes)
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            tmp_path = f"{self._state_path()}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self._state_path())
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить состояние снимка книги: {e}")
+
+    def _remember_seen(self):
+        """Запоминает хеш книги, которую сессия загрузила или записала сама"""
+        if self.snapshot_dir is not None:
+            self._write_state(seen=_file_hash(self.path))
+
+    def reset(self, ranges):
+        """
+        Приводит книгу к очищенному виду и загружает ее.
+
+        Если файл на диске — это книга, которую в прошлый раз видела сессия, поверх
+        него копируется снимок очищенной книги. Иначе (первый запуск, книгу заменили
+        или редактировали вне программы) выполняется очистка ranges, и результат
+        становится новым снимком.
+        """
+        self.close()
+        if self.snapshot_dir is not None and os.path.exists(self._snapshot_path()):
+            state = self._read_state()
+            current = _file_hash(self.path)
+            if current == state.get("clean"):
+                logger.info("Книга уже очищена")
+                self.sheet
+                return
+            if current == state.get("seen"):
+                logger.info("Восстановление книги из очищенного снимка")
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                shutil.copyfile(self._snapshot_path(), tmp_path)
+                os.replace(tmp_path, self.path)
+                self.sheet
+                return
+
+        self.clear_ranges(ranges)
+        self.save(force=True)
+        if self.snapshot_dir is not None:
+            try:
+                os.makedirs(self.snapshot_dir, exist_ok=True)
+                shutil.copyfile(self.path, self._snapshot_path())
+                self._write_state(clean=_file_hash(self.path))
+            except OSError as e:
+                logger.warning(f"Не удалось сохранить снимок очищенной книги: {e}")